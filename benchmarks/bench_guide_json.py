@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Compares loading an A2J guide from its Guide.xml and from its Guide.json.
+
+For synthetic guides of several sizes (written as both files, with the same content),
+times loading each (the best of `--repeat` runs), per guide and per KB of file. That both
+give the same YAML is checked in tests/test_guide_json.py.
+
+Run with `python benchmarks/bench_guide_json.py`, after `pip install -e .`.
+"""
+
+import argparse
+import gc
+import os
+import tempfile
+import time
+
+from dakirby.core.a2jauthor import A2JInterview
+from dakirby.core.a2jauthor_json import A2JJsonInterview
+
+import synthetic
+
+def best_time(load, path, repeat):
+  best = None
+  for _ in range(repeat):
+    gc.collect()
+    start = time.perf_counter()
+    load(path)
+    seconds = time.perf_counter() - start
+    best = seconds if best is None else min(best, seconds)
+  return best
+
+def main():
+  parser = argparse.ArgumentParser(description="Compares loading A2J guides from Guide.xml and Guide.json")
+  parser.add_argument("--sizes", type=int, nargs="+", default=[500, 1000, 2000, 4000], help="pages per guide")
+  parser.add_argument("--repeat", type=int, default=5, help="runs per file; the fastest is kept")
+  parser.add_argument("--no-markup", action="store_true", help="leave the HTML out of the guides")
+  args = parser.parse_args()
+
+  print(f"{'pages':>6} {'xml KB':>8} {'json KB':>8} {'xml ms':>8} {'json ms':>8} {'xml us/KB':>10} {'json us/KB':>11} {'json/xml per KB':>16}")
+  with tempfile.TemporaryDirectory() as tmp_dir:
+    for size in args.sizes:
+      xml_path = synthetic.write_a2j(os.path.join(tmp_dir, f"a2j_{size}"), size, with_json=True,
+                                     markup=not args.no_markup)
+      json_path = os.path.join(os.path.dirname(xml_path), "Guide.json")
+      xml_kb = os.path.getsize(xml_path) / 1024
+      json_kb = os.path.getsize(json_path) / 1024
+      xml_seconds = best_time(A2JInterview, xml_path, args.repeat)
+      json_seconds = best_time(A2JJsonInterview, json_path, args.repeat)
+      xml_per_kb = xml_seconds * 1e6 / xml_kb
+      json_per_kb = json_seconds * 1e6 / json_kb
+      print(f"{size:>6} {xml_kb:>8.0f} {json_kb:>8.0f} {xml_seconds * 1000:>8.1f} {json_seconds * 1000:>8.1f} "
+            f"{xml_per_kb:>10.1f} {json_per_kb:>11.1f} {json_per_kb / xml_per_kb:>16.2f}")
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Times `A2JInterview.substitute_macros` as the variable count and the page count grow.
+
+Builds guides in memory, with `%%name%%` macros (of known variables, in any case, and of
+names that aren't variables) in each page's text, help, learn more, field labels and
+button labels, and times `substitute_macros` (the best of `--repeat` runs). The two are
+scaled separately:
+
+- pages: `--pages` pages, with `--fixed-variables` variables. Time should grow in
+  proportion to the text, so a growth exponent over `--threshold` fails.
+- variables: `--variables` variables, with `--fixed-pages` pages. The text is the same
+  size each time, so time shouldn't grow at all; a growth exponent over
+  `--variables-threshold` fails (a scan of the variables for each macro would be about 1).
+
+Exits with 1 if either case fails. Run with `python benchmarks/bench_macros.py`, after
+`pip install -e .`.
+"""
+
+import argparse
+import gc
+import random
+import sys
+import time
+
+from dakirby.core.a2jauthor import A2JInterview, A2JPage, Field, Variable
+
+from bench_stages import growth_exponent
+
+def macro_text(rng, num_variables, idx, label):
+  """A line of text with a few macros: known variables (in some other case) and an unknown name"""
+  known = [f"Var {rng.randrange(num_variables)} TE" for _ in range(3)]
+  return (f"{label} {idx} for %%{known[0]}%% and %%[{known[1].upper()}]%%, "
+          f"not %%Nothing {idx}%%, then %%{known[2].lower()}%% again.\n")
+
+def make_guide(num_pages, num_variables, seed=0):
+  """An `A2JInterview` with `num_variables` variables and `num_pages` pages, and the
+  text of each page, to put back before each run
+  """
+  rng = random.Random(seed)
+  interview = A2JInterview()
+  for idx in range(num_variables):
+    interview.add_variable(Variable(f"Var {idx} TE", "Text"))
+  originals = []
+  for idx in range(num_pages):
+    page = A2JPage()
+    page.name = f"Page {idx}"
+    page.text = macro_text(rng, num_variables, idx, "Question") * 2
+    page.help = macro_text(rng, num_variables, idx, "Help")
+    page.learn = macro_text(rng, num_variables, idx, "Learn more")
+    page.fields = [Field(f"Field {idx} {num}", "text", label=macro_text(rng, num_variables, idx, "Label"))
+                   for num in range(3)]
+    page.buttons = [{"label": macro_text(rng, num_variables, idx, "Continue")}]
+    interview.page_map[page.name] = page
+    originals.append((page, page.text, page.help, page.learn, [field.label for field in page.fields],
+                      [button["label"] for button in page.buttons]))
+  return interview, originals
+
+def restore(originals):
+  for page, text, help, learn, field_labels, button_labels in originals:
+    page.text = text
+    page.help = help
+    page.learn = learn
+    for field, label in zip(page.fields, field_labels):
+      field.label = label
+    for button, label in zip(page.buttons, button_labels):
+      button["label"] = label
+
+def best_time(num_pages, num_variables, repeat):
+  interview, originals = make_guide(num_pages, num_variables)
+  best = None
+  for _ in range(repeat):
+    restore(originals)
+    gc.collect()
+    start = time.perf_counter()
+    interview.substitute_macros()
+    seconds = time.perf_counter() - start
+    best = seconds if best is None else min(best, seconds)
+  return best
+
+def main():
+  parser = argparse.ArgumentParser(description="Times substitute_macros as variables and pages grow")
+  parser.add_argument("--pages", type=int, nargs="+", default=[500, 2000, 8000, 32000], help="pages, for the pages case")
+  parser.add_argument("--fixed-variables", type=int, default=1000, help="variables, for the pages case")
+  parser.add_argument("--variables", type=int, nargs="+", default=[1000, 4000, 16000, 64000],
+      help="variables, for the variables case")
+  parser.add_argument("--fixed-pages", type=int, default=2000, help="pages, for the variables case")
+  parser.add_argument("--repeat", type=int, default=3, help="runs per size; the fastest is kept")
+  parser.add_argument("--threshold", type=float, default=1.2, help="growth exponent to fail the pages case at")
+  parser.add_argument("--variables-threshold", type=float, default=0.5,
+      help="growth exponent to fail the variables case at")
+  args = parser.parse_args()
+
+  cases = [
+    ("pages", [(pages, (pages, args.fixed_variables)) for pages in sorted(args.pages)], args.threshold),
+    ("variables", [(variables, (args.fixed_pages, variables)) for variables in sorted(args.variables)],
+     args.variables_threshold),
+  ]
+  flagged = []
+  print(f"{'case':>10} {'pages':>7} {'vars':>7} {'ms':>9} {'us/page':>8}")
+  for case, inputs, threshold in cases:
+    points = []
+    for size, (num_pages, num_variables) in inputs:
+      seconds = best_time(num_pages, num_variables, args.repeat)
+      points.append((size, seconds))
+      print(f"{case:>10} {num_pages:>7} {num_variables:>7} {seconds * 1000:>9.1f} {seconds * 1e6 / num_pages:>8.1f}")
+    exponent = growth_exponent(points)
+    if exponent is None:
+      print(f"{case:>10} growth exponent n/a")
+      continue
+    print(f"{case:>10} growth exponent {exponent:.2f} (fails over {threshold})")
+    if exponent > threshold:
+      flagged.append(case)
+  for case in flagged:
+    print(f"FAIL: substitute_macros grows too fast with {case}")
+  return 1 if flagged else 0
+
+if __name__ == "__main__":
+  sys.exit(main())
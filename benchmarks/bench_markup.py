@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Times turning A2J help text into Markdown, on very large and very deeply nested text.
+
+Builds a HELP element of `--sizes` paragraphs (with bold, italic and linked text nested
+in each other, and bulleted and numbered lists nested in list items), and one nested
+`--depth` levels deep (alternating lists, FONT, bold and links), and times `parse_text`
+on each (the best of `--repeat` runs). Like `bench_stages.py`, flags a case whose time
+grows faster than the text (the slope of log time against log size is over
+`--threshold`), and exits with 1 if any does.
+
+Run with `python benchmarks/bench_markup.py`, after `pip install -e .`.
+"""
+
+import argparse
+import gc
+import random
+import sys
+import time
+
+from lxml import etree
+
+from dakirby.core.a2j_markup import parse_text
+
+from bench_stages import growth_exponent
+
+def inline_html(rng, idx):
+  return (f"Some <STRONG>bold <EM>and italic {idx}</EM></STRONG> text, with "
+          f"<A HREF=\"https://example.com/{idx}\">a <U>link <STRONG>{idx}</STRONG></U></A> and "
+          f"<FONT COLOR=\"red\">colored <EM>text</EM></FONT>.\n")
+
+def wide_help(paragraphs, seed=0) -> bytes:
+  """Help text of `paragraphs` paragraphs, a third of them followed by nested lists"""
+  rng = random.Random(seed)
+  parts = ["<HELP>Help, at length\n"]
+  for idx in range(paragraphs):
+    parts.append(f"<P>{inline_html(rng, idx)}</P>\n")
+    if rng.random() < 0.3:
+      tag = rng.choice(["UL", "OL"])
+      parts.append(f"<{tag}><LI>first {inline_html(rng, idx)}<UL><LI>inner <EM>one</EM></LI><LI>inner two</LI></UL></LI>"
+                   f"<LI>second</LI></{tag}>\n")
+  parts.append("</HELP>")
+  return "".join(parts).encode("utf-8")
+
+def deep_help(depth) -> bytes:
+  """Help text nested `depth` elements deep"""
+  opens = []
+  closes = []
+  for level in range(depth):
+    tag = ["UL", "LI", "FONT", "STRONG", "A HREF=\"https://example.com\"", "EM"][level % 6]
+    opens.append(f"<{tag}>level {level} ")
+    closes.append(f"</{tag.split()[0]}> after {level}")
+  return ("<HELP>" + "".join(opens) + "".join(reversed(closes)) + "</HELP>").encode("utf-8")
+
+def best_time(elem, repeat):
+  best = None
+  for _ in range(repeat):
+    gc.collect()
+    start = time.perf_counter()
+    parse_text(elem)
+    seconds = time.perf_counter() - start
+    best = seconds if best is None else min(best, seconds)
+  return best
+
+def main():
+  parser = argparse.ArgumentParser(description="Times parse_text on large and deeply nested A2J text")
+  parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 4000, 16000, 64000], help="paragraphs of help")
+  parser.add_argument("--depths", type=int, nargs="+", default=[250, 500, 1000, 2000],
+      help="levels of nesting (lxml allows up to 2048)")
+  parser.add_argument("--repeat", type=int, default=3, help="runs per size; the fastest is kept")
+  parser.add_argument("--threshold", type=float, default=1.2, help="growth exponent to flag a case at")
+  args = parser.parse_args()
+
+  # Deep text needs lxml to allow more than 256 levels
+  deep_parser = etree.XMLParser(huge_tree=True)
+  cases = [("paragraphs", [(size, wide_help(size)) for size in sorted(args.sizes)]),
+           ("depth", [(depth, deep_help(depth)) for depth in sorted(args.depths)])]
+  flagged = []
+  print(f"{'case':>10} {'size':>7} {'KB':>8} {'ms':>9} {'us/KB':>8}")
+  for case, inputs in cases:
+    points = []
+    for size, html in inputs:
+      seconds = best_time(etree.fromstring(html, deep_parser), args.repeat)
+      points.append((len(html), seconds))
+      print(f"{case:>10} {size:>7} {len(html) / 1024:>8.0f} {seconds * 1000:>9.1f} {seconds * 1e6 / (len(html) / 1024):>8.1f}")
+    exponent = growth_exponent(points)
+    print(f"{case:>10} growth exponent {exponent:.2f}" if exponent is not None else f"{case:>10} growth exponent n/a")
+    if exponent is not None and exponent > args.threshold:
+      flagged.append(case)
+  for case in flagged:
+    print(f"FAIL: parse_text grows faster than linear with {case}")
+  return 1 if flagged else 0
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Measures how much memory the slotted model classes save per object.
+
+Builds a large synthetic A2J guide and HotDocs library, loads them, and for each kind of
+model object compares its size against the same attributes kept the old way: in a
+per-instance `__dict__`, or a plain dict for dialogs, dialog elements, and code blocks.
+
+Run with `python benchmarks/bench_memory.py`, after `pip install -e .`.
+"""
+
+import os
+import tempfile
+import tracemalloc
+from collections import defaultdict
+
+from dakirby.core.a2jauthor import A2JInterview
+from dakirby.core.hotdocs import HotDocsInterview
+
+import synthetic
+
+def loaded_size(load):
+  tracemalloc.start()
+  obj = load()
+  current, _ = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  return obj, current
+
+def slot_values(obj):
+  values = {}
+  for cls in type(obj).__mro__:
+    for name in getattr(cls, "__slots__", ()):
+      if hasattr(obj, name):
+        values[name] = getattr(obj, name)
+  return values
+
+def per_object_bytes(objs, make):
+  """Average bytes allocated by `make(obj)` for each of `objs`, not counting shared attribute values"""
+  made = [None] * len(objs)
+  tracemalloc.start()
+  before, _ = tracemalloc.get_traced_memory()
+  for idx, obj in enumerate(objs):
+    made[idx] = make(obj)
+  after, _ = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  return (after - before) / len(objs)
+
+def plain_object_maker(cls):
+  """Makes objects with the same attributes, kept in a `__dict__` like before they were slotted"""
+  plain_cls = type("Plain" + cls.__name__, (), {})
+  def make(obj):
+    plain = plain_cls()
+    for name, val in slot_values(obj).items():
+      setattr(plain, name, val)
+    return plain
+  return make
+
+def copy_slotted(obj):
+  new = object.__new__(type(obj))
+  for name, val in slot_values(obj).items():
+    setattr(new, name, val)
+  return new
+
+def collect(a2j, hotdocs):
+  by_class = defaultdict(list)
+  for page in a2j.page_map.values():
+    by_class[type(page)].append(page)
+    for field in page.fields:
+      by_class[type(field)].append(field)
+  for var in hotdocs.variable_map.values():
+    by_class[type(var)].append(var)
+  for store in (hotdocs.dialog_elements, hotdocs.code_blocks, hotdocs.dialogs):
+    for obj in store.values():
+      by_class[type(obj)].append(obj)
+  for dialog in hotdocs.dialogs.values():
+    for item in dialog.contents:
+      by_class[type(item)].append(item)
+  return by_class
+
+# Dialogs, dialog elements, and code blocks used to be plain dicts
+dict_classes = {"Dialog", "DialogItem", "DialogElement", "CodeBlock"}
+
+def main():
+  with tempfile.TemporaryDirectory() as tmp_dir:
+    guide_path = synthetic.write_a2j(tmp_dir, 4000)
+    hotdocs_dir = synthetic.write_hotdocs(os.path.join(tmp_dir, "library"), 4000)
+    a2j, a2j_bytes = loaded_size(lambda: A2JInterview(guide_path))
+    hotdocs, hotdocs_bytes = loaded_size(lambda: HotDocsInterview(hotdocs_dir))
+  print(f"Loaded A2J guide: {a2j_bytes / 1e6:.1f} MB, HotDocs library: {hotdocs_bytes / 1e6:.1f} MB\n")
+
+  print(f"{'class':>24} {'count':>8} {'before (B)':>11} {'slotted (B)':>12} {'saved (MB)':>11}")
+  total_saved = 0
+  for cls, objs in collect(a2j, hotdocs).items():
+    if cls.__name__ in dict_classes:
+      before = per_object_bytes(objs, slot_values)
+    else:
+      before = per_object_bytes(objs, plain_object_maker(cls))
+    after = per_object_bytes(objs, copy_slotted)
+    saved = (before - after) * len(objs)
+    total_saved += saved
+    print(f"{cls.__name__:>24} {len(objs):>8} {before:>11.0f} {after:>12.0f} {saved / 1e6:>11.1f}")
+
+  fields = [field for page in a2j.page_map.values() for field in page.fields]
+  before = per_object_bytes(fields, lambda field: list(field.listdata))
+  after = per_object_bytes(fields, lambda field: tuple(list(field.listdata)))
+  total_saved += (before - after) * len(fields)
+  print(f"{'Field.listdata':>24} {len(fields):>8} {before:>11.0f} {after:>12.0f} {(before - after) * len(fields) / 1e6:>11.1f}")
+  print(f"\nSaved {total_saved / 1e6:.1f} MB in total")
+
+if __name__ == "__main__":
+  main()
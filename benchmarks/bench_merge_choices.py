@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Times `HotDocsInterview.merge_choices` against the old pairwise version.
+
+Run with `python benchmarks/bench_merge_choices.py`, after `pip install -e .`.
+"""
+
+import random
+import time
+
+from lxml import etree
+
+from dakirby.core.hotdocs import HotDocsInterview, MultipleChoiceVariable, xml_ns
+
+# Option sets that show up again and again in real libraries
+common_options = [
+  ["Yes", "No"],
+  ["Yes", "No", "I don't know"],
+  ["Yes", "No", "Unknown"],
+  ["Mother", "Father", "Both", "Neither"],
+  ["Plaintiff", "Defendant"],
+]
+
+def make_mc_elem(name, options):
+  mc_elem = etree.Element(xml_ns("multipleChoice"), name=name)
+  etree.SubElement(mc_elem, xml_ns("prompt")).text = f"Pick for {name}"
+  options_elem = etree.SubElement(mc_elem, xml_ns("options"))
+  for opt in options:
+    etree.SubElement(options_elem, xml_ns("option"), name=opt)
+  return mc_elem
+
+def make_interview(n, seed=0):
+  rng = random.Random(seed)
+  interview = HotDocsInterview.__new__(HotDocsInterview)
+  interview.variable_map = {}
+  interview.dup_choices = {}
+  for idx in range(n):
+    if rng.random() < 0.8:
+      options = list(rng.choice(common_options))
+      rng.shuffle(options)
+    else:
+      options = [f"Option {idx} {k}" for k in range(rng.randint(2, 6))]
+    name = f"Choice {idx} MC"
+    interview.variable_map[name] = MultipleChoiceVariable(make_mc_elem(name, options))
+  return interview
+
+def pairwise_merge_choices(self):
+  """The original O(n^2) implementation, kept to compare against"""
+  if self.dup_choices:
+    return
+  mcs = [var for _, var in self.variable_map.items() if isinstance(var, MultipleChoiceVariable)]
+  self.dup_choices = {}
+  for idx, mc in enumerate(mcs):
+    if isinstance(mc.options, str):
+      continue
+    mc_sorted = list(sorted(mc.options))
+    has_dup = False
+    for mc2 in mcs[idx+1:]:
+      if not isinstance(mc2.options, str) and mc_sorted == list(sorted(mc2.options)):
+        has_dup = True
+        dup_name = mc.da_name + "_choices"
+        self.dup_choices[dup_name] = mc_sorted
+        mc2.options = dup_name
+    if has_dup:
+      mc.options = dup_name
+
+def time_merge(merge, n):
+  interview = make_interview(n)
+  start = time.perf_counter()
+  merge(interview)
+  elapsed = time.perf_counter() - start
+  return elapsed, interview
+
+def main():
+  print(f"{'variables':>10} {'pairwise (s)':>13} {'grouped (s)':>12} {'speedup':>8}")
+  for n in [250, 500, 1000, 2000, 4000]:
+    old_time, old = time_merge(pairwise_merge_choices, n)
+    new_time, new = time_merge(HotDocsInterview.merge_choices, n)
+    assert old.dup_choices == new.dup_choices
+    assert list(old.dup_choices) == list(new.dup_choices)
+    assert [v.options for v in old.variable_map.values()] == [v.options for v in new.variable_map.values()]
+    print(f"{n:>10} {old_time:>13.4f} {new_time:>12.4f} {old_time / new_time:>7.1f}x")
+
+if __name__ == "__main__":
+  main()
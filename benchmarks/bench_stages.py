@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""Times each stage of a conversion on synthetic interviews of several sizes.
+
+The stages are: XML parse, model build, `merge_choices`, `sub_all_vars` (resolving the
+«» references of a HotDocs library), `to_yaml_objs`, and `to_yaml`. A2J guides have no
+`merge_choices` or `sub_all_vars` stage. Each stage's time is the best of `--repeat` runs.
+
+Stages whose time grows faster than the interview (the slope of log time against log
+size is over `--threshold`) are flagged. Save a run with `-o results.json`, and compare a
+later run against it with `--compare results.json`.
+
+Run with `python benchmarks/bench_stages.py`, after `pip install -e .`.
+"""
+
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from lxml import etree
+
+from dakirby.cache import dakirby_version
+from dakirby.core.a2jauthor import A2JInterview
+from dakirby.core.hotdocs import HotDocsInterview
+from dakirby.core.docassemble import to_yaml
+
+import synthetic
+
+stage_names = ["parse", "build", "merge_choices", "sub_all_vars", "to_yaml_objs", "to_yaml"]
+# Stages faster than this are mostly noise, so aren't flagged
+min_flag_seconds = 0.005
+
+def a2j_stages(path):
+  """Runs each stage on the guide at `path`, and returns how long each took"""
+  times = {}
+  start = time.perf_counter()
+  doc = etree.parse(path)
+  times["parse"] = time.perf_counter() - start
+
+  start = time.perf_counter()
+  interview = A2JInterview()
+  interview.parse_from_xml(doc)
+  times["build"] = time.perf_counter() - start
+
+  start = time.perf_counter()
+  objs = interview.to_yaml_objs()
+  times["to_yaml_objs"] = time.perf_counter() - start
+
+  start = time.perf_counter()
+  to_yaml(objs)
+  times["to_yaml"] = time.perf_counter() - start
+  return times
+
+def hotdocs_stages(path):
+  """Runs each stage on the master component file at `path`, and returns how long each took"""
+  times = {}
+  start = time.perf_counter()
+  doc = etree.parse(path)
+  times["parse"] = time.perf_counter() - start
+
+  start = time.perf_counter()
+  interview = HotDocsInterview()
+  interview.parse_from_xml(doc)
+  times["build"] = time.perf_counter() - start
+
+  start = time.perf_counter()
+  interview.resolve_markup()
+  times["sub_all_vars"] = time.perf_counter() - start
+
+  start = time.perf_counter()
+  interview.merge_choices()
+  times["merge_choices"] = time.perf_counter() - start
+
+  start = time.perf_counter()
+  objs = interview.to_yaml_objs()
+  times["to_yaml_objs"] = time.perf_counter() - start
+
+  start = time.perf_counter()
+  to_yaml(objs)
+  times["to_yaml"] = time.perf_counter() - start
+  return times
+
+def best_times(run_stages, path, repeat):
+  best = {}
+  for _ in range(repeat):
+    gc.collect()
+    for stage, seconds in run_stages(path).items():
+      best[stage] = min(seconds, best.get(stage, seconds))
+  return best
+
+def growth_exponent(points):
+  """The least squares slope of log(seconds) against log(size); 1 is linear"""
+  points = [(math.log(size), math.log(seconds)) for size, seconds in points if seconds > 0]
+  if len(points) < 2:
+    return None
+  mean_x = sum(x for x, _ in points) / len(points)
+  mean_y = sum(y for _, y in points) / len(points)
+  var_x = sum((x - mean_x) ** 2 for x, _ in points)
+  if var_x == 0:
+    return None
+  return sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+
+def run(sizes, repeat):
+  results = []
+  with tempfile.TemporaryDirectory() as tmp_dir:
+    for size in sizes:
+      guide_path = synthetic.write_a2j(os.path.join(tmp_dir, f"a2j_{size}"), size)
+      library_path = synthetic.write_hotdocs(os.path.join(tmp_dir, f"library_{size}"), size)
+      inputs = [("a2j", a2j_stages, guide_path), ("hotdocs", hotdocs_stages, os.path.join(library_path, "master.cmp"))]
+      for input_format, run_stages, path in inputs:
+        for stage, seconds in best_times(run_stages, path, repeat).items():
+          results.append({"format": input_format, "size": size, "stage": stage, "seconds": seconds})
+  return results
+
+def scaling(results, threshold):
+  by_stage = {}
+  for result in results:
+    by_stage.setdefault((result["format"], result["stage"]), []).append((result["size"], result["seconds"]))
+  report = []
+  for (input_format, stage), points in by_stage.items():
+    exponent = growth_exponent(points)
+    largest = max(points)[1]
+    flagged = exponent is not None and exponent > threshold and largest >= min_flag_seconds
+    report.append({"format": input_format, "stage": stage, "exponent": exponent, "superlinear": flagged})
+  return report
+
+def print_results(results, report, previous=None):
+  old = {}
+  if previous:
+    old = {(r["format"], r["size"], r["stage"]): r["seconds"] for r in previous["results"]}
+  print(f"{'format':>8} {'size':>6} " + " ".join(f"{stage:>13}" for stage in stage_names))
+  rows = {}
+  for result in results:
+    rows.setdefault((result["format"], result["size"]), {})[result["stage"]] = result["seconds"]
+  for (input_format, size), times in rows.items():
+    cells = []
+    for stage in stage_names:
+      if stage not in times:
+        cells.append(f"{'-':>13}")
+      elif (input_format, size, stage) in old:
+        cells.append(f"{times[stage]:>7.4f} {times[stage] / old[(input_format, size, stage)]:>4.2f}x")
+      else:
+        cells.append(f"{times[stage]:>13.4f}")
+    print(f"{input_format:>8} {size:>6} " + " ".join(cells))
+  if previous:
+    print("(times in seconds; ratios are against the compared run, lower is faster)")
+  print()
+  for row in report:
+    if row["exponent"] is None:
+      continue
+    flag = "  <-- grows faster than linear" if row["superlinear"] else ""
+    print(f"{row['format']:>8} {row['stage']:>13}: time ~ size^{row['exponent']:.2f}{flag}")
+
+def main():
+  parser = argparse.ArgumentParser(description="Times each conversion stage on synthetic interviews")
+  parser.add_argument("--sizes", type=int, nargs="+", default=[250, 500, 1000, 2000],
+      help="A2J pages and HotDocs dialogs (five variables each) to test with")
+  parser.add_argument("--repeat", type=int, default=3, help="runs per size; the fastest is kept")
+  parser.add_argument("--threshold", type=float, default=1.3, help="growth exponent to flag a stage at")
+  parser.add_argument("-o", "--output", help="save the results to this JSON file")
+  parser.add_argument("--compare", help="a JSON file from an earlier run to compare against")
+  args = parser.parse_args()
+
+  previous = None
+  if args.compare:
+    with open(args.compare) as f:
+      previous = json.load(f)
+  results = run(sorted(args.sizes), args.repeat)
+  report = scaling(results, args.threshold)
+  print_results(results, report, previous)
+  if args.output:
+    with open(args.output, "w") as f:
+      json.dump({
+        "dakirby_version": dakirby_version(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "repeat": args.repeat,
+        "results": results,
+        "scaling": report,
+      }, f, indent=2)
+  return 1 if any(row["superlinear"] for row in report) else 0
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Checks how long `dakirby` takes to start converting, against a fixed budget.
+
+For a small A2J guide and a small HotDocs package, runs `python -X importtime -m
+dakirby.cli INPUT` and times it from launch to the first byte of YAML on stdout (the best
+of `--repeat` runs). A run fails if that's over `--budget-ms`. The slowest imports of the
+last run of each input are listed, to show where the time went. Which modules startup
+imports, and the budget (with room to spare for slower machines), are checked in
+tests/test_startup.py.
+
+Run with `python benchmarks/bench_startup.py`, after `pip install -e .`.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import synthetic
+
+default_budget_ms = 250
+
+def parse_importtime(stderr):
+  """Each imported module's own and cumulative import time, in microseconds"""
+  imports = {}
+  for line in stderr.splitlines():
+    if not line.startswith("import time:") or "self [us]" in line:
+      continue
+    self_us, cumulative_us, name = line[len("import time:"):].split("|")
+    imports[name.strip()] = (int(self_us), int(cumulative_us))
+  return imports
+
+def time_to_first_output(input_path):
+  """Seconds from launching a conversion to its first byte of output, and what it imported"""
+  start = time.perf_counter()
+  process = subprocess.Popen([sys.executable, "-X", "importtime", "-m", "dakirby.cli", input_path],
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+  process.stdout.read(1)
+  first_output = time.perf_counter() - start
+  process.stdout.read()
+  stderr = process.stderr.read().decode("utf-8", "replace")
+  if process.wait() != 0:
+    raise RuntimeError(f"Converting {input_path} failed:\n{stderr[-2000:]}")
+  return first_output, parse_importtime(stderr)
+
+def check(input_format, input_path, repeat, budget_ms, top):
+  best = None
+  for _ in range(repeat):
+    seconds, imports = time_to_first_output(input_path)
+    best = seconds if best is None else min(best, seconds)
+  problems = []
+  if best * 1000 > budget_ms:
+    problems.append(f"first output after {best * 1000:.0f} ms, over the {budget_ms:.0f} ms budget")
+
+  total_ms = sum(self_us for self_us, _ in imports.values()) / 1000
+  print(f"{input_format:>8}: first output in {best * 1000:.0f} ms (budget {budget_ms:.0f} ms); "
+        f"{len(imports)} modules imported in {total_ms:.0f} ms")
+  slowest = sorted(imports.items(), key=lambda item: item[1][0], reverse=True)[:top]
+  for name, (self_us, cumulative_us) in slowest:
+    print(f"{'':>10}{self_us / 1000:>7.1f} ms self {cumulative_us / 1000:>7.1f} ms total  {name}")
+  for problem in problems:
+    print(f"{'':>10}FAIL: {problem}")
+  return problems
+
+def main():
+  parser = argparse.ArgumentParser(description="Checks the time from launching dakirby to its first output")
+  parser.add_argument("--budget-ms", type=float, default=default_budget_ms, help="most milliseconds to the first output")
+  parser.add_argument("--repeat", type=int, default=5, help="runs per input; the fastest is kept")
+  parser.add_argument("--top", type=int, default=8, help="how many of the slowest imports to list")
+  args = parser.parse_args()
+
+  problems = []
+  with tempfile.TemporaryDirectory() as tmp_dir:
+    inputs = [
+      ("a2j", synthetic.write_a2j(os.path.join(tmp_dir, "a2j"), 10)),
+      ("hotdocs", synthetic.write_hotdocs(os.path.join(tmp_dir, "library.zip"), 10, as_zip=True)),
+    ]
+    for input_format, input_path in inputs:
+      problems += check(input_format, input_path, args.repeat, args.budget_ms, args.top)
+  return 1 if problems else 0
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Times the buffered YAML emitter against the old print-per-scalar `nested_print`.
+
+Run with `python benchmarks/bench_yaml_emitter.py`, after `pip install -e .`.
+"""
+
+import io
+import time
+
+from dakirby.core.docassemble import to_yaml
+
+def print_nested_print(output, data, indent=0, prev_context=None):
+  """The original implementation, kept to compare against"""
+  if isinstance(data, dict):
+    if not data:
+      print("{}", file=output)
+      return
+    if prev_context:
+      indent += 2
+    ind = ' ' * indent
+    idx = 0
+    for key in data:
+      if (prev_context == "list" and idx == 0) or prev_context is None:
+        print(f"{key}: ", file=output, end='')
+      elif idx > 0:
+        print(f"{ind}{key}: ", file=output, end='')
+      else:
+        print(f"\n{ind}{key}: ", file=output, end='')
+      print_nested_print(output, data[key], indent, prev_context=key if key in ["code", "datatype", "field"] else "dict")
+      idx += 1
+  elif isinstance(data, list):
+    if not data:
+      print("[]", file=output)
+      return
+    indent += 2
+    ind = ' ' * indent
+    for idx, item in enumerate(data):
+      if prev_context == "dict" and idx == 0:
+        print(f"\n{ind}- ", file=output, end='')
+      else:
+        print(f"{ind}- ", file=output, end='')
+      print_nested_print(output, item, indent, prev_context="list")
+  elif isinstance(data, str):
+    if '\n' in data or '"' in data or prev_context == "code":
+      indent += 2
+      ind = ' ' * indent
+      data = data.replace("\n", f"\n{ind}")
+      print(f"|\n{ind}{data}", file=output)
+    elif prev_context in ["datatype", "inputtype", "field"]:
+      print(f"{data}", file=output)
+    else:
+      print(f"\"{data}\"", file=output)
+  elif isinstance(data, int) or isinstance(data, float):
+    print(f"{data}", file=output)
+  else:
+    print(f"{data}", file=output)
+
+def print_to_yaml(objs):
+  output = io.StringIO()
+  for obj in objs:
+    print("---", file=output)
+    print_nested_print(output, obj, indent=0)
+  return output.getvalue()
+
+def make_blocks(n):
+  """Blocks shaped like the question screens the converters make"""
+  blocks = [{"metadata": {"title": "Benchmark", "authors": [{"name": "A", "email": "a@example.com"}]}}]
+  for idx in range(n):
+    blocks.append({
+      "id": f"page_{idx}",
+      "question": f"Question {idx}",
+      "subquestion": f"Some **bold** text for {idx}.\n\n* one\n* two\n\nAnd a \"quote\".",
+      "continue button field": f"page_{idx}",
+      "fields": [
+        {"label": f"Label {idx} {k}", "field": f"field_{idx}_{k}", "datatype": "text", "input type": "area"}
+        for k in range(4)
+      ] + [{"label": "Pick one", "field": f"choice_{idx}", "datatype": "radio", "choices": ["Yes", "No", {"Maybe": "maybe"}]}],
+      "mandatory": True,
+    })
+    if idx % 10 == 0:
+      blocks.append({"id": f"comp_{idx}", "code": f"def comp_{idx}():\n  return '''tmp'''"})
+  return blocks
+
+def best_of(func, arg, repeat=3):
+  best = None
+  for _ in range(repeat):
+    start = time.perf_counter()
+    result = func(arg)
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None else min(best, elapsed)
+  return best, result
+
+def main():
+  print(f"{'blocks':>8} {'print (s)':>10} {'buffered (s)':>13} {'speedup':>8} {'MB':>6}")
+  for n in [1000, 5000, 20000]:
+    blocks = make_blocks(n)
+    old_time, old_yaml = best_of(print_to_yaml, blocks)
+    new_time, new_yaml = best_of(to_yaml, blocks)
+    assert old_yaml == new_yaml
+    print(f"{len(blocks):>8} {old_time:>10.3f} {new_time:>13.3f} {old_time / new_time:>7.1f}x {len(new_yaml) / 1e6:>6.1f}")
+
+if __name__ == "__main__":
+  main()
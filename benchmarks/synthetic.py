@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""Builds synthetic A2J guides and HotDocs component libraries, of any size, for benchmarks.
+
+The interviews are shaped like real ones: pages with fields, buttons, and HTML text, and
+libraries with dialogs of text, number, true / false and multiple choice variables,
+computations, dialog elements, and «» chevron markup referencing all of them. The same
+arguments and seed always build the same files.
+
+Run `python benchmarks/synthetic.py OUT_DIR --pages 1000 --dialogs 500 --zip` to write
+`OUT_DIR/Guide.xml` and a HotDocs package in `OUT_DIR/library` (and `OUT_DIR/library.zip`).
+"""
+
+import argparse
+import json
+import os
+import random
+import zipfile
+from xml.sax.saxutils import escape, quoteattr
+
+from lxml import etree
+
+hd_ns = "http://www.hotdocs.com/schemas/component_library/2009"
+
+a2j_field_types = ["text", "textlong", "numberdollar", "number", "datemdy", "textpick", "radio", "numberzip", "numberphone"]
+choice_pool = [
+  ["Yes", "No"],
+  ["Yes", "No", "I don't know"],
+  ["Single", "Married", "Divorced", "Widowed"],
+  ["Monthly", "Weekly", "Every two weeks"],
+  ["Plaintiff", "Defendant"],
+]
+
+def page_name(idx):
+  return f"{idx + 1}-Page {idx}"
+
+def a2j_text(rng, idx, markup):
+  """The HTML-ish text of a page; there's always text before the first tag"""
+  text = f"Question {idx} about %%Var {idx % 50} TE%%\n"
+  if markup:
+    text += (f"<P>Some <STRONG>bold</STRONG> and <EM>em</EM> text, with "
+             f"<A HREF=\"https://example.com/{idx}\">a <STRONG>link</STRONG></A>.</P>\n")
+    if rng.random() < 0.5:
+      text += "<UL><LI>first <EM>item</EM></LI><LI>second item</LI></UL>\n"
+    if rng.random() < 0.3:
+      text += "<OL><LI>one</LI><LI>two</LI><LI>three</LI></OL>\n"
+  return text
+
+def a2j_guide_xml(num_pages, fields_per_page=3, markup=True, seed=0) -> str:
+  rng = random.Random(seed)
+  parts = [
+    "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n<TEMPLATE>\n<INFO>"
+    "<AUTHORS><AUTHOR><NAME>Synthetic Author</NAME><EMAIL>author@example.com</EMAIL></AUTHOR></AUTHORS>"
+    "<DESCRIPTION>A synthetic guide</DESCRIPTION><NOTES>Generated</NOTES><EMAILCONTACT>contact@example.com</EMAILCONTACT>"
+    f"<TITLE>Synthetic guide, {num_pages} pages</TITLE><FIRSTPAGE>{page_name(0)}</FIRSTPAGE></INFO>\n<PAGES>\n"
+  ]
+  for idx in range(num_pages):
+    parts.append(f"<PAGE NAME={quoteattr(page_name(idx))} TYPE=\"A2J\" STEP=\"{idx % 5}\" MAPX=\"{idx}\" MAPY=\"0\">\n")
+    parts.append(f"<TEXT>{a2j_text(rng, idx, markup)}</TEXT>\n")
+    if rng.random() < 0.3:
+      parts.append(f"<HELP>Help for {idx}\n<P>More help, with &quot;quotes&quot;.</P>\n</HELP>\n")
+    if rng.random() < 0.2:
+      parts.append(f"<LEARN>Learn more about {idx}\n</LEARN>\n")
+    parts.append("<FIELDS>")
+    for field_idx in range(rng.randint(0, fields_per_page * 2)):
+      field_type = rng.choice(a2j_field_types)
+      parts.append(f"<FIELD TYPE=\"{field_type}\" REQUIRED=\"{rng.choice(['true', 'false'])}\">"
+                   f"<NAME>Field {idx} {field_idx} TE</NAME><LABEL>Label {field_idx} for page {idx}</LABEL>")
+      if field_type in ("textpick", "radio"):
+        options = rng.choice(choice_pool)
+        parts.append("<LISTDATA>" + "".join(f"<OPTION VALUE={quoteattr(opt)}>{escape(opt)}</OPTION>" for opt in options) + "</LISTDATA>")
+      parts.append("</FIELD>")
+    parts.append("</FIELDS>\n<BUTTONS>")
+    next_name = page_name(idx + 1) if idx + 1 < num_pages else ""
+    parts.append(f"<BUTTON NEXT={quoteattr(next_name)}><LABEL>Continue</LABEL><NAME>Button {idx}</NAME><VALUE>yes</VALUE></BUTTON>")
+    if num_pages > 1 and rng.random() < 0.2:
+      # Branches, sometimes back to an earlier page
+      parts.append(f"<BUTTON NEXT={quoteattr(page_name(rng.randrange(num_pages)))}><LABEL>Other</LABEL></BUTTON>")
+    parts.append("</BUTTONS>\n</PAGE>\n")
+  parts.append("</PAGES>\n<STEPS>")
+  parts.extend(f"<STEP NUMBER=\"{step}\"><TEXT>Step {step}</TEXT></STEP>" for step in range(5))
+  parts.append("</STEPS>\n<VARIABLES>")
+  parts.extend(f"<VARIABLE NAME=\"Var {var_idx} TE\" TYPE=\"Text\"/>" for var_idx in range(min(num_pages, 50)))
+  parts.append("</VARIABLES>\n</TEMPLATE>\n")
+  return "".join(parts)
+
+def inner_xml(elem):
+  """Everything inside an element, as the HTML string Guide.json has for it"""
+  if elem is None:
+    return ""
+  return escape(elem.text or "") + "".join(etree.tostring(child, encoding="unicode") for child in elem)
+
+def child_text(elem, tag):
+  child = elem.find(tag)
+  return (child.text or "") if child is not None else ""
+
+def a2j_guide_json(guide_xml: str) -> str:
+  """The Guide.json that A2J writes next to a Guide.xml: the same guide, in its JSON shape"""
+  root = etree.fromstring(guide_xml.encode("utf-8"))
+  info = root.find("INFO")
+  guide = {
+    "tool": "A2J",
+    "authors": [{child.tag.lower(): child.text or "" for child in author} for author in info.find("AUTHORS")],
+    "description": child_text(info, "DESCRIPTION"),
+    "notes": child_text(info, "NOTES"),
+    "emailContact": child_text(info, "EMAILCONTACT"),
+    "title": child_text(info, "TITLE"),
+    "firstPage": child_text(info, "FIRSTPAGE"),
+    "pages": {},
+    "steps": [{"number": step.get("NUMBER"), "text": child_text(step, "TEXT")} for step in root.find("STEPS")],
+    "vars": {var.get("NAME").lower(): {"name": var.get("NAME"), "type": var.get("TYPE"), "repeating": False, "comment": ""}
+             for var in root.find("VARIABLES")},
+  }
+  for page in root.find("PAGES"):
+    guide["pages"][page.get("NAME")] = {
+      "name": page.get("NAME"),
+      "type": page.get("TYPE"),
+      "step": int(page.get("STEP")),
+      "mapx": int(page.get("MAPX")),
+      "mapy": int(page.get("MAPY")),
+      "text": inner_xml(page.find("TEXT")),
+      "help": inner_xml(page.find("HELP")),
+      "learn": inner_xml(page.find("LEARN")),
+      "helpImageURL": "",
+      "codeBefore": "",
+      "codeAfter": "",
+      "buttons": [{"label": child_text(button, "LABEL"), "next": button.get("NEXT"), "url": "",
+                   "name": child_text(button, "NAME"), "value": child_text(button, "VALUE")}
+                  for button in page.find("BUTTONS")],
+      "fields": [{"type": field.get("TYPE"), "label": child_text(field, "LABEL"), "name": child_text(field, "NAME"),
+                  "value": "", "required": field.get("REQUIRED") == "true", "invalidPrompt": "", "order": "",
+                  "min": "", "max": "", "calculator": False, "listSrc": "", "listData": inner_xml(field.find("LISTDATA"))}
+                 for field in page.find("FIELDS")],
+    }
+  # Written without whitespace, like A2J does
+  return json.dumps(guide, separators=(",", ":"))
+
+def hotdocs_prompt(rng, name, other_names, computations, markup):
+  prompt = f"What is the {escape(name)}?"
+  if not markup:
+    return prompt
+  if other_names and rng.random() < 0.5:
+    prompt += f" It's about «{escape(rng.choice(other_names))}»."
+  if computations and rng.random() < 0.3:
+    condition = rng.choice(computations)
+    prompt += f"«IF {escape(condition)}» Only sometimes.«END IF»"
+  if rng.random() < 0.3:
+    prompt += " «.b»Important«.be», «.i»really«.ie»."
+  if rng.random() < 0.1:
+    prompt += " See «.w \"https://example.com\"»the «.u»site«.ue»«.we»."
+  return prompt
+
+def hotdocs_library_xml(num_dialogs, vars_per_dialog=5, mc_ratio=0.25, computations_per_dialog=1, markup=True, seed=0) -> str:
+  """The master component file of a library with `num_dialogs` dialogs"""
+  rng = random.Random(seed)
+  parts = [
+    f"<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n<hd:componentLibrary xmlns:hd=\"{hd_ns}\" version=\"12\">"
+    "<hd:preferences><hd:preference name=\"CUSTOM_INTERVIEW\">Main Interview CO</hd:preference>"
+    f"<hd:preference name=\"TEMPLATE_TITLE\">Synthetic library, {num_dialogs} dialogs</hd:preference></hd:preferences>\n<hd:components>\n"
+  ]
+  var_names = []
+  computations = []
+  for dialog_idx in range(num_dialogs):
+    for comp_idx in range(computations_per_dialog):
+      comp_name = f"Comp {dialog_idx} {comp_idx} CO"
+      script = f"IF {var_names[-1]} = TRUE\n  ASK Dialog {dialog_idx}\nEND IF" if var_names else f"ASK Dialog {dialog_idx}"
+      parts.append(f"<hd:computation name={quoteattr(comp_name)} resultType=\"trueFalse\"><hd:script>{escape(script)}</hd:script></hd:computation>\n")
+      computations.append(comp_name)
+    items = []
+    if rng.random() < 0.5:
+      elem_name = f"Elem {dialog_idx}"
+      caption = f"Instructions for dialog {dialog_idx}."
+      if markup:
+        caption += f" «.b»Read carefully«.be»; see «{escape(rng.choice(var_names))}»." if var_names else " «.b»Read carefully«.be»."
+      parts.append(f"<hd:dialogElement name={quoteattr(elem_name)}><hd:caption>{caption}</hd:caption></hd:dialogElement>\n")
+      items.append(elem_name)
+    for var_idx in range(vars_per_dialog):
+      base = f"Var {dialog_idx} {var_idx}"
+      prompt = hotdocs_prompt(rng, base, var_names, computations, markup)
+      if rng.random() < mc_ratio:
+        name = base + " MC"
+        options = "".join(f"<hd:option name={quoteattr(opt)}/>" for opt in rng.choice(choice_pool))
+        style = "<hd:singleSelection style=\"dropDownList\"/>" if rng.random() < 0.5 else ""
+        parts.append(f"<hd:multipleChoice name={quoteattr(name)}><hd:prompt>{prompt}</hd:prompt><hd:options>{options}</hd:options>{style}</hd:multipleChoice>\n")
+      else:
+        kind = var_idx % 3
+        if kind == 0:
+          name = base + " TE"
+          parts.append(f"<hd:text name={quoteattr(name)}><hd:prompt>{prompt}</hd:prompt>"
+                       f"<hd:resource><hd:text>Help for «.i»{escape(base)}«.ie»</hd:text></hd:resource></hd:text>\n")
+        elif kind == 1:
+          name = base + " NU"
+          currency = " decimalPlaces=\"2\" currencySymbol=\"$\"" if rng.random() < 0.5 else ""
+          parts.append(f"<hd:number name={quoteattr(name)}{currency}><hd:prompt>{prompt}</hd:prompt></hd:number>\n")
+        else:
+          name = base + " TF"
+          parts.append(f"<hd:trueFalse name={quoteattr(name)} yesNoOnSameLine=\"true\"><hd:prompt>{prompt}</hd:prompt></hd:trueFalse>\n")
+      var_names.append(name)
+      items.append(name)
+    title = f"Dialog {dialog_idx}"
+    if markup and var_names:
+      title += f" for «{escape(rng.choice(var_names))}»"
+    contents = "".join(f"<hd:item name={quoteattr(item)}/>" for item in items)
+    parts.append(f"<hd:dialog name=\"Dialog {dialog_idx}\" linkVariables=\"true\"><hd:title>{title}</hd:title>"
+                 f"<hd:contents>{contents}</hd:contents></hd:dialog>\n")
+  main_script = "\n".join(f"ASK Dialog {dialog_idx}" for dialog_idx in range(num_dialogs))
+  parts.append(f"<hd:computation name=\"Main Interview CO\" resultType=\"none\"><hd:script>{escape(main_script)}</hd:script></hd:computation>\n")
+  parts.append("</hd:components>\n</hd:componentLibrary>\n")
+  return "".join(parts)
+
+def pointer_cmp_xml(master_name):
+  """A template's component file, that points to the shared master file"""
+  return (f"<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n<hd:componentLibrary xmlns:hd=\"{hd_ns}\" version=\"12\" "
+          f"pointedToFile={quoteattr(master_name)}><hd:components/></hd:componentLibrary>\n")
+
+def write_a2j(out_dir, num_pages, with_json=False, **kwargs) -> str:
+  """Writes `out_dir/Guide.xml` (and `out_dir/Guide.json` too, if `with_json`), and
+  returns the path of the XML
+  """
+  os.makedirs(out_dir, exist_ok=True)
+  path = os.path.join(out_dir, "Guide.xml")
+  guide_xml = a2j_guide_xml(num_pages, **kwargs)
+  with open(path, "w", encoding="utf-8") as f:
+    f.write(guide_xml)
+  if with_json:
+    with open(os.path.join(out_dir, "Guide.json"), "w", encoding="utf-8") as f:
+      f.write(a2j_guide_json(guide_xml))
+  return path
+
+def write_hotdocs(out_path, num_dialogs, as_zip=False, **kwargs) -> str:
+  """Writes a HotDocs package (a master file and a template file pointing to it) as a
+  directory, or a zip if `as_zip`, and returns its path
+  """
+  master = hotdocs_library_xml(num_dialogs, **kwargs)
+  pointer = pointer_cmp_xml("master.cmp")
+  if as_zip:
+    package_name = os.path.basename(out_path)
+    if package_name.endswith(".zip"):
+      package_name = package_name[:-len(".zip")]
+    with zipfile.ZipFile(out_path, "w", zipfile.ZIP_DEFLATED) as package:
+      package.writestr(f"{package_name}/template.cmp", pointer)
+      package.writestr(f"{package_name}/master.cmp", master)
+    return out_path
+  os.makedirs(out_path, exist_ok=True)
+  with open(os.path.join(out_path, "master.cmp"), "w", encoding="utf-8") as f:
+    f.write(master)
+  with open(os.path.join(out_path, "template.cmp"), "w", encoding="utf-8") as f:
+    f.write(pointer)
+  return out_path
+
+def main():
+  parser = argparse.ArgumentParser(description="Writes a synthetic A2J guide and HotDocs package")
+  parser.add_argument("out_dir")
+  parser.add_argument("--pages", type=int, default=1000, help="A2J pages (0 to skip the guide)")
+  parser.add_argument("--fields", type=int, default=3, help="average fields per A2J page")
+  parser.add_argument("--dialogs", type=int, default=500, help="HotDocs dialogs (0 to skip the library)")
+  parser.add_argument("--vars-per-dialog", type=int, default=5)
+  parser.add_argument("--mc-ratio", type=float, default=0.25, help="share of HotDocs variables that are multiple choice")
+  parser.add_argument("--computations", type=int, default=1, help="HotDocs computations per dialog")
+  parser.add_argument("--no-markup", action="store_true", help="leave out HTML and «» markup")
+  parser.add_argument("--zip", action="store_true", help="also write the HotDocs package as a zip")
+  parser.add_argument("--seed", type=int, default=0)
+  args = parser.parse_args()
+  markup = not args.no_markup
+  if args.pages:
+    print(write_a2j(args.out_dir, args.pages, fields_per_page=args.fields, markup=markup, seed=args.seed))
+  if args.dialogs:
+    hotdocs_args = {"vars_per_dialog": args.vars_per_dialog, "mc_ratio": args.mc_ratio,
+                    "computations_per_dialog": args.computations, "markup": markup, "seed": args.seed}
+    print(write_hotdocs(os.path.join(args.out_dir, "library"), args.dialogs, **hotdocs_args))
+    if args.zip:
+      print(write_hotdocs(os.path.join(args.out_dir, "library.zip"), args.dialogs, as_zip=True, **hotdocs_args))
+
+if __name__ == "__main__":
+  main()
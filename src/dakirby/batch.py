@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""Converting many interviews at once, spread over a pool of processes"""
+
+import glob
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+from typing import Iterable, Iterator, NamedTuple
+
+from .core.common import cmp_paths
+from .core.docassemble import YamlAnchors, to_yaml
+from .cache import InterviewCache, DEFAULT_MAX_BYTES
+from .profile import Profiler, interview_counts, phase
+
+class BatchResult(NamedTuple):
+  input_path: str
+  output_path: str
+  error: str | None
+  elapsed: float
+  cache_hit: bool | None = None
+  profile: dict | None = None
+  pruned: dict | None = None
+  anchors: dict | None = None
+  split: dict | None = None
+
+def is_a2j_input(input_path):
+  return input_path.endswith(("Guide.xml", "Guide.json"))
+
+def is_hotdocs_input(input_path):
+  return os.path.isdir(input_path) or input_path.endswith(".zip")
+
+def load_interview(input_path, cache: InterviewCache | None = None):
+  """Builds the right interview object for the given input path, or gets it from `cache`"""
+  if cache is not None:
+    return cache.load(input_path, load_interview)
+  # Front ends are imported as they're needed, so converting one kind of input doesn't load the other
+  if input_path.endswith("Guide.json"):
+    from .core.a2jauthor_json import A2JJsonInterview
+    return A2JJsonInterview(input_path)
+  elif is_a2j_input(input_path):
+    from .core.a2jauthor import A2JInterview
+    return A2JInterview(input_path)
+  elif is_hotdocs_input(input_path):
+    # Assuming Hotdocs for now
+    from .core.hotdocs import HotDocsInterview
+    return HotDocsInterview(input_path)
+  raise ValueError(f"Don't recognize the input file type: {input_path}")
+
+def load_selection(input_path, names):
+  """Builds only the named A2J pages, or HotDocs components and what they reference"""
+  from .selective import SelectiveA2JInterview, SelectiveA2JJsonInterview, SelectiveHotDocsInterview
+  if input_path.endswith("Guide.json"):
+    interview = SelectiveA2JJsonInterview(input_path)
+  elif is_a2j_input(input_path):
+    interview = SelectiveA2JInterview(input_path)
+  elif is_hotdocs_input(input_path):
+    interview = SelectiveHotDocsInterview(input_path)
+  else:
+    raise ValueError(f"Don't recognize the input file type: {input_path}")
+  missing = interview.select(names)
+  if missing:
+    raise ValueError(f"Not found in {input_path}: {', '.join(missing)}")
+  return interview
+
+def convert_interview(input_path, output=None, cache: InterviewCache | None = None, prune=False, only=None,
+                      anchors=False, split=False, measure_prune=False):
+  """Loads an input and writes its YAML to `output`, if given.
+
+  With `only`, a list of names, just those pages or components are converted (see
+  `load_selection`), and `cache` isn't used. With `prune`, pages and components that
+  nothing leads to are left out (and with `measure_prune`, the report has how much smaller
+  the YAML got, which costs making it two extra times). With `anchors`, repeats within a block are written as
+  YAML aliases. With `split`, `output` is the path of a main file, and the YAML is split
+  into files next to it (see `dakirby.split`). Returns the interview, and a dict with the
+  "prune", "anchors" and "split" reports of the options that were used.
+  """
+  if only:
+    interview = load_selection(input_path, only)
+  else:
+    interview = load_interview(input_path, cache)
+  reports = {}
+  if prune:
+    from .core.prune import prune as prune_interview
+    with phase("prune"):
+      reports["prune"] = prune_interview(interview, measure_prune)
+  yaml_anchors = YamlAnchors() if anchors else None
+  with phase("emit"):
+    if split:
+      from .split import split_report, write_split
+      reports["split"] = split_report(write_split(interview, output, yaml_anchors))
+    else:
+      to_yaml(interview.iter_yaml_objs(), output, yaml_anchors)
+  if yaml_anchors is not None:
+    reports["anchors"] = yaml_anchors.report()
+  return interview, reports
+
+def profile_conversion(input_path, output=None, cache: InterviewCache | None = None, track_memory=True, prune=False,
+                       only=None, anchors=False, split=False) -> dict:
+  """Converts an input (writing the YAML to `output`, if given) while recording the time
+  and peak memory of each phase, and returns that report with counts of what was converted
+  """
+  with Profiler(track_memory) as profiler:
+    interview, reports = convert_interview(input_path, output, cache, prune, only, anchors, split,
+                                           measure_prune=True)
+  profiler.counts.update(interview_counts(interview))
+  return {"input": input_path} | profiler.report() | reports
+
+def _is_hotdocs_dir(dir_path):
+  return bool(cmp_paths(dir_path))
+
+def _walk_inputs(dir_path):
+  for root, dirs, files in os.walk(dir_path):
+    dirs.sort()
+    if root != dir_path and _is_hotdocs_dir(root):
+      yield root
+      # Everything under a HotDocs package belongs to that package
+      dirs.clear()
+      continue
+    for name in sorted(files):
+      # A Guide.json is only read when it's asked for by name (see docs/a2j_structure.md)
+      if name.endswith(("Guide.xml", ".zip")):
+        yield os.path.join(root, name)
+
+def expand_inputs(patterns: Iterable[str]) -> list[str]:
+  """Turns files, directories, and glob patterns into a list of convertible inputs.
+
+  A directory that directly holds `.cmp` files is a HotDocs package; any other
+  directory is searched for A2J guides, HotDocs zips, and HotDocs package directories.
+  """
+  inputs = []
+  seen = set()
+  for pattern in patterns:
+    if glob.has_magic(pattern):
+      matches = sorted(glob.glob(pattern, recursive=True))
+    else:
+      matches = [pattern]
+    for match in matches:
+      if os.path.isdir(match) and not _is_hotdocs_dir(match):
+        found = list(_walk_inputs(match))
+      else:
+        found = [match]
+      for path in found:
+        path = os.path.normpath(path)
+        if path not in seen:
+          seen.add(path)
+          inputs.append(path)
+  return inputs
+
+def output_name(input_path):
+  """The name of the YAML file for an input, without the output directory"""
+  input_path = os.path.normpath(input_path)
+  if is_a2j_input(input_path):
+    # Guides are always "Guide.xml" or "Guide.json", the folder they're in has the real name
+    base = os.path.basename(os.path.dirname(os.path.abspath(input_path)))
+    prefix = os.path.basename(input_path).rsplit("Guide.", 1)[0]
+    base = prefix.rstrip("_- .") or base
+  else:
+    base = os.path.basename(input_path)
+    if base.endswith(".zip"):
+      base = base[:-len(".zip")]
+  return (base or "interview") + ".yml"
+
+def plan_outputs(inputs: Iterable[str], output_dir: str, split=False) -> list[tuple[str, str]]:
+  """Pairs each input with a unique output path in `output_dir`.
+
+  With `split`, main files don't have a "." before the ".yml", so they can't have the
+  name of any interview's part files (see `dakirby.split`).
+  """
+  taken = set()
+  plan = []
+  for input_path in inputs:
+    name = output_name(input_path)
+    stem = name[:-len(".yml")]
+    if split:
+      stem = stem.replace(".", "_")
+      name = stem + ".yml"
+    idx = 2
+    while name in taken:
+      name = f"{stem}_{idx}.yml"
+      idx += 1
+    taken.add(name)
+    plan.append((input_path, os.path.join(output_dir, name)))
+  return plan
+
+def convert_to_file(input_path, output_path, cache_dir=None, cache_max_bytes=None, profile=False, prune=False,
+                    anchors=False, split=False) -> BatchResult:
+  """Converts a single input, catching any failure so the rest of a batch can keep going.
+  With `split`, `output_path` is the main file of the split YAML.
+  """
+  start = time.perf_counter()
+  cache = InterviewCache(cache_dir, cache_max_bytes or DEFAULT_MAX_BYTES) if cache_dir else None
+  report = None
+  try:
+    with (nullcontext(output_path) if split else open(output_path, "w")) as output:
+      if profile:
+        report = profile_conversion(input_path, output, cache, prune=prune, anchors=anchors, split=split)
+        reports = report
+      else:
+        _, reports = convert_interview(input_path, output, cache, prune, anchors=anchors, split=split)
+  except Exception:
+    return BatchResult(input_path, output_path, traceback.format_exc(limit=3), time.perf_counter() - start)
+  cache_hit = cache.stats["hits"] > 0 if cache else None
+  return BatchResult(input_path, output_path, None, time.perf_counter() - start, cache_hit, report,
+                     reports.get("prune"), reports.get("anchors"), reports.get("split"))
+
+def convert_all(inputs: Iterable[str], output_dir: str, jobs: int | None = None,
+                cache_dir: str | None = None, cache_max_bytes: int | None = None,
+                profile: bool = False, prune: bool = False, anchors: bool = False,
+                split: bool = False) -> Iterator[BatchResult]:
+  """Converts every input into `output_dir`, yielding results as they finish.
+
+  `jobs` is the number of worker processes; `None` uses one per core, and 1 runs
+  everything in this process. With a `cache_dir`, parsed interviews are reused
+  from (and saved to) an `InterviewCache` there. With `profile`, each result has a
+  `profile_conversion` report, with `prune`, unreachable blocks are left out, with
+  `anchors`, repeats within a block are written as YAML aliases, and with `split`, each
+  interview's YAML is split into several files (see `dakirby.split`).
+  """
+  os.makedirs(output_dir, exist_ok=True)
+  plan = plan_outputs(inputs, output_dir, split)
+  if jobs == 1 or len(plan) <= 1:
+    for input_path, output_path in plan:
+      yield convert_to_file(input_path, output_path, cache_dir, cache_max_bytes, profile, prune, anchors, split)
+    return
+  with ProcessPoolExecutor(max_workers=jobs) as executor:
+    futures = [executor.submit(convert_to_file, input_path, output_path, cache_dir, cache_max_bytes, profile, prune,
+                               anchors, split)
+               for input_path, output_path in plan]
+    for future in as_completed(futures):
+      yield future.result()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""An on-disk cache of parsed interviews, keyed by what's in their input files"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+import time
+import zlib
+from importlib import metadata
+
+from .core.common import cmp_paths
+from .profile import phase
+
+# Bump when parsing output changes: what the pickled interview classes hold, or how
+# anything in them (like page text) is converted
+CACHE_FORMAT = 7
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+def dakirby_version():
+  try:
+    return metadata.version("dakirby")
+  except metadata.PackageNotFoundError:
+    return "unknown"
+
+def input_files(input_path) -> list[str]:
+  """Every file that a conversion of `input_path` reads"""
+  if os.path.isdir(input_path):
+    return cmp_paths(input_path)
+  return [input_path]
+
+class InterviewCache:
+  """Stores parsed `A2JInterview` / `HotDocsInterview` objects in `cache_dir`.
+
+  Entries are pickled and compressed, and named by a hash of the input files' contents
+  and the dakirby version, so a changed input or a new release never gets a stale entry.
+  When the cache grows past `max_bytes`, the least recently used entries are removed.
+
+  Loading an entry unpickles it, which can run any code that was put in the file, so
+  anyone who can write to `cache_dir` can run code as whoever uses the cache. The
+  directory is made readable and writable only by its owner when it's created here.
+  """
+
+  suffix = ".interview"
+  tmp_suffix = ".tmp"
+  # A temporary file last written this long ago was left by a `put` that crashed; it's
+  # counted and evicted like an entry
+  stale_tmp_seconds = 60 * 60
+
+  def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+    self.cache_dir = cache_dir
+    self.max_bytes = max_bytes
+    self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+    os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+
+  def key_for(self, input_path, options=None) -> str:
+    digest = hashlib.sha256(f"{CACHE_FORMAT}\0{dakirby_version()}\0{options or ''}\0".encode())
+    for file_path in input_files(input_path):
+      digest.update(os.path.basename(file_path).encode() + b"\0")
+      with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+          digest.update(chunk)
+      digest.update(b"\0")
+    return digest.hexdigest()
+
+  def entry_path(self, key):
+    return os.path.join(self.cache_dir, key + self.suffix)
+
+  def get(self, key):
+    path = self.entry_path(key)
+    try:
+      with open(path, "rb") as f, phase("cache read"):
+        interview = pickle.loads(zlib.decompress(f.read()))
+    except (OSError, zlib.error, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+      self.stats["misses"] += 1
+      return None
+    # Mark it as recently used, for eviction. Another process may have evicted it since
+    # it was read, which is fine: it's already loaded
+    try:
+      os.utime(path)
+    except OSError:
+      pass
+    self.stats["hits"] += 1
+    return interview
+
+  def put(self, key, interview):
+    with phase("cache write"):
+      data = zlib.compress(pickle.dumps(interview, protocol=pickle.HIGHEST_PROTOCOL), 1)
+      fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=self.tmp_suffix)
+      try:
+        with os.fdopen(fd, "wb") as f:
+          f.write(data)
+        os.replace(tmp_path, self.entry_path(key))
+      except BaseException:
+        try:
+          os.remove(tmp_path)
+        except OSError:
+          pass
+        raise
+    self.stats["stores"] += 1
+    self.evict()
+
+  def load(self, input_path, loader, options=None):
+    """Returns the cached interview for `input_path`, or calls `loader(input_path)` and caches that"""
+    key = self.key_for(input_path, options)
+    interview = self.get(key)
+    if interview is None:
+      interview = loader(input_path)
+      self.put(key, interview)
+    return interview
+
+  def entries(self):
+    """(path, size, last used) of every entry, and every temporary file a crashed `put`
+    left behind, least recently used first.
+
+    Other processes sharing the cache can remove files while they're listed; those are
+    left out.
+    """
+    found = []
+    stale_before = time.time() - self.stale_tmp_seconds
+    for entry in os.scandir(self.cache_dir):
+      is_entry = entry.name.endswith(self.suffix)
+      if not (is_entry or entry.name.endswith(self.tmp_suffix)):
+        continue
+      try:
+        stat = entry.stat()
+      except FileNotFoundError:
+        continue
+      if is_entry or stat.st_mtime < stale_before:
+        found.append((entry.path, stat.st_size, stat.st_mtime))
+    return sorted(found, key=lambda entry: entry[2])
+
+  def size(self):
+    return sum(size for _, size, _ in self.entries())
+
+  def evict(self):
+    entries = self.entries()
+    total = sum(size for _, size, _ in entries)
+    for path, size, _ in entries:
+      if total <= self.max_bytes:
+        break
+      try:
+        os.remove(path)
+        self.stats["evictions"] += 1
+      except FileNotFoundError:
+        # Another process evicted it first
+        pass
+      total -= size
+
+  def invalidate(self, input_path=None, options=None):
+    """Removes the entry for `input_path`, or every entry if no path is given"""
+    if input_path is not None:
+      paths = [self.entry_path(self.key_for(input_path, options))]
+    else:
+      paths = [path for path, _, _ in self.entries()]
+    removed = 0
+    for path in paths:
+      try:
+        os.remove(path)
+        removed += 1
+      except FileNotFoundError:
+        pass
+    return removed
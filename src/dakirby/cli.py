@@ -1,27 +1,207 @@
 #! /usr/bin/env python3
 
-import sys
+import argparse
+import json
 import os
+import sys
+
+# Everything else is imported where it's used, so a conversion only loads the front end
+# it needs (see benchmarks/bench_startup.py)
+
+def parse_args(argv=None):
+  parser = argparse.ArgumentParser(prog="dakirby", description="Converts A2J and HotDocs interviews to docassemble YAML")
+  parser.add_argument("inputs", nargs="*",
+      help="A2J Guide.xml or Guide.json files, HotDocs directories or zips, directories to search, or glob patterns")
+  parser.add_argument("-o", "--output-dir",
+      help="write one YAML file per interview into this directory, instead of printing to stdout")
+  parser.add_argument("-j", "--jobs", type=int, default=None,
+      help="number of worker processes for batch conversion (default: one per core)")
+  parser.add_argument("--cache-dir",
+      help="reuse parsed interviews from this directory when their input files haven't changed")
+  parser.add_argument("--cache-max-mb", type=int, default=512,
+      help="remove the least recently used cache entries past this size (default: 512)")
+  parser.add_argument("--clear-cache", action="store_true",
+      help="remove everything in the cache directory before converting")
+  parser.add_argument("--watch", action="store_true",
+      help="keep running, and convert again (only what changed) whenever an input is saved")
+  parser.add_argument("--interval", type=float, default=0.5,
+      help="seconds between checks for changed inputs in --watch mode (default: 0.5)")
+  parser.add_argument("--profile", action="store_true",
+      help="report the wall time, CPU time and peak memory of each conversion phase, as JSON")
+  parser.add_argument("--profile-file", default="-", metavar="FILE",
+      help="write the --profile report to this file instead of stderr")
+  parser.add_argument("--page-graph", action="store_true",
+      help="for an A2J guide, also report (as JSON on stderr) unreachable pages, loops, and buttons to missing pages")
+  parser.add_argument("--prune", action="store_true",
+      help="leave out pages and components that nothing in the interview leads to, and report what was removed")
+  parser.add_argument("--anchors", action="store_true",
+      help="write a dict or list repeated within a YAML block once, and later copies as aliases to it")
+  parser.add_argument("--split", action="store_true",
+      help="with -o, split each interview's YAML into files by part (steps, dialogs, choices, computations), "
+           "included from a main file; unchanged files aren't rewritten")
+  parser.add_argument("--only", type=lambda names: [name.strip() for name in names.split(",") if name.strip()],
+      metavar="NAME,NAME",
+      help="convert only these A2J pages, or HotDocs dialogs or other components (and what they reference)")
+  parser.add_argument("--worker", action="store_true",
+      help="keep running, converting the jobs sent as JSON lines on stdin (see dakirby/worker.py)")
+  parser.add_argument("--worker-timeout", type=float, default=60.0, metavar="SECONDS",
+      help="in --worker mode, stop a conversion that takes longer than this (default: 60)")
+  parser.add_argument("--worker-memory-mb", type=int, default=None, metavar="MB",
+      help="in --worker mode, limit each worker process's address space to this size")
+  args = parser.parse_args(argv)
+  if args.worker and (args.inputs or args.watch or args.output_dir or args.profile or args.only is not None):
+    parser.error("--worker takes its inputs from stdin, and only works with -j, --cache-dir and the --worker options")
+  if args.only is not None and (args.watch or args.output_dir):
+    parser.error("--only works when converting a single interview to stdout")
+  if args.worker_timeout <= 0:
+    parser.error("--worker-timeout has to be more than 0")
+  if args.only is not None and args.cache_dir:
+    parser.error("--only doesn't use the cache, so can't be used with --cache-dir")
+  if args.prune and args.watch:
+    parser.error("--prune can't be used with --watch")
+  if args.anchors and args.watch:
+    parser.error("--anchors can't be used with --watch")
+  if args.split and (args.watch or not args.output_dir):
+    parser.error("--split needs an output directory (-o), and can't be used with --watch")
+  if args.profile and args.watch:
+    parser.error("--profile can't be used with --watch")
+  if args.page_graph and (args.watch or args.output_dir):
+    parser.error("--page-graph only works when converting a single guide to stdout")
+  if not args.inputs and not args.clear_cache and not args.worker:
+    parser.error("the following arguments are required: inputs")
+  if args.clear_cache and not args.cache_dir:
+    parser.error("--clear-cache needs --cache-dir")
+  return args
+
+def print_cache_stats(hits, misses):
+  print(f"Cache: {hits} hits, {misses} misses", file=sys.stderr)
 
-from .core.a2jauthor import A2JInterview
-from .core.hotdocs import HotDocsInterview
-from .core.docassemble import to_yaml
-
-def main():
-  input_path = sys.argv[1]
-  if input_path.endswith("Guide.xml"):
-    input_interview = A2JInterview(input_path)
-  elif os.path.isdir(input_path) or input_path.endswith(".zip"):
-    # Assuming Hotdocs for now
-    input_interview = HotDocsInterview(input_path)
+def print_reports(reports, prefix=""):
+  """Prints the summaries of a conversion's --prune, --anchors and --split reports, if it has them"""
+  if reports.get("prune"):
+    from .core.prune import summarize
+    print(prefix + summarize(reports["prune"]), file=sys.stderr)
+  if reports.get("anchors"):
+    from .core.docassemble import summarize_anchors
+    print(prefix + summarize_anchors(reports["anchors"]), file=sys.stderr)
+  if reports.get("split"):
+    from .split import summarize_split
+    print(prefix + summarize_split(reports["split"]), file=sys.stderr)
+
+def run_batch(args):
+  from .batch import convert_all, expand_inputs
+  from .profile import write_report
+  inputs = expand_inputs(args.inputs)
+  if not inputs:
+    print("No convertible inputs found", file=sys.stderr)
+    return 2
+  failed = 0
+  hits = 0
+  reports = []
+  for result in convert_all(inputs, args.output_dir, args.jobs, args.cache_dir, args.cache_max_mb * 1024 * 1024,
+                            profile=args.profile, prune=args.prune, anchors=args.anchors,
+                            split=args.split):
+    hits += bool(result.cache_hit)
+    if result.profile:
+      reports.append(result.profile)
+    if result.error:
+      failed += 1
+      print(f"FAIL {result.input_path} ({result.elapsed:.2f}s)\n{result.error}", file=sys.stderr)
+    else:
+      print(f"OK   {result.input_path} -> {result.output_path} ({result.elapsed:.2f}s)", file=sys.stderr)
+      print_reports({"prune": result.pruned, "anchors": result.anchors, "split": result.split}, "     ")
+  print(f"Converted {len(inputs) - failed} of {len(inputs)} interviews", file=sys.stderr)
+  if args.cache_dir:
+    print_cache_stats(hits, len(inputs) - failed - hits)
+  if args.profile:
+    write_report({"conversions": reports}, args.profile_file)
+  return 1 if failed else 0
+
+def run_watch(args):
+  from .batch import expand_inputs, plan_outputs
+  from .watch import watch
+  inputs = expand_inputs(args.inputs)
+  if not inputs:
+    print("No convertible inputs found", file=sys.stderr)
+    return 2
+  if args.output_dir:
+    os.makedirs(args.output_dir, exist_ok=True)
+    plan = plan_outputs(inputs, args.output_dir)
+  elif len(inputs) == 1:
+    plan = [(inputs[0], None)]
   else:
-    print("Don't recognize the input file type: {input_filename}")
-    exit(2)
+    print("Watching more than one input needs an output directory (-o)", file=sys.stderr)
+    return 2
+  try:
+    watch(plan, args.interval)
+  except KeyboardInterrupt:
+    pass
+  return 0
+
+def run_worker(args):
+  from .worker import WorkerPool, serve
+  memory_limit = args.worker_memory_mb * 1024 * 1024 if args.worker_memory_mb else None
+  pool = WorkerPool(args.jobs, args.worker_timeout, memory_limit, args.cache_dir, args.cache_max_mb * 1024 * 1024)
+  try:
+    serve(pool)
+  except KeyboardInterrupt:
+    pass
+  return 0
 
-  print(to_yaml(input_interview.to_yaml_objs()))
+def main(argv=None):
+  args = parse_args(argv)
+  cache = None
+  if args.cache_dir:
+    from .cache import InterviewCache
+    cache = InterviewCache(args.cache_dir, args.cache_max_mb * 1024 * 1024)
+  if args.clear_cache:
+    removed = cache.invalidate()
+    print(f"Removed {removed} cached interviews", file=sys.stderr)
+    if not args.inputs and not args.worker:
+      sys.exit(0)
+  if args.worker:
+    sys.exit(run_worker(args))
+  if args.watch:
+    sys.exit(run_watch(args))
+  if args.output_dir:
+    sys.exit(run_batch(args))
+
+  if len(args.inputs) > 1:
+    print("Converting more than one input needs an output directory (-o)", file=sys.stderr)
+    sys.exit(2)
+  input_path = args.inputs[0]
+  from .batch import convert_interview, profile_conversion
+  if args.profile:
+    from .profile import write_report
+    try:
+      reports = profile_conversion(input_path, sys.stdout, cache, prune=args.prune, only=args.only,
+                                   anchors=args.anchors)
+    except ValueError as ex:
+      print(ex)
+      sys.exit(2)
+    print()
+    print_reports(reports)
+    write_report({"conversions": [reports]}, args.profile_file)
+  else:
+    try:
+      input_interview, reports = convert_interview(input_path, sys.stdout, cache, args.prune, args.only,
+                                                   args.anchors)
+    except ValueError as ex:
+      print(ex)
+      sys.exit(2)
+    print()
+    print_reports(reports)
+    if args.page_graph:
+      if hasattr(input_interview, "page_graph"):
+        json.dump(input_interview.page_graph().report(), sys.stderr, indent=2)
+        print(file=sys.stderr)
+      else:
+        print("--page-graph only applies to A2J guides", file=sys.stderr)
+  if cache:
+    print_cache_stats(cache.stats["hits"], cache.stats["misses"])
 
 # TODO(brycew): next steps:
-# * build the page graph and make the mandatory code block
+# * output the page graph's mandatory code block (`PageGraph.mandatory_block`) by default
 # * add fields to the question blocks
 # * get more control of YAML output (force things to be "|", or flow, depending on the attr)
 # * Better Question headers (at least don't repeat the exact thing from the subquestion)
@@ -29,4 +209,4 @@ def main():
 # * learn more
 # * codebefore and after into mandatory block
 if __name__ == "__main__":
-  main()
\ No newline at end of file
+  main()
@@ -0,0 +1,32 @@
+"""The A2J and HotDocs front ends, and the docassemble output.
+
+Each name here is imported from its module the first time it's used, so importing
+`dakirby.core` doesn't load lxml, or a front end that a conversion doesn't need.
+"""
+
+import importlib
+
+# Where each name comes from
+_lazy_names = {
+  "A2JInterview": "a2jauthor",
+  "A2JJsonInterview": "a2jauthor_json",
+  "HotDocsInterview": "hotdocs",
+  "HotDocsMarkup": "hotdocs_markup",
+  "PageGraph": "page_graph",
+  "ZipPackage": "zip_package",
+  "to_yaml": "docassemble",
+  "varname": "common",
+}
+
+__all__ = list(_lazy_names)
+
+def __getattr__(name):
+  module_name = _lazy_names.get(name)
+  if module_name is None:
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+  value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+  globals()[name] = value
+  return value
+
+def __dir__():
+  return sorted(set(globals()) | set(_lazy_names))
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""Turning the HTML in A2J text (a page's text, help and learn more) into Markdown.
+
+Every element is visited once, with an explicit stack instead of recursion, and the
+Markdown is collected as a list of fragments that's joined once at the end. Paragraphs,
+bulleted and numbered lists, bold, italics, links, and underlined or FONT text (Markdown
+has neither, so only their text is kept) can be nested in each other to any depth.
+"""
+
+from itertools import count
+
+# What each kind of element turns into
+PARAGRAPH, BULLETS, NUMBERS, STRONG, EMPHASIS, LINK, PLAIN, BLOCK = range(8)
+block_kinds = frozenset([PARAGRAPH, BULLETS, NUMBERS, BLOCK])
+
+# A2J writes its tags in upper case; any other spelling is lower cased once (see
+# `tag_opening`). Anything unknown is a BLOCK
+tag_kinds = {
+  "p": PARAGRAPH, "ul": BULLETS, "ol": NUMBERS, "strong": STRONG, "b": STRONG, "em": EMPHASIS, "i": EMPHASIS,
+  "a": LINK, "u": PLAIN, "font": PLAIN, "span": PLAIN,
+}
+
+markers = {STRONG: "**", EMPHASIS: "*"}
+
+# How an element's children are read: raw text and blocks (like the TEXT element itself),
+# inline text with its newlines folded (a paragraph or list item), or list items
+IN_BLOCK, IN_INLINE, IN_LIST = range(3)
+
+# When the end of an element is written
+CLOSE_ALWAYS, CLOSE_IF_CONTENT, CLOSE_LINE = range(3)
+
+def opening(kind, mode):
+  """How an element of `kind` is read when it's in an element read in `mode`: how its
+  children are read, its start and end, and when its end is written
+  """
+  if kind == STRONG or kind == EMPHASIS:
+    return IN_INLINE, markers[kind], markers[kind], CLOSE_IF_CONTENT
+  elif kind == LINK:
+    # A link with an address gets its start and end when it's read
+    return IN_INLINE, "", "", CLOSE_IF_CONTENT
+  elif kind == BULLETS or kind == NUMBERS:
+    return IN_LIST, "", "\n" if mode == IN_BLOCK else "", CLOSE_ALWAYS
+  elif kind == PARAGRAPH and mode == IN_BLOCK:
+    return IN_INLINE, "", "\n\n", CLOSE_ALWAYS
+  elif mode == IN_BLOCK:
+    # FONT and the like stay in the block; anything else unknown ends its line
+    return IN_BLOCK, "", "" if kind == PLAIN else "\n", CLOSE_ALWAYS
+  # Inside inline text, anything else is only its text
+  return IN_INLINE, "", "", CLOSE_ALWAYS
+
+# For each mode, each tag's kind and `opening`, so reading an element is one lookup
+tag_openings = tuple({} for _ in range(3))
+
+def tag_opening(tag, mode):
+  kind = tag_kinds.get(tag.lower(), BLOCK)
+  found = tag_openings[mode][tag] = (kind,) + opening(kind, mode)
+  return found
+
+for _tag in list(tag_kinds):
+  for _mode in range(3):
+    tag_opening(_tag, _mode)
+    tag_opening(_tag.upper(), _mode)
+
+long_space = " " * 11
+
+def fold(text):
+  """Inline text is on one line"""
+  return text.replace("\n", " ").replace(long_space, " ")
+
+def starts_line(parts):
+  """If what's written next starts a line: the last part that isn't blank ends with a
+  newline, or nothing's been written yet
+  """
+  for idx in range(len(parts) - 1, -1, -1):
+    part = parts[idx].rstrip(" \t")
+    if part:
+      return part.endswith("\n")
+  return True
+
+def is_blank(parts, start):
+  """If nothing but whitespace has been written since `start`"""
+  for idx in range(start, len(parts)):
+    if parts[idx].strip():
+      return False
+  return True
+
+def has_text(parts, start):
+  """If anything's been written since `start`; it usually has, so this stops early"""
+  for idx in range(start, len(parts)):
+    if parts[idx]:
+      return True
+  return False
+
+def parse_text(text_elem):
+  """The Markdown for an element of A2J text, like a TEXT or HELP.
+
+  Text outside of paragraphs and lists is kept as it is, newlines and all. Paragraphs and
+  lists start on a new line, and paragraphs end with a blank line. List items each get a
+  line (indented two spaces per level of nesting, and numbered from 1 in a numbered
+  list), text that goes on in an item after a list in it is indented to match, and lists
+  end with an empty line.
+  """
+  if not len(text_elem):
+    return (text_elem.text or "") + (text_elem.tail or "")
+  parts = []
+  append = parts.append
+  if text_elem.text:
+    append(text_elem.text)
+  # Each open element: (its children, how they're read, the element, its kind, its end,
+  # when its end is written, len(parts) after its start, the indent of lists in it, and in
+  # a numbered list, its item numbers). Its children are read until one has children of
+  # its own, which is pushed; the rest are read once that one's done
+  stack = [(iter(text_elem), IN_BLOCK, text_elem, BLOCK, "", CLOSE_ALWAYS, 0, "", None)]
+  # Where the inline text that's being read (of a paragraph, or list item) starts in
+  # `parts`; it's folded onto one line all at once, when it ends
+  fold_from = -1
+  # After a list nested in a list item, where the indent of the item's text that goes on
+  # after it is
+  continued = -1
+  while stack:
+    frame = stack[-1]
+    children, mode, _, _, _, _, _, indent, numbers = frame
+    openings = tag_openings[mode]
+    for child in children:
+      tag = child.tag
+      if tag.__class__ is not str:
+        # A comment or processing instruction; only its tail is text
+        kind = PLAIN
+      elif mode == IN_LIST:
+        # Every element in a list is an item, on its own line
+        append(f"{indent}* " if numbers is None else f"{indent}{next(numbers)}. ")
+        text = child.text
+        if len(child):
+          fold_from = len(parts)
+          if text:
+            append(text)
+          stack.append((iter(child), IN_INLINE, child, BLOCK, "", CLOSE_LINE, 0, indent + "  ", None))
+          break
+        append(f"{fold(text)}\n" if text else "\n")
+        # The whitespace between items isn't text
+        continue
+      else:
+        kind, child_mode, start, close, when = openings.get(tag) or tag_opening(tag, mode)
+        if kind == LINK:
+          href = child.get("HREF") or child.get("href")
+          if href:
+            start, close = "[", f"]({href})"
+        elif child_mode == IN_LIST and mode == IN_INLINE:
+          # A list in a list item (or paragraph) starts on its own line, and takes up the
+          # rest of it; the text before it is done
+          for idx in range(fold_from, len(parts)):
+            parts[idx] = fold(parts[idx])
+          if continued >= 0 and is_blank(parts, continued):
+            # Only another list came after the last one; nothing to indent
+            for idx in range(continued, len(parts)):
+              parts[idx] = ""
+          continued = -1
+          if not starts_line(parts):
+            start = "\n"
+        elif mode == IN_BLOCK and (kind == PARAGRAPH or child_mode == IN_LIST) and not starts_line(parts):
+          # So do paragraphs and lists after other text
+          start = "\n"
+        text = child.text if child_mode != IN_LIST else None
+        if len(child):
+          if start:
+            append(start)
+          stack.append((iter(child), child_mode, child, kind, close, when, len(parts), indent,
+                        count(1) if kind == NUMBERS else None))
+          if child_mode == IN_INLINE and mode != IN_INLINE:
+            fold_from = len(parts)
+          if text:
+            append(text)
+          break
+        # Nothing in it but text, so it's done now
+        if text:
+          if child_mode == IN_INLINE and mode != IN_INLINE:
+            text = fold(text)
+          append(f"{start}{text}{close}")
+        elif when != CLOSE_IF_CONTENT and (start or close):
+          append(start + close)
+      tail = child.tail
+      # The whitespace between blocks isn't text
+      if tail and (kind not in block_kinds or tail.strip()):
+        append(tail)
+    else:
+      # Every child is done, so this element is too
+      stack.pop()
+      if not stack:
+        break
+      _, child_mode, elem, kind, close, when, start, _, _ = frame
+      mode = stack[-1][1]
+      if child_mode == IN_INLINE and mode != IN_INLINE:
+        # The end of a paragraph or list item's text
+        if continued >= 0 and is_blank(parts, continued):
+          # Nothing came after its last list; nothing to indent
+          for idx in range(continued, len(parts)):
+            parts[idx] = ""
+        elif fold_from < len(parts):
+          text = "".join(parts[fold_from:])
+          if "\n" in text or long_space in text:
+            parts[fold_from:] = [fold(text)]
+        fold_from = -1
+        continued = -1
+      if when == CLOSE_ALWAYS:
+        if close:
+          append(close)
+      elif when == CLOSE_LINE:
+        if not starts_line(parts):
+          append("\n")
+      elif has_text(parts, start):
+        append(close)
+      elif close:
+        # Nothing inside; leave out the start too, instead of an empty "****"
+        parts[start - 1] = ""
+      if child_mode == IN_LIST and mode == IN_INLINE:
+        # The text after a list in a list item goes on with the item, indented like the list
+        continued = len(parts)
+        append(stack[-1][7])
+        fold_from = len(parts)
+      tail = elem.tail
+      if tail and mode != IN_LIST and (kind not in block_kinds or tail.strip()):
+        append(tail)
+  return "".join(parts) + (text_elem.tail or "")
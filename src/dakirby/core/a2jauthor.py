@@ -1,46 +1,12 @@
 #!/usr/bin/env python3
 
 from lxml import etree
-from .common import varname, PageNode
-
-def parse_inline(inline_elem):
-  text = inline_elem.text or ""
-  for child in inline_elem:
-    if child.tag.lower() in ["strong", "b"]:
-      text += f"**{child.text}**"
-    elif child.tag.lower() in ["em", "i"]:
-      text += f"*{child.text}*"
-    elif child.tag.lower() in ["a"]:
-      text += f"[{parse_inline(child)}]({child.get('HREF') or child.get('href')})"
-    elif child.tag.lower() in ["u"]:
-      text += parse_inline(child)
-    else: # intentional: skip FONT
-      text += (child.text or "")
-    text += (child.tail or "")
-  return text.replace("\n", " ").replace("           ", " ")
-
-def parse_paragraph(para_elem):
-  return parse_inline(para_elem) + "\n\n"
-
-# TODO(brycew): keep track of `%%`, convert to var name and mako ${ }.
-def parse_text(text_elem):
-  text = text_elem.text
-  for html_elem in text_elem:
-    if html_elem.tag.lower() == "p":
-      text += parse_paragraph(html_elem)
-    elif html_elem.tag.lower() == "ul":
-      for list_item in html_elem:
-        text += f"* {parse_inline(list_item)}\n"
-      text += "\n"
-    elif html_elem.tag.lower() == "ol":
-      for idx, list_item in enumerate(html_elem):
-        text += f"{idx}. {parse_inline(list_item)}\n"
-      text += "\n"
-    else:
-      text += html_elem.text + "\n"
-  return text + text_elem.tail
+from .a2j_markup import parse_text
+from .common import LazyRegex, varname, discard_elem, phase, timed_reader, PageNode
+from .page_graph import PageGraph
 
 class Field:
+  __slots__ = ("name", "type", "label", "invalid_prompt", "order", "required", "min", "max", "value", "listdata", "listsrc")
   name: str
   type: str
   label: str | None
@@ -74,7 +40,7 @@ class Field:
     self.min = min
     self.max = max
     self.value = value
-    self.listdata = [(opt.get("VALUE"), opt.text) for opt in listdata] if listdata else []
+    self.listdata = tuple((opt.get("VALUE") or opt.get("value"), opt.text) for opt in listdata) if listdata is not None else ()
     self.listsrc = listsrc
 
   def get_datatype(self):
@@ -98,6 +64,20 @@ class Field:
       field["label above field"] = True
     return field
 
+# A2J's `%%name%%` and `%%[name]%%` macros, which show a variable's value
+macro_re = LazyRegex(r"%%(?:\[([^\[\]%\n]+)\]|([^\[\]%\n]+))%%")
+
+class Variable:
+  """A variable from the guide's VARIABLES table"""
+  __slots__ = ("name", "da_name", "type", "repeating", "comment")
+
+  def __init__(self, name, type=None, repeating=False, comment=None):
+    self.name = name
+    self.da_name = varname(name)
+    self.type = type
+    self.repeating = repeating
+    self.comment = comment
+
 def parse_field(field_elem):
   type = field_elem.get("TYPE")
 
@@ -134,8 +114,10 @@ def parse_field(field_elem):
 
 
 class A2JPage(PageNode):
+  __slots__ = ("parent", "text", "learn", "help", "helpimage", "buttons", "fields", "children_names",
+               "codeafter", "codebefore", "name", "page_type", "step", "map_x", "map_y")
 
-  def __init__(self, page_elem):
+  def __init__(self, page_elem=None):
     self.parent = None # need to update this later
     self.text = None
     self.learn = None
@@ -146,6 +128,9 @@ class A2JPage(PageNode):
     self.children_names = set()
     self.codeafter = None
     self.codebefore = None
+    if page_elem is None:
+      # The rest is set by a subclass (see `A2JJsonPage`)
+      return
 
     self.name = page_elem.get("NAME")
     self.page_type = page_elem.get("TYPE")
@@ -242,7 +227,7 @@ class A2JPage(PageNode):
 
 class A2JInterview:
 
-  def __init__(self, input_filename):
+  def __init__(self, input_filename=None, streaming=True):
     self.metadata = {}
     # Things like maintainer email, version, etc.
     self.setup_info = {}
@@ -251,6 +236,8 @@ class A2JInterview:
     self.changelog = ""
     self.sections: dict[int, str] = {}
     self.variable_map: dict[str, str] = {} # map from A2J varname to valid DA varname
+    # The VARIABLES table, by lower case name (A2J matches names in any case)
+    self.variables: dict[str, Variable] = {}
 
     self.parse_dict = {
       "authors": self.parse_authors,
@@ -261,23 +248,115 @@ class A2JInterview:
       "firstpage": self.set_firstpage
     }
 
-    with open(input_filename, "r") as f:
-      doc = etree.parse(f)
-      self.parse_from_xml(doc)
+    if input_filename is None:
+      # Nothing to read yet; pages get added by the caller
+      return
+    if streaming:
+      with open(input_filename, "rb") as f, phase("parse"):
+        self.parse_from_iterparse(timed_reader(f))
+    else:
+      with open(input_filename, "r") as f:
+        with phase("parse"):
+          doc = etree.parse(timed_reader(f))
+        self.parse_from_xml(doc)
+    # VARIABLES can come after PAGES, so macros wait until everything's read
+    self.substitute_macros()
 
   def parse_from_xml(self, doc):
     for elem in doc.getroot():
       if elem.tag.lower() == "info":
-        for info_child in elem:
-          if info_child.tag.lower() in self.parse_dict:
-            self.parse_dict[info_child.tag.lower()](info_child)
+        self.parse_info(elem)
       elif elem.tag.lower() == "steps":
-        for step_child in elem:
-          self.sections[int(step_child.get("NUMBER"))] = step_child[0].text
+        self.parse_steps(elem)
+      elif elem.tag.lower() == "variables":
+        self.parse_variables(elem)
       elif elem.tag.lower() == "pages":
         for page_child in elem:
           self.add_page(page_child)
 
+  # A2J writes its tags in upper case, but the tree parser accepts any case, so
+  # listen for the common spellings (iterparse can only filter on exact tags)
+  stream_tags = tuple(spelling for tag in ("page", "info", "steps", "variables") for spelling in (tag.upper(), tag, tag.capitalize()))
+
+  def parse_from_iterparse(self, input_file):
+    """Parses the guide while reading it, instead of loading the whole tree first.
+
+    Each PAGE is built as soon as its end tag is read, and then it (and anything
+    before it) is thrown away, so memory stays around the size of a single page.
+    """
+    for _, elem in etree.iterparse(input_file, events=("end",), tag=self.stream_tags):
+      parent = elem.getparent()
+      if parent is None:
+        continue
+      tag = elem.tag.lower()
+      if tag == "page":
+        if parent.tag.lower() == "pages":
+          self.add_page(elem)
+          discard_elem(elem)
+      elif parent.getparent() is None:
+        if tag == "info":
+          self.parse_info(elem)
+        elif tag == "steps":
+          self.parse_steps(elem)
+        else:
+          self.parse_variables(elem)
+        discard_elem(elem)
+
+  def parse_info(self, info_elem):
+    for info_child in info_elem:
+      if info_child.tag.lower() in self.parse_dict:
+        self.parse_dict[info_child.tag.lower()](info_child)
+
+  def parse_steps(self, steps_elem):
+    for step_child in steps_elem:
+      self.sections[int(step_child.get("NUMBER"))] = step_child[0].text
+
+  def parse_variables(self, variables_elem):
+    for var_elem in variables_elem:
+      name = var_elem.get("NAME") or var_elem.get("name")
+      if not name:
+        continue
+      repeating = var_elem.get("REPEATING") or var_elem.get("repeating")
+      self.add_variable(Variable(name, var_elem.get("TYPE") or var_elem.get("type"), repeating == "true",
+                                 var_elem.get("COMMENT") or var_elem.get("comment")))
+
+  def add_variable(self, variable: Variable):
+    self.variables[variable.name.lower()] = variable
+    self.variable_map[variable.name] = variable.da_name
+
+  def macro_value(self, match):
+    variable = self.variables.get((match.group(1) or match.group(2)).strip().lower())
+    if variable is None:
+      # Not a variable (or an expression); leave it for someone to look at
+      return match.group(0)
+    return f"${{ {variable.da_name} }}"
+
+  def sub_macros(self, text):
+    if not text or "%%" not in text:
+      return text
+    return macro_re.sub(self.macro_value, text)
+
+  def substitute_macros(self, pages=None):
+    """Turns the `%%name%%` macros of the guide's variables into Mako `${ }`, in the text,
+    help, learn more, and field and button labels of `pages` (or of every page).
+
+    Each string is scanned once, and each macro is a dict lookup, so this takes time in
+    proportion to the text, however many variables there are.
+    """
+    if not self.variables:
+      return
+    sub = self.sub_macros
+    with phase("macros"):
+      for page in self.page_map.values() if pages is None else pages:
+        page.text = sub(page.text)
+        page.help = sub(page.help)
+        page.learn = sub(page.learn)
+        for field in page.fields:
+          field.label = sub(field.label)
+        for button in page.buttons:
+          if "label" in button:
+            button["label"] = sub(button["label"])
+
   def parse_authors(self, authors_elem):
     authors = []
     for author_elem in authors_elem:
@@ -303,17 +382,32 @@ class A2JInterview:
     self.first_page_name = elem.text
 
   def add_page(self, page_elem):
-    page = A2JPage(page_elem)
+    with phase("pages"):
+      page = A2JPage(page_elem)
     if not self.first_page_name:
       self.first_page_name = page.name
     self.page_map[page.name] = page
 
-  def to_yaml_objs(self):
-    metadata = { 
+  def page_graph(self) -> PageGraph:
+    """Which pages lead to which, from the pages' buttons"""
+    return PageGraph(self.page_map, self.first_page_name)
+
+  def iter_yaml_parts(self):
+    """Each block, with the part of the interview it goes in when the YAML is split into
+    files (see `dakirby.split`): "metadata", or the step its page is in
+    """
+    yield "metadata", {
       "metadata": self.metadata
     }
-    sections = {
+    yield "metadata", {
       "sections": [{val: varname(val)} for val in self.sections.values()]
     }
-    all_pages = [page.to_yaml() for page in self.page_map.values()]
-    return [metadata, sections] + all_pages
\ No newline at end of file
+    for page in self.page_map.values():
+      yield f"step_{page.step}" if page.step else "pages", page.to_yaml()
+
+  def iter_yaml_objs(self):
+    for _, obj in self.iter_yaml_parts():
+      yield obj
+
+  def to_yaml_objs(self):
+    return list(self.iter_yaml_objs())
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""Reading an A2J guide from its `Guide.json`, into the same pages and fields as `Guide.xml`.
+
+A2J packages have both files, with the same content. The JSON is read with the stdlib
+`json` module, and only the HTML inside it (page text, help, a list field's options, the
+odd label) goes through lxml. That HTML is the same as what's inside the tags of
+`Guide.xml`, so it's parsed as XML too, but with a parser that recovers from the odd bit
+that isn't well-formed. Every distinct string of it in the guide is parsed in one call,
+instead of a call per string.
+
+The layout this expects is the one `benchmarks/synthetic.py` writes, which hasn't been
+checked against a guide exported by A2J Author yet (see docs/a2j_structure.md), so a
+Guide.json is only read when it's given by name.
+"""
+
+import html.entities
+import json
+
+from lxml import etree
+
+from .a2jauthor import A2JInterview, A2JPage, Field, Variable, parse_text
+from .common import LazyRegex, phase, timed_reader, varname
+
+html_parser = etree.XMLParser(recover=True)
+# HTML's named characters, besides the ones XML has, are undefined in XML; the recovering
+# parser would drop them, and sometimes the text around them
+entity_re = LazyRegex(r"&([A-Za-z][A-Za-z0-9]*);")
+xml_entities = frozenset(["amp", "lt", "gt", "quot", "apos"])
+
+def replace_entity(match):
+  name = match.group(1)
+  if name in xml_entities:
+    return match.group(0)
+  return html.entities.html5.get(name + ";", match.group(0))
+
+def has_markup(value):
+  return value.__class__ is str and ("<" in value or "&" in value)
+
+def wrap_html(html_text):
+  if "&" in html_text:
+    html_text = entity_re.sub(replace_entity, html_text)
+  return f"<TEXT>{html_text}</TEXT>"
+
+class HtmlFragments(dict):
+  """HTML strings from a guide, parsed into the <TEXT> elements that would hold them in
+  Guide.xml. A string that isn't in yet is parsed when it's looked up.
+  """
+
+  def __missing__(self, html_text):
+    elem = self[html_text] = etree.fromstring(wrap_html(html_text), html_parser)
+    return elem
+
+  def prefetch(self, strings):
+    """Parses all of the strings that aren't in yet, with one call to lxml"""
+    new = [html_text for html_text in dict.fromkeys(strings) if html_text not in self]
+    if len(new) < 2:
+      return
+    root = etree.fromstring("<HTML>" + "".join(map(wrap_html, new)) + "</HTML>", html_parser)
+    # Broken HTML that closed its <TEXT> early would throw off the rest; leave those to
+    # be parsed one at a time
+    if len(root) != len(new) or any(elem.tail for elem in root):
+      return
+    for html_text, elem in zip(new, root):
+      self[html_text] = elem
+
+def page_html(page: dict):
+  """The strings with markup in a page, that building it will parse"""
+  for key in ("text", "help", "learn", "helpImageURL"):
+    if has_markup(page.get(key)):
+      yield page[key]
+  for button in page.get("buttons") or ():
+    for key in ("label", "name", "value"):
+      if has_markup(button.get(key)):
+        yield button[key]
+  for field in page.get("fields") or ():
+    for key in ("name", "label", "invalidPrompt", "value", "listData", "listSrc"):
+      if has_markup(field.get(key)):
+        yield field[key]
+
+def attr_value(value):
+  """A JSON value as the attribute string Guide.xml has for it, or None if it's empty"""
+  if value.__class__ is str:
+    return value or None
+  if value is None:
+    return None
+  if value is True or value is False:
+    return "true" if value else "false"
+  return str(value)
+
+def elem_text(value, html: HtmlFragments):
+  """What the `.text` of an element holding `value` would be in Guide.xml"""
+  if has_markup(value):
+    return html[value].text
+  return attr_value(value)
+
+def html_text(value, html: HtmlFragments):
+  """What `parse_text` gives for an element holding `value` in Guide.xml"""
+  if has_markup(value):
+    return parse_text(html[value])
+  return value or None
+
+def json_field(field: dict, html: HtmlFragments) -> Field:
+  name = elem_text(field.get("name"), html)
+  listdata = field.get("listData")
+  return Field(
+    varname(name) if name else None,
+    attr_value(field.get("type")),
+    elem_text(field.get("label"), html),
+    elem_text(field.get("invalidPrompt"), html),
+    attr_value(field.get("order")),
+    attr_value(field.get("required")),
+    attr_value(field.get("min")),
+    attr_value(field.get("max")),
+    attr_value(field.get("calculator")),
+    elem_text(field.get("value"), html),
+    html[listdata] if listdata else None,
+    elem_text(field.get("listSrc"), html),
+  )
+
+class A2JJsonPage(A2JPage):
+  """A page read from Guide.json; its HTML is parsed through `html`"""
+  __slots__ = ()
+
+  def __init__(self, page: dict, html: HtmlFragments):
+    super().__init__()
+    self.name = attr_value(page.get("name"))
+    self.page_type = attr_value(page.get("type"))
+    self.step = attr_value(page.get("step"))
+    self.map_x = attr_value(page.get("mapx"))
+    self.map_y = attr_value(page.get("mapy"))
+
+    text = html_text(page.get("text"), html)
+    self.text = text.strip() if text is not None else None
+    self.help = html_text(page.get("help"), html)
+    self.learn = html_text(page.get("learn"), html)
+    self.helpimage = elem_text(page.get("helpImageURL"), html)
+    self.codebefore = attr_value(page.get("codeBefore"))
+    self.codeafter = attr_value(page.get("codeAfter"))
+    self.buttons = [self.json_button(button, html) for button in page.get("buttons") or ()]
+    self.fields = [json_field(field, html) for field in page.get("fields") or ()]
+
+  def json_button(self, button_obj, html):
+    button = {"next": attr_value(button_obj.get("next"))}
+    if button["next"] and button["next"].lower() != "fail":
+      self.children_names.add(button["next"])
+    elif button["next"] == "fail":
+      button["exit url"] = attr_value(button_obj.get("url"))
+    for key, button_key in (("label", "label"), ("name", "var"), ("value", "value")):
+      value = elem_text(button_obj.get(key), html)
+      if value is not None:
+        button[button_key] = value
+    return button
+
+class A2JJsonInterview(A2JInterview):
+  """An A2J guide read from its Guide.json"""
+
+  def __init__(self, input_filename=None):
+    # Parsed HTML, only kept while pages are being built
+    self.html = HtmlFragments()
+    super().__init__()
+    if input_filename is None:
+      return
+    with open(input_filename, "rb") as f:
+      with phase("parse"):
+        guide = json.load(timed_reader(f))
+    self.parse_from_json(guide)
+    self.substitute_macros()
+
+  def parse_from_json(self, guide: dict):
+    # In the guide's own order, like the XML front end reads its INFO
+    for key, value in guide.items():
+      key = key.lower()
+      if key == "authors":
+        self.metadata["authors"] = [{name.lower(): elem_text(val, self.html) for name, val in author.items()}
+                                    for author in value or ()]
+      elif key == "description":
+        self.metadata["description"] = elem_text(value, self.html)
+      elif key == "notes":
+        self.changelog = elem_text(value, self.html)
+      elif key == "emailcontact":
+        self.setup_info["author_email"] = elem_text(value, self.html)
+      elif key == "title":
+        self.metadata["title"] = elem_text(value, self.html)
+      elif key == "firstpage":
+        self.first_page_name = elem_text(value, self.html)
+      elif key == "steps":
+        for step in value or ():
+          self.sections[int(step["number"])] = elem_text(step.get("text"), self.html)
+      elif key == "vars":
+        # Keyed by lower case name, like `variables`
+        for var in (value or {}).values():
+          if var.get("name"):
+            self.add_variable(Variable(var["name"], attr_value(var.get("type")), bool(var.get("repeating")),
+                                       attr_value(var.get("comment"))))
+      elif key == "pages":
+        # Keyed by name in synthetic.py's guides, but a list is just as easy
+        self.add_pages(list(value.values() if isinstance(value, dict) else value or ()))
+
+  def add_pages(self, pages: list[dict]):
+    with phase("parse"):
+      self.html.prefetch(html_text for page in pages for html_text in page_html(page))
+    for page in pages:
+      self.add_page(page)
+    self.html.clear()
+
+  def add_page(self, page: dict):
+    with phase("pages"):
+      page = A2JJsonPage(page, self.html)
+    if not self.first_page_name:
+      self.first_page_name = page.name
+    self.page_map[page.name] = page
+
+  def __getstate__(self):
+    # lxml elements can't be pickled
+    state = self.__dict__.copy()
+    state["html"] = HtmlFragments()
+    return state
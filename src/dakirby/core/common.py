@@ -1,30 +1,138 @@
 #!/usr/bin/env python3
 """Common functions and regexes used in different parsers / outputs"""
 
+import os
 import re
+from contextlib import nullcontext
+from functools import lru_cache
 
-replace_square_brackets = re.compile(r"\\\[ *([^\\]+)\\\]")
-end_spaces = re.compile(r" +$")
-spaces = re.compile(r"[ \n]+")
-invalid_var_characters = re.compile(r"[^A-Za-z0-9_]+")
-digit_start = re.compile(r"^[0-9]+")
-newlines = re.compile(r"\n")
-remove_u = re.compile(r"^u")
+class LazyRegex:
+  """A regex that's compiled the first time it's used, instead of when its module is imported"""
+
+  def __init__(self, pattern, flags=0):
+    self._args = (pattern, flags)
+    self._compiled = None
+
+  def __getattr__(self, name):
+    if self._compiled is None:
+      self._compiled = re.compile(*self._args)
+    value = getattr(self._compiled, name)
+    # Later uses of `name` find it here, without going through `__getattr__`
+    self.__dict__[name] = value
+    return value
+
+replace_square_brackets = LazyRegex(r"\\\[ *([^\\]+)\\\]")
+end_spaces = LazyRegex(r" +$")
+spaces = LazyRegex(r"[ \n]+")
+invalid_var_characters = LazyRegex(r"[^A-Za-z0-9_]+")
+digit_start = LazyRegex(r"^[0-9]+")
+newlines = LazyRegex(r"\n")
+remove_u = LazyRegex(r"^u")
+
+def is_cmp_name(name) -> bool:
+  """Whether a file or zip member is a HotDocs component file: `.cmp`, in any case"""
+  return name.casefold().endswith(".cmp")
+
+def cmp_paths(dir_path) -> list[str]:
+  """The component files directly in a HotDocs package directory, sorted. Hidden files
+  (like macOS's `._` files) are left out
+  """
+  return sorted(os.path.join(dir_path, name) for name in os.listdir(dir_path)
+                if is_cmp_name(name) and not name.startswith("."))
 
 # Expanded from ALWeaver
+def _regex_varname(var_name: str) -> str:
+    var_name = var_name.strip()
+    var_name = spaces.sub(r"_", var_name)
+    var_name = invalid_var_characters.sub(r"", var_name)
+    var_name = digit_start.sub(r"", var_name)
+    if var_name.endswith("_TE"):
+      var_name = var_name[:-3]
+    var_name = var_name.lower()
+    return var_name
+
+# ASCII whitespace that `spaces` doesn't match; it should get deleted like any other
+# invalid character, but `bytes.split` would treat it as a separator, so hide it first
+_hidden_whitespace = bytes.maketrans(b"\t\r\x0b\x0c", b"\0\0\0\0")
+_invalid_ascii = bytes(code for code in range(256) if not (chr(code).isascii() and (chr(code).isalnum() or chr(code) == "_")))
+
+def _ascii_varname(var_name: str) -> str:
+    """Same as `_regex_varname`, but with byte string methods, for names with only ASCII characters"""
+    name_bytes = var_name.strip().encode("ascii").translate(_hidden_whitespace)
+    name_bytes = b"_".join(name_bytes.split()).translate(None, _invalid_ascii).lstrip(b"0123456789")
+    if name_bytes.endswith(b"_TE"):
+      name_bytes = name_bytes[:-3]
+    return name_bytes.lower().decode("ascii")
+
+@lru_cache(maxsize=32768)
 def varname(var_name: str) -> str:
+    """Turns a name from another tool into a valid docassemble variable name.
+
+    The same names get converted over and over, so results are cached; use
+    `varname.cache_info()` to see hits and misses, and `varname.cache_clear()` to reset.
+    """
     if var_name:
-        var_name = var_name.strip()
-        var_name = spaces.sub(r"_", var_name)
-        var_name = invalid_var_characters.sub(r"", var_name)
-        var_name = digit_start.sub(r"", var_name)
-        if var_name.endswith("_TE"):
-          var_name = var_name[:-3]
-        var_name = var_name.lower()
-        return var_name
+        if var_name.isascii():
+          return _ascii_varname(var_name)
+        return _regex_varname(var_name)
     return var_name
 
+def discard_elem(elem):
+  """Frees an element that iterparse is done with, along with its already handled siblings"""
+  elem.clear(keep_tail=True)
+  parent = elem.getparent()
+  if parent is not None:
+    while elem.getprevious() is not None:
+      del parent[0]
+
+# The profiler that `phase` records into (a `dakirby.profile.Profiler`), while one is active
+_active_profiler = None
+_null_phase = nullcontext()
+
+def set_profiler(profiler):
+  """Makes `profiler` (or None) the one that phases are recorded into; returns the one before"""
+  global _active_profiler
+  previous = _active_profiler
+  _active_profiler = profiler
+  return previous
+
+def phase(name):
+  """A context manager that records its block as part of the phase `name`, if profiling"""
+  if _active_profiler is None:
+    return _null_phase
+  return _PhaseTimer(_active_profiler, name)
+
+def timed_reader(input_file):
+  """Wraps a file so that reading it counts as the "read" phase, if profiling"""
+  if _active_profiler is None:
+    return input_file
+  return _TimedReader(input_file)
+
+class _PhaseTimer:
+  __slots__ = ("profiler", "name")
+
+  def __init__(self, profiler, name):
+    self.profiler = profiler
+    self.name = name
+
+  def __enter__(self):
+    self.profiler.enter(self.name)
+    return self
+
+  def __exit__(self, *exc_info):
+    self.profiler.exit()
+    return False
+
+class _TimedReader:
+  def __init__(self, input_file):
+    self.input_file = input_file
+
+  def read(self, size=-1):
+    with phase("read"):
+      return self.input_file.read(size)
+
 class PageNode:
+  __slots__ = ()
 
   def to_yaml():
     pass
@@ -1,58 +1,247 @@
 #from pyaml import dump_all
-import io
 
-def nested_print(output, data, indent=0, prev_context=None):
+# Keys whose values are written bare (or always as a block, for code)
+raw_contexts = frozenset(["code", "datatype", "field"])
+bare_string_contexts = frozenset(["datatype", "inputtype", "field"])
+
+# Indent prefixes, built once for each depth and reused for every line
+_indents: dict[int, str] = {}
+_newline_indents: dict[int, str] = {}
+
+def _indent(indent):
+  ind = _indents.get(indent)
+  if ind is None:
+    ind = _indents[indent] = ' ' * indent
+  return ind
+
+def _newline_indent(indent):
+  ind = _newline_indents.get(indent)
+  if ind is None:
+    ind = _newline_indents[indent] = '\n' + ' ' * indent
+  return ind
+
+def emit_yaml(parts, data, indent=0, prev_context=None):
+  """Appends the YAML for `data` to the `parts` list; join the list to get the text.
+
+  Writes exactly what `nested_print` used to print, without a `print` call per scalar.
+  """
+  append = parts.append
   if isinstance(data, dict):
     if not data:
-      print("{}", file=output)
+      append("{}\n")
       return
     if prev_context:
       indent += 2
-    ind = ' ' * indent
+    ind = _indent(indent)
     idx = 0
-    for key in data:
+    for key, val in data.items():
       if (prev_context == "list" and idx == 0) or prev_context is None:
-        print(f"{key}: ", file=output, end='')
+        append(f"{key}: ")
       elif idx > 0:
-        print(f"{ind}{key}: ", file=output, end='')
+        append(f"{ind}{key}: ")
       else:
-        print(f"\n{ind}{key}: ", file=output, end='')
-      nested_print(output, data[key], indent, prev_context=key if key in ["code", "datatype", "field"] else "dict")
+        append(f"{_newline_indent(indent)}{key}: ")
+      context = key if key in raw_contexts else "dict"
+      # Most values are one line strings; skip the recursive call for them
+      if val.__class__ is str and context == "dict" and '\n' not in val and '"' not in val:
+        append(f"\"{val}\"\n")
+      else:
+        emit_yaml(parts, val, indent, prev_context=context)
       idx += 1
   elif isinstance(data, list):
     if not data:
-      print("[]", file=output)
+      append("[]\n")
       return
     indent += 2
-    ind = ' ' * indent
+    ind = _indent(indent)
     for idx, item in enumerate(data):
       if prev_context == "dict" and idx == 0:
-        print(f"\n{ind}- ", file=output, end='')
+        append(f"{_newline_indent(indent)}- ")
       else:
-        print(f"{ind}- ", file=output, end='')
-      nested_print(output, item, indent, prev_context="list")
+        append(f"{ind}- ")
+      emit_yaml(parts, item, indent, prev_context="list")
   elif isinstance(data, str):
     if '\n' in data or '"' in data or prev_context == "code":
       indent += 2
-      ind = ' ' * indent
-      data = data.replace("\n", f"\n{ind}")
-      print(f"|\n{ind}{data}", file=output)
-    elif prev_context in ["datatype", "inputtype", "field"]:
-      print(f"{data}", file=output)
+      newline_ind = _newline_indent(indent)
+      if '\n' in data:
+        data = data.replace("\n", newline_ind)
+      append(f"|{newline_ind}{data}\n")
+    elif prev_context in bare_string_contexts:
+      append(f"{data}\n")
     else:
-      print(f"\"{data}\"", file=output)
-  elif isinstance(data, int) or isinstance(data, float):
-    print(f"{data}", file=output)
+      append(f"\"{data}\"\n")
   else:
-    print(f"{data}", file=output)
+    append(f"{data}\n")
+
+def nested_print(output, data, indent=0, prev_context=None):
+  parts = []
+  emit_yaml(parts, data, indent, prev_context)
+  output.write("".join(parts))
+
+# Repeated subtrees smaller than this (roughly, in characters) are written out again; an
+# anchor and alias wouldn't be any shorter
+min_anchor_size = 24
+
+class YamlAnchors:
+  """Writes a dict or list that's repeated within a `---` document once, with an anchor
+  (`&a1`), and each later copy as an alias to it (`*a1`). Aliases can't reach into other
+  documents, and docassemble loads each document on its own anyway.
+
+  Subtrees are hash-consed: each distinct one gets a number, made from its keys and its
+  children's numbers, so finding the repeats is one pass over the document. Keeps count
+  of the anchors and aliases written, and the UTF-8 bytes that saved.
+  """
+
+  def __init__(self):
+    self.anchors = 0
+    self.aliases = 0
+    self.bytes_written = 0
+    self.bytes_saved = 0
+    # For the document being written: each container's (by id) subtree number, the
+    # numbers by structure, how many times each is written, and their anchor names
+    self._ids: dict[int, int] = {}
+    self._numbers: dict[tuple, int] = {}
+    self._sizes: list[int] = []
+    self._counts: dict[int, int] = {}
+    self._labels: dict[int, str] = {}
+
+  def emit_document(self, parts, obj):
+    """Appends the YAML for `obj`, one document, to `parts`, like `emit_yaml`"""
+    self._ids = {}
+    self._numbers = {}
+    self._sizes = []
+    self._counts = {}
+    self._labels = {}
+    self._number(obj)
+    self._count(obj)
+    start = len(parts)
+    if any(count > 1 for count in self._counts.values()):
+      self._emit(parts, obj, 0, None)
+      plain = []
+      emit_yaml(plain, obj, indent=0)
+      written = len("".join(parts[start:]).encode("utf-8"))
+      self.bytes_saved += len("".join(plain).encode("utf-8")) - written
+    else:
+      emit_yaml(parts, obj, indent=0)
+      written = len("".join(parts[start:]).encode("utf-8"))
+    self.bytes_written += written
+
+  def _number(self, data) -> int:
+    """The subtree number of `data`, numbering its children first"""
+    if isinstance(data, dict):
+      children = tuple((key, self._number(val)) for key, val in data.items())
+      key = (dict, children)
+      size = sum(len(str(name)) + self._sizes[number] + 4 for name, number in children)
+    elif isinstance(data, list):
+      children = tuple(self._number(item) for item in data)
+      key = (list, children)
+      size = sum(self._sizes[number] + 4 for number in children)
+    else:
+      key = (data.__class__, data)
+      size = len(str(data)) + 2
+    number = self._numbers.get(key)
+    if number is None:
+      number = self._numbers[key] = len(self._sizes)
+      self._sizes.append(size)
+    if key[0] is dict or key[0] is list:
+      self._ids[id(data)] = number
+    return number
+
+  def _count(self, data):
+    """Counts the times each subtree will be written; what's inside a repeat isn't written again"""
+    if isinstance(data, dict):
+      children = data.values()
+    elif isinstance(data, list):
+      children = data
+    else:
+      return
+    number = self._ids[id(data)]
+    if self._sizes[number] < min_anchor_size:
+      # Nothing inside is any bigger
+      return
+    seen = self._counts.get(number, 0)
+    self._counts[number] = seen + 1
+    if not seen:
+      for child in children:
+        self._count(child)
+
+  def _emit(self, parts, data, indent, prev_context):
+    if not isinstance(data, (dict, list)) or not data:
+      emit_yaml(parts, data, indent, prev_context)
+      return
+    number = self._ids.get(id(data))
+    if self._counts.get(number, 0) > 1:
+      label = self._labels.get(number)
+      if label is not None:
+        parts.append(f"*{label}\n")
+        self.aliases += 1
+        return
+      label = self._labels[number] = f"a{len(self._labels) + 1}"
+      parts.append(f"&{label}")
+      self.anchors += 1
+      # The anchor goes on its own line, before the first key or item
+      prev_context = "dict"
+    # The same layout as `emit_yaml`
+    if isinstance(data, dict):
+      if prev_context:
+        indent += 2
+      ind = _indent(indent)
+      for idx, (key, val) in enumerate(data.items()):
+        if (prev_context == "list" and idx == 0) or prev_context is None:
+          parts.append(f"{key}: ")
+        elif idx > 0:
+          parts.append(f"{ind}{key}: ")
+        else:
+          parts.append(f"{_newline_indent(indent)}{key}: ")
+        self._emit(parts, val, indent, key if key in raw_contexts else "dict")
+    else:
+      indent += 2
+      ind = _indent(indent)
+      for idx, item in enumerate(data):
+        if prev_context == "dict" and idx == 0:
+          parts.append(f"{_newline_indent(indent)}- ")
+        else:
+          parts.append(f"{ind}- ")
+        self._emit(parts, item, indent, "list")
+
+  def add_counts(self, other: "YamlAnchors"):
+    """Adds what `other` (say, one used on another thread) wrote to these counts"""
+    self.anchors += other.anchors
+    self.aliases += other.aliases
+    self.bytes_written += other.bytes_written
+    self.bytes_saved += other.bytes_saved
+
+  def report(self) -> dict:
+    return {"anchors": self.anchors, "aliases": self.aliases, "bytes_written": self.bytes_written,
+            "bytes_saved": self.bytes_saved}
+
+def summarize_anchors(report) -> str:
+  before = report["bytes_written"] + report["bytes_saved"]
+  percent = 100 * report["bytes_saved"] / before if before else 0
+  return (f"Anchored {report['anchors']} repeated dicts and lists, written again as {report['aliases']} aliases; "
+          f"{before / 1024:.1f} KiB -> {report['bytes_written'] / 1024:.1f} KiB ({percent:.0f}% smaller)")
+
+def to_yaml(objs, output=None, anchors: YamlAnchors | None = None):
+  """Returns the YAML for all of the objects, or writes it to `output` (a file or stream).
 
-def to_yaml(objs):
+  When writing, each `---` document is written as soon as its object is made, so
+  passing a generator keeps only one block in memory at a time. With `anchors`, repeats
+  within a document are written as YAML aliases (see `YamlAnchors`).
+  """
   # TODO(brycew): do smarter things, like `|` vs inline for certain keys,
   # matching docassemble YAML style, etc.
   # return dump_all(objs, string_val_style="|", sort_keys=False)
+  emit = anchors.emit_document if anchors is not None else emit_yaml
 
-  output = io.StringIO()
+  if output is not None:
+    for obj in objs:
+      parts = ["---\n"]
+      emit(parts, obj)
+      output.write("".join(parts))
+    return None
+  parts = []
   for obj in objs:
-    print("---", file=output)
-    nested_print(output, obj, indent=0)
-  return output.getvalue()
\ No newline at end of file
+    parts.append("---\n")
+    emit(parts, obj)
+  return "".join(parts)
@@ -1,17 +1,16 @@
 #!/usr/bin/env python3
 
+import os
+import posixpath
+from dataclasses import dataclass
+from io import BytesIO
+from typing import TypedDict
+
 from lxml import etree
-from zipfile import ZipFile
 from lxml.etree import QName
-from .common import varname, PageNode
-import glob
 
-import re
-
-# w in text like that is a link, essentially <a href=""...>
-web_chevron = re.compile(r'«.w "([^»]+)"»([^«]+)«.we»')
-
-from typing import TypedDict
+from .common import varname, discard_elem, phase, timed_reader, is_cmp_name, cmp_paths, PageNode
+from .hotdocs_markup import HotDocsMarkup
 
 xml_namespace = "http://www.hotdocs.com/schemas/component_library/2009"
 
@@ -19,34 +18,77 @@ def xml_ns(arg):
   """Returns the full URL of an XML namespaced tag"""
   return QName(xml_namespace, arg).text
 
-class DialogElement(TypedDict):
+# Namespaced tags, built once instead of on every comparison
+caption_tag = xml_ns("caption")
+component_library_tag = xml_ns("componentLibrary")
+components_tag = xml_ns("components")
+computation_tag = xml_ns("computation")
+contents_tag = xml_ns("contents")
+def_format_tag = xml_ns("defFormat")
+dialog_tag = xml_ns("dialog")
+dialog_element_tag = xml_ns("dialogElement")
+multi_line_tag = xml_ns("multiLine")
+multiple_choice_tag = xml_ns("multipleChoice")
+number_tag = xml_ns("number")
+options_tag = xml_ns("options")
+preferences_tag = xml_ns("preferences")
+prompt_tag = xml_ns("prompt")
+resource_tag = xml_ns("resource")
+script_tag = xml_ns("script")
+single_selection_tag = xml_ns("singleSelection")
+text_tag = xml_ns("text")
+title_tag = xml_ns("title")
+true_false_tag = xml_ns("trueFalse")
+
+# Where each kind of component ends up once parsed: the `HotDocsInterview` attribute
+component_stores = {
+  text_tag: "variable_map",
+  number_tag: "variable_map",
+  true_false_tag: "variable_map",
+  multiple_choice_tag: "variable_map",
+  computation_tag: "code_blocks",
+  dialog_element_tag: "dialog_elements",
+  dialog_tag: "dialogs",
+}
+
+@dataclass(slots=True)
+class DialogElement:
   name: str
   caption: str | None
-  web_link: str | None
-
-def parse_display_text(text):
-  """Note: does not parse variables and scripts (since we can't fully replace them yet)."""
-  if not text:
-    return ""
-  text = text.replace("«.b»", "**").replace("«.be»", "**")
-  # Treat underlines the same as bold (underlines are harder to read)
-  text = text.replace("«.u»", "**").replace("«.ue»", "**")
-  text = text.replace("«.i»", "*").replace("«.ie»", "*")
-  text = text.replace("«.lq»", '"').replace("«.rq»", '"')
-  text = web_chevron.sub(r"[\2](\1)", text)
-  # TODO: ask brett about «.lb, «.c», and «.z»
-  text = text.replace("«.c»", '').replace("«.z»", '').replace("«.ze»", '').replace("«.lb»", '')
-  return text
+  web_link: str | None = None
+
+@dataclass(slots=True)
+class DialogItem:
+  name: str
+  on_previous_line: str | None
+
+@dataclass(slots=True)
+class Dialog:
+  name: str
+  da_name: str
+  title: str | None
+  contents: list[DialogItem]
+
+@dataclass(slots=True)
+class CodeBlock:
+  name: str
+  da_func_name: str
+  result_type: str | None
+  script: str
 
 class Variable:
+  __slots__ = ("name", "da_name", "prompt", "help")
   name: str
   da_name: str
+  # Both kept as they are in the component file until `HotDocsInterview.resolve_markup`
   prompt: str | None
+  help: str | None
 
-  def __init__(self, name, prompt=None):
+  def __init__(self, name, prompt=None, help=None):
     self.name = name
     self.da_name = varname(name)
-    self.prompt = parse_display_text(prompt)
+    self.prompt = prompt
+    self.help = help
 
   def get_datatype(self):
     return "text"
@@ -64,27 +106,25 @@ class Variable:
     return field
 
 class TextVariable(Variable):
-  help: str | None
+  __slots__ = ("area",)
   area: bool
 
   # TODO: get maxChars
   def __init__(self, name, prompt=None, help=None, area=False):
-    super().__init__(name, prompt)
-    self.help = parse_display_text(help)
+    super().__init__(name, prompt, help)
     self.area = area
 
   def get_datatype(self):
     return "text"
 
 class NumberVariable(Variable):
+  __slots__ = ("decimal_places", "currency_symbol", "def_format")
   decimal_places: int | None
   currency_symbol: str | None
   def_format: str | None
-  help: str | None
 
   def __init__(self, name, prompt=None, help=None, decimal_places=0, currency_symbol=None, def_format=None):
-    super().__init__(name, prompt)
-    self.help = parse_display_text(help)
+    super().__init__(name, prompt, help)
     self.decimal_places = decimal_places
     self.currency_symbol = currency_symbol
     self.def_format = def_format
@@ -98,19 +138,31 @@ class NumberVariable(Variable):
       return "integer"
 
 class TrueFalseVariable(Variable):
-  help: str | None
+  __slots__ = ("yes_no",)
   yes_no: str | None
 
   def __init__(self, name, prompt=None, help=None, yes_no=None):
-    super().__init__(name, prompt)
-    self.help = parse_display_text(help)
+    super().__init__(name, prompt, help)
     self.yes_no = yes_no
 
   def get_datatype(self):
     # TODO: depend on self.yes_no?
     return "yesnoradio"
 
+def mc_options(options_elem) -> list[tuple[str, str]]:
+  """The (display label, value) of each option in a multiple choice variable's `options`"""
+  options = []
+  for opt in options_elem:
+    val = opt.get("name")
+    disp_label = next(iter(opt_elem.text for opt_elem in opt if opt_elem.tag == prompt_tag), None)
+    if disp_label is None:
+      options.append((val, val))
+    else:
+      options.append((disp_label, val))
+  return options
+
 class MultipleChoiceVariable(Variable):
+  __slots__ = ("style", "options")
   style: str | None
   options: list | str # either full choices, or reference choices var elsewhere
 
@@ -121,17 +173,11 @@ class MultipleChoiceVariable(Variable):
     self.prompt = None
     self.options = []
     for elem in mc_elem:
-      if elem.tag == xml_ns("prompt"):
+      if elem.tag == prompt_tag:
         self.prompt = elem.text
-      elif elem.tag == xml_ns("options"):
-        for opt in elem:
-          val = opt.get("name")
-          disp_label = next(iter(opt_elem.text for opt_elem in opt if opt_elem.tag == xml_ns("prompt")), None)
-          if disp_label is None:
-            self.options.append((val, val))
-          else:
-            self.options.append((disp_label, val))
-      elif elem.tag == xml_ns("singleSelection"):
+      elif elem.tag == options_tag:
+        self.options.extend(mc_options(elem))
+      elif elem.tag == single_selection_tag:
         self.style = elem.get("style")
     super().__init__(self.name, self.prompt)
     # TODO(brycew): defMergeProps, fieldWidth
@@ -151,59 +197,161 @@ class MultipleChoiceVariable(Variable):
       field["code"] = self.options
     return field
 
+def component_text(store_name, component):
+  """The text of a parsed component in `store_name` that can have references in it"""
+  if component is None or store_name == "code_blocks":
+    return None
+  if store_name == "variable_map":
+    return component.prompt
+  elif store_name == "dialog_elements":
+    return component.caption
+  return component.title
+
+class CmpFile(TypedDict):
+  name: str
+  root_tag: str | None
+  pointed_to_file: str | None
+  size: int
+
+# Enough of a component file to get to its root element's start tag
+cmp_head_bytes = 64 * 1024
+
+def read_root(input_file):
+  """Returns the root element of an XML file, reading only as far as its start tag"""
+  try:
+    for _, elem in etree.iterparse(input_file, events=("start",)):
+      return elem
+  except etree.XMLSyntaxError:
+    pass
+  return None
+
+def index_cmp_file(name, input_file, size) -> CmpFile:
+  root = read_root(input_file)
+  return {
+    "name": name,
+    "root_tag": root.tag if root is not None else None,
+    "pointed_to_file": root.get("pointedToFile") if root is not None else None,
+    "size": size,
+  }
+
+def find_master_cmp(cmp_index: list[CmpFile], path_mod=os.path):
+  """Finds the name of the master component file in a package's index.
+
+  That's the file that the first component library points to, or the first library
+  itself if it doesn't point anywhere. `path_mod` joins names (`posixpath` for zips).
+  Pointers are Windows paths, so are matched after normalizing, and case-insensitively
+  if they have to be.
+  """
+  for cmp_file in cmp_index:
+    if cmp_file["root_tag"] != component_library_tag:
+      continue
+    if not cmp_file["pointed_to_file"]:
+      return cmp_file["name"]
+    pointed_to_file = cmp_file["pointed_to_file"].replace("\\", "/")
+    master_name = path_mod.normpath(path_mod.join(path_mod.dirname(cmp_file["name"]), pointed_to_file))
+    names = [other["name"] for other in cmp_index]
+    found = next((name for name in names if path_mod.normpath(name) == master_name), None)
+    if found is None:
+      found = next((name for name in names if path_mod.normpath(name).casefold() == master_name.casefold()), None)
+    if found is None:
+      # Fall back to a file with the same name anywhere in the package
+      pointed_base = posixpath.basename(pointed_to_file).casefold()
+      found = next((name for name in names if path_mod.basename(name).casefold() == pointed_base), master_name)
+    return found
+  return None
+
 class HotDocsInterview:
 
-  def __init__(self, input_name):
+  def __init__(self, input_name=None, streaming=True):
     self.metadata = {}
     self.setup_info = {}
     self.page_map: dict[str, PageNode] = {}
-    self.dialogs: dict[str, dict] = {}
+    self.dialogs: dict[str, Dialog] = {}
     self.variable_map: dict[str, Variable] = {}
 
     # HotDoc specific things that might be useful
     self.preferences = {}
-    self.code_blocks = {}
+    self.code_blocks: dict[str, CodeBlock] = {}
     self.dup_choices = {}
     self.dialog_elements: dict[str, DialogElement] = {}
 
     self.master_cmp = None
 
-    is_zip = input_name.endswith(".zip")
-    if not is_zip:
-      all_cmp_files = glob.iglob(input_name + "/*cmp")
-      open_file = lambda f: open(f, "r")
+    self.cmp_index: list[CmpFile] = []
+
+    if input_name is None:
+      # Nothing to read yet; the caller parses components and resolves markup itself
+      return
+    self.load_package(input_name, streaming)
+    self.resolve_markup()
+
+  def load_package(self, input_name, streaming=True):
+    """Indexes the package's component files, and parses the master one"""
+    if input_name.endswith(".zip"):
+      # The zip is only open while component files are decompressed, and the master one
+      # is parsed from memory after it's closed
+      from .zip_package import ZipPackage
+      with ZipPackage(input_name) as package:
+        with phase("discover"):
+          cmp_names = [name for name in package.names() if is_cmp_name(name)]
+          with phase("read"):
+            heads = package.read_members(cmp_names, cmp_head_bytes)
+          for name in cmp_names:
+            self.cmp_index.append(index_cmp_file(name, BytesIO(heads[name]), package.size(name)))
+          self.master_cmp = find_master_cmp(self.cmp_index, posixpath)
+        self.check_master_cmp(input_name, self.master_cmp in package.members)
+        with phase("read"):
+          master_data = package.read(self.master_cmp)
+      self.load_master_cmp(BytesIO(master_data), streaming)
     else:
-      input_zip = ZipFile(input_name)
-      all_cmp_files = [ii for ii in input_zip.infolist() if ii.filename.endswith(".cmp")]
-      open_file = lambda inf: input_zip.open(inf)
-
-    master_cmp_file = None
-    for cmp_file in all_cmp_files:
-      with open_file(cmp_file) as f:
-        doc = etree.parse(f)
-        if doc.getroot().tag == xml_ns("componentLibrary"):
-          master_cmp_name = doc.getroot().get("pointedToFile", cmp_file)
-          print(master_cmp_name)
-          if is_zip:
-            master_cmp_file = open_file(input_zip.infolist()[0].filename + master_cmp_name)
-          else:
-            master_cmp_file = open_file(input_name + "/" + master_cmp_name)
-          break
-
-    if master_cmp_file:
-      self.parse_master_cmp(master_cmp_file)
-      master_cmp_file.close()
-
-    self.main_order_script = self.preferences.get("CUSTOM_INTERVIEW")
-
-    for var in self.variable_map.values():
-      if var.prompt:
-        var.prompt = self.sub_all_vars(var.prompt)
-    for elem in self.dialog_elements.values():
-      elem["caption"] = self.sub_all_vars(elem["caption"])
-    for dialog in self.dialogs.values():
-      if dialog["title"]:
-        dialog["title"] = self.sub_all_vars(dialog["title"])
+      with phase("discover"):
+        for cmp_path in cmp_paths(input_name):
+          with open(cmp_path, "rb") as f:
+            self.cmp_index.append(index_cmp_file(cmp_path, f, os.path.getsize(cmp_path)))
+        self.master_cmp = find_master_cmp(self.cmp_index, os.path)
+      # A pointer can lead outside of the directory, to a library that's shared
+      self.check_master_cmp(input_name, self.master_cmp is not None and os.path.isfile(self.master_cmp))
+      with open(self.master_cmp, "rb") as master_cmp_file:
+        self.load_master_cmp(master_cmp_file, streaming)
+
+  def check_master_cmp(self, input_name, found):
+    """Raises a `ValueError` if the package has no master component file, or points to one
+    that isn't there
+    """
+    if self.master_cmp is None:
+      raise ValueError(f"No component library (.cmp) found in {input_name}")
+    if not found:
+      raise ValueError(f"{input_name} points to a master component file that isn't there: {self.master_cmp}")
+
+  def resolve_markup(self):
+    """Once every component is read, turns markup and references in prompts and captions,
+    formatting in help, and references in titles into markdown and Mako
+    """
+    with phase("substitute"):
+      self.main_order_script = self.preferences.get("CUSTOM_INTERVIEW")
+
+      self.markup = HotDocsMarkup(self.code_blocks, self.variable_map)
+      for var in self.variable_map.values():
+        self.resolve_text(var)
+      for elem in self.dialog_elements.values():
+        self.resolve_text(elem)
+      for dialog in self.dialogs.values():
+        self.resolve_text(dialog)
+
+  def resolve_text(self, component):
+    """Converts one component's text, which is kept raw until now, so it only takes one pass"""
+    convert = self.markup.convert
+    if isinstance(component, Variable):
+      # A variable without a prompt ends up as "", and is set in code instead of asked for
+      component.prompt = convert(component.prompt)
+      # TODO(brycew): references in help and formatting codes in titles are left as they
+      # are, like they always were; converting them changes the output
+      component.help = convert(component.help, refs=False)
+    elif isinstance(component, DialogElement):
+      component.caption = convert(component.caption)
+    elif isinstance(component, Dialog):
+      if component.title:
+        component.title = convert(component.title, display=False)
 
   def __str__(self):
     return f"{self.master_cmp=}, {self.metadata=}, {self.setup_info=}, {self.variable_map=}"
@@ -211,55 +359,53 @@ class HotDocsInterview:
   def __repr__(self):
     return str(self)
 
-  vars_re = re.compile("«([^».]+)»")
-
   def sub_all_vars(self, text):
-    def sub_vars(match):
-      hd_name = match.group(1)
-      if hd_name.startswith("IF "):
-        if hd_name[3:] in self.code_blocks:
-          return "\n% if " + varname(hd_name[3:]) + "():\n"
-        else:
-          return "\n% if " + varname(hd_name[3:]) + ":\n"
-      elif hd_name.startswith("ELSE IF "):
-        if hd_name[8:] in self.code_blocks:
-          return "\n% elif " + varname(hd_name[8:]) + "():\n"
-        else:
-          return "\n% elif " + varname(hd_name[8:]) + ":\n"
-      elif hd_name == "END IF":
-        return "\n% endif\n"
-      elif hd_name in self.code_blocks:
-        return "${ " + self.code_blocks[hd_name]["da_func_name"] + "() }"
-      elif hd_name in self.variable_map:
-        return "${ " + self.variable_map[hd_name].da_name + " }"
-      # TODO(brycew): add to errors somewhere?
-      return varname(hd_name)
-
-    return self.vars_re.subn(sub_vars, text)[0]
+    """Replaces «...» references to computations and variables with Mako"""
+    return self.markup.convert(text, display=False)
+
+  def load_master_cmp(self, input_file, streaming=True):
+    with phase("parse"):
+      if streaming:
+        self.stream_master_cmp(timed_reader(input_file))
+      else:
+        self.parse_master_cmp(timed_reader(input_file))
 
   def parse_master_cmp(self, input_file):
-    doc = etree.parse(input_file)
+    self.parse_from_xml(etree.parse(input_file))
+
+  def parse_from_xml(self, doc):
     for elem in doc.getroot():
-      if elem.tag.lower() == xml_ns("preferences"):
+      if elem.tag.lower() == preferences_tag:
         self.parse_preferences(elem)
-      elif elem.tag.lower() == xml_ns("components"):
+      elif elem.tag.lower() == components_tag:
         for component in elem:
-          tag = component.tag
-          if tag == xml_ns("text"):
-            self.parse_text_var(component)
-          elif tag == xml_ns("number"):
-            self.parse_number_var(component)
-          elif tag == xml_ns("trueFalse"):
-            self.parse_tf_var(component)
-          elif tag == xml_ns("multipleChoice"):
-            self.parse_mc_var(component)
-          elif tag == xml_ns("computation"):
-            self.parse_computation(component)
-          elif tag == xml_ns("dialogElement"):
-            self.parse_dialog_element(component)
-          elif tag == xml_ns("dialog"):
-            self.parse_dialog(component)
-          # All other top levels are text formats, number formats, etc. Idk what to do with those.
+          self.parse_component(component)
+
+  def stream_master_cmp(self, input_file):
+    """Parses the master component file while reading it, instead of loading the whole tree first.
+
+    Each component is handled on its end tag, and then it (and any skipped components
+    before it) are thrown away, so memory doesn't grow with the size of the library.
+    """
+    for _, elem in etree.iterparse(input_file, events=("end",), tag=self.stream_tags):
+      parent = elem.getparent()
+      if parent is None:
+        continue
+      if elem.tag == preferences_tag:
+        if parent.getparent() is None:
+          self.parse_preferences(elem)
+          discard_elem(elem)
+      # Components like `text` also show up nested inside other components
+      elif parent.tag == components_tag:
+        self.parse_component(elem)
+        discard_elem(elem)
+
+  def parse_component(self, component):
+    parser = self.component_parsers.get(component.tag)
+    # All other top levels are text formats, number formats, etc. Idk what to do with those.
+    if parser:
+      with phase("components"):
+        parser(self, component)
 
   def parse_preferences(self, prefs):
     for pref in prefs:
@@ -273,11 +419,11 @@ class HotDocsInterview:
     help = None
     area = False
     for elem in text_elem:
-      if elem.tag == xml_ns("prompt"):
+      if elem.tag == prompt_tag:
         prompt = elem.text
-      elif elem.tag == xml_ns("resource"):
+      elif elem.tag == resource_tag:
         help = elem[0].text
-      elif elem.tag == xml_ns("multiLine"):
+      elif elem.tag == multi_line_tag:
         area = True
       # Ignore fieldWidth, columnWidth. Idk what to do with defMergeProps?
     # Also warnIfUnanswered?
@@ -292,11 +438,11 @@ class HotDocsInterview:
     help = None
     def_format = None
     for elem in number_elem:
-      if elem.tag == xml_ns("prompt"):
+      if elem.tag == prompt_tag:
         prompt = elem.text
-      elif elem.tag == xml_ns("resource"):
+      elif elem.tag == resource_tag:
         help = elem[0].text
-      elif elem.tag == xml_ns("defFormat"):
+      elif elem.tag == def_format_tag:
         def_format = elem.text
     # TODO: Also warnIfUnanswered?
     self.variable_map[name] = NumberVariable(name, prompt, help, decimal_places, currency_symbol, def_format)
@@ -308,9 +454,9 @@ class HotDocsInterview:
     prompt = None
     help = None
     for elem in tf_elem:
-      if elem.tag == xml_ns("prompt"):
+      if elem.tag == prompt_tag:
         prompt = elem.text
-      elif elem.tag == xml_ns("resource"):
+      elif elem.tag == resource_tag:
         help = elem[0].text
     # Also warnIfUnanswered?
     self.variable_map[name] = TrueFalseVariable(name, prompt, help, yes_no)
@@ -327,30 +473,22 @@ class HotDocsInterview:
     result_type = computation.get("resultType")
     script = ""
     for elem in computation:
-      if elem.tag == xml_ns("script"):
+      if elem.tag == script_tag:
         script = elem.text
     # TODO(brycew): parse Hotdocs script, for things with result, when it would return,
     # set the value to this.
     # Alternate: make everything functions? Looks like hot docs re-evals
     # everything when it can
-    self.code_blocks[name] = {
-      "name": name,
-      "da_func_name": varname(name),
-      "result_type": result_type,
-      "script": script
-    }
+    self.code_blocks[name] = CodeBlock(name, varname(name), result_type, script)
 
 
   def parse_dialog_element(self, dialog_element):
     name = dialog_element.get("name")
     caption = None
     for elem in dialog_element:
-      if elem.tag == xml_ns("caption"):
+      if elem.tag == caption_tag:
         caption = elem.text
-    self.dialog_elements[name] = {
-      "name": name,
-      "caption": parse_display_text(caption),
-    }
+    self.dialog_elements[name] = DialogElement(name, caption)
 
   def parse_dialog(self, dialog):
     name = dialog.get("name")
@@ -359,17 +497,24 @@ class HotDocsInterview:
     title = None
     contents = []
     for elem in dialog:
-      if elem.tag == xml_ns("title"):
+      if elem.tag == title_tag:
         title = elem.text
-      elif elem.tag == xml_ns("contents"):
+      elif elem.tag == contents_tag:
         for item in elem:
-          contents.append({"name": item.get("name"), "on_previous_line": item.get("onPreviousLine")})
-    self.dialogs[name] = {
-      "name": name,
-      "da_name": da_name,
-      "title": title,
-      "contents": contents,
-    }
+          contents.append(DialogItem(item.get("name"), item.get("onPreviousLine")))
+    self.dialogs[name] = Dialog(name, da_name, title, contents)
+
+  # Maps each component tag we know how to handle to the method that parses it
+  component_parsers = {
+    text_tag: parse_text_var,
+    number_tag: parse_number_var,
+    true_false_tag: parse_tf_var,
+    multiple_choice_tag: parse_mc_var,
+    computation_tag: parse_computation,
+    dialog_element_tag: parse_dialog_element,
+    dialog_tag: parse_dialog,
+  }
+  stream_tags = (preferences_tag, *component_parsers)
 
   def to_question_screen(self, name):
     if name in self.dialog_elements:
@@ -377,84 +522,92 @@ class HotDocsInterview:
     if name in self.variable_map:
       return self.variable_map[name]
     # print(f"No thing with {name}?")
-    return {}
+    return None
 
 
   def merge_choices(self):
     if self.dup_choices:
       # Don't try to merge more than once
       return
-    mcs = [var for _, var in self.variable_map.items() if isinstance(var, MultipleChoiceVariable)]
-    # TODO(brycew): O(n^2) could be better
-    self.dup_choices = {}
-    for idx, mc in enumerate(mcs):
-      # If these choices are already duplicates, don't need to check again
-      if isinstance(mc.options, str):
-        continue
-      mc_sorted = list(sorted(mc.options))
-      has_dup = False
-      for mc2 in mcs[idx+1:]:
-        if not isinstance(mc2.options, str) and mc_sorted == list(sorted(mc2.options)):
-          has_dup = True
-          dup_name = mc.da_name + "_choices"
-          self.dup_choices[dup_name] = mc_sorted
-          mc2.options = dup_name
-      if has_dup:
-        mc.options = dup_name
-
-
-  def to_yaml_objs(self):
+    with phase("merge_choices"):
+      # Group the multiple choice variables by their sorted options, in the order each set first shows up
+      same_choices: dict[tuple, list[MultipleChoiceVariable]] = {}
+      for var in self.variable_map.values():
+        # If these choices are already duplicates, don't need to check again
+        if isinstance(var, MultipleChoiceVariable) and not isinstance(var.options, str):
+          same_choices.setdefault(tuple(sorted(var.options)), []).append(var)
+      self.dup_choices = {}
+      for sorted_options, mcs in same_choices.items():
+        if len(mcs) < 2:
+          continue
+        dup_name = mcs[0].da_name + "_choices"
+        self.dup_choices[dup_name] = list(sorted_options)
+        for mc in mcs:
+          mc.options = dup_name
+
+
+  def to_question_block(self, dialog_name, dialog):
+    dialog_items = [self.to_question_screen(dialog_item.name) for dialog_item in dialog.contents]
+    subquestion = ""
+    fields = []
+    seen_variable = False
+    for idx, dialog_item in enumerate(dialog_items):
+      if isinstance(dialog_item, DialogElement) and dialog_item.caption.strip():
+        capt = dialog_item.caption.strip()
+        if not seen_variable:
+          subquestion += f"{capt}\n\n"
+        else:
+          fields.append({"note": capt})
+      elif isinstance(dialog_item, Variable):
+        seen_variable = True
+        fields.append(dialog_item.get_field())
+    question = {
+        "id": dialog_name,
+        "question": dialog.title,
+        "subquestion": subquestion.rstrip(),
+      }
+    if fields:
+      question["fields"] = fields
+    else:
+      question["continue button field"] = dialog.da_name
+    # NOTE: TEMP for testing
+    question["mandatory"] = True
+    return question
+
+  # When the YAML is split into files, how many dialogs go in each
+  dialogs_per_part = 100
+
+  def iter_yaml_parts(self):
+    """Each block, with the part of the interview it goes in when the YAML is split into
+    files (see `dakirby.split`): "metadata", "choices", a group of dialogs, or "computations"
+    """
     self.merge_choices()
-    metadata = {
+    yield "metadata", {
       "metadata": self.metadata
     }
-    dialogs = []
-    for dialog_name, dialog in self.dialogs.items():
-      dialog_items = [self.to_question_screen(dialog_item["name"]) for dialog_item in dialog["contents"]]
-      subquestion = ""
-      fields = []
-      seen_variable = False
-      for idx, dialog_item in enumerate(dialog_items):
-        if isinstance(dialog_item, dict) and dialog_item and dialog_item["caption"].strip():
-          capt = dialog_item["caption"].strip()
-          if not seen_variable:
-            subquestion += f"{capt}\n\n"
-          else:
-            fields.append({"note": capt})
-        elif isinstance(dialog_item, Variable):
-          seen_variable = True
-          fields.append(dialog_item.get_field())
-      question = {
-          "id": dialog_name,
-          "question": dialog["title"],
-          "subquestion": subquestion.rstrip(),
-        }
-      if fields:
-        question["fields"] = fields
-      else:
-        question["continue button field"] = dialog["da_name"]
-      # NOTE: TEMP for testing
-      question["mandatory"] = True
-      dialogs.append(question)
-    choices = [
-      {"variable name": dup_name } | {"data": [{val : disp} if disp != val else val for disp, val in dup_opts]}
-      for dup_name, dup_opts in self.dup_choices.items()
-    ]
-    variables = [
-      {
+    for dup_name, dup_opts in self.dup_choices.items():
+      yield "choices", {"variable name": dup_name } | {"data": [{val : disp} if disp != val else val for disp, val in dup_opts]}
+    for idx, (dialog_name, dialog) in enumerate(self.dialogs.items()):
+      yield f"dialogs_{idx // self.dialogs_per_part + 1}", self.to_question_block(dialog_name, dialog)
+    for v in self.code_blocks.values():
+      yield "computations", {
         "id": v.name,
-        "code": f"{v.da_name} = False"
-      }
-      for v in self.variable_map.values() if v.prompt == ""
-    ]
-    computations = [
-      {
-        "id": v["name"],
-        "code": f"def {v['da_func_name']}():\n  return '''tmp for code {v['name']}'''",
+        "code": f"def {v.da_func_name}():\n  return '''tmp for code {v.name}'''",
       }
-       for v in self.code_blocks.values()
-    ]
-    return [metadata] + choices + dialogs + computations + variables
+    # Variables that are never asked for are set in code, so they go with the computations
+    for v in self.variable_map.values():
+      if v.prompt == "":
+        yield "computations", {
+          "id": v.name,
+          "code": f"{v.da_name} = False"
+        }
+
+  def iter_yaml_objs(self):
+    for _, obj in self.iter_yaml_parts():
+      yield obj
+
+  def to_yaml_objs(self):
+    return list(self.iter_yaml_objs())
 
 
 # TODO: to focus on:
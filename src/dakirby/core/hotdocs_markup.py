@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""Converts HotDocs «...» chevron markup to markdown and Mako, in one scan over the text"""
+
+import re
+
+from .common import LazyRegex, varname
+
+chevron = LazyRegex(r"«([^«»]*)»")
+# The '.' before `w` matches anything but a newline, like it did in the original link regex
+web_link_start = LazyRegex(r'[^\n]w "(.+)"\Z', re.S)
+
+display_codes = {
+  ".b": "**", ".be": "**",
+  # Treat underlines the same as bold (underlines are harder to read)
+  ".u": "**", ".ue": "**",
+  ".i": "*", ".ie": "*",
+  ".lq": '"', ".rq": '"',
+  # TODO: ask brett about «.lb, «.c», and «.z»
+  ".c": "", ".z": "", ".ze": "", ".lb": "",
+}
+# Codes that were replaced before links were matched, so they can be in a link's text
+link_text_codes = frozenset([".b", ".be", ".u", ".ue", ".i", ".ie", ".lq", ".rq"])
+
+def is_web_link_end(inner):
+  return len(inner) == 3 and inner[0] != "\n" and inner[1:] == "we"
+
+# The original two stage pipeline: still used for text with unbalanced, nested, or empty
+# chevrons, where the order of its passes changes the result
+web_chevron = LazyRegex(r'«.w "([^»]+)"»([^«]+)«.we»')
+vars_re = LazyRegex("«([^».]+)»")
+
+def referenced_names(text):
+  """Every name a «...» in `text` could refer to, including the conditions of IFs"""
+  if not text:
+    return frozenset()
+  names = set()
+  for inner in chevron.findall(text) + vars_re.findall(text):
+    if inner.startswith("IF "):
+      inner = inner[3:]
+    elif inner.startswith("ELSE IF "):
+      inner = inner[8:]
+    names.add(inner)
+  return frozenset(names)
+
+def replace_display_codes(text):
+  text = text.replace("«.b»", "**").replace("«.be»", "**")
+  text = text.replace("«.u»", "**").replace("«.ue»", "**")
+  text = text.replace("«.i»", "*").replace("«.ie»", "*")
+  text = text.replace("«.lq»", '"').replace("«.rq»", '"')
+  text = web_chevron.sub(r"[\2](\1)", text)
+  text = text.replace("«.c»", '').replace("«.z»", '').replace("«.ze»", '').replace("«.lb»", '')
+  return text
+
+class HotDocsMarkup:
+  """Turns formatting codes, web links, IF / ELSE IF / END IF, and computation and variable
+  references into markdown and Mako, using lookup tables built once per interview.
+  """
+
+  def __init__(self, code_blocks=None, variable_map=None):
+    self.code_blocks = {}
+    self.refs: dict[str, str] = {}
+    # What each «...» became, so repeats don't need `varname` again
+    self.sub_refs: dict[str, str] = {}
+    self.update(code_blocks or {}, variable_map or {})
+
+  def update(self, code_blocks, variable_map):
+    """Adds computations and variables to the lookup tables; computations win name clashes"""
+    self.code_blocks.update(code_blocks)
+    self.sub_refs.clear()
+    for name, var in variable_map.items():
+      if name not in self.code_blocks:
+        self.refs[name] = "${ " + var.da_name + " }"
+    for name, block in code_blocks.items():
+      self.refs[name] = "${ " + block.da_func_name + "() }"
+
+  def sub_ref(self, hd_name):
+    if hd_name.startswith("IF "):
+      call = "():\n" if hd_name[3:] in self.code_blocks else ":\n"
+      return "\n% if " + varname(hd_name[3:]) + call
+    elif hd_name.startswith("ELSE IF "):
+      call = "():\n" if hd_name[8:] in self.code_blocks else ":\n"
+      return "\n% elif " + varname(hd_name[8:]) + call
+    elif hd_name == "END IF":
+      return "\n% endif\n"
+    ref = self.refs.get(hd_name)
+    if ref is not None:
+      return ref
+    # TODO(brycew): add to errors somewhere?
+    return varname(hd_name)
+
+  def convert(self, text, display=True, refs=True):
+    """Converts `text` in one pass.
+
+    `display` handles formatting codes and links, and `refs` handles IFs and references.
+    """
+    if not text:
+      return "" if display else text
+    if "«" not in text:
+      return text
+    # Alternates between plain text (even indices) and what's inside each «» (odd indices)
+    parts = chevron.split(text)
+    num_parts = len(parts)
+    num_tokens = num_parts // 2
+    # The original link regex's wildcard can match a chevron, so leave empty «» to it too
+    if text.count("«") != num_tokens or text.count("»") != num_tokens or "«»" in text:
+      return self.convert_in_stages(text, display, refs)
+
+    codes = display_codes if display else {}
+    sub_refs = self.sub_refs
+    idx = 1
+    while idx < num_parts:
+      inner = parts[idx]
+      replacement = codes.get(inner)
+      if replacement is None:
+        if display and inner[-1] == '"':
+          link = web_link_start.match(inner)
+          if link:
+            end_idx = self.find_link_end(parts, idx)
+            if end_idx:
+              link_text = "".join(parts[pos] if pos % 2 == 0 else display_codes[parts[pos]] for pos in range(idx + 1, end_idx))
+              parts[idx] = "[" + link_text + "](" + link.group(1) + ")"
+              for pos in range(idx + 1, end_idx + 1):
+                parts[pos] = ""
+              idx = end_idx + 2
+              continue
+        if refs and "." not in inner:
+          replacement = sub_refs.get(inner)
+          if replacement is None:
+            replacement = sub_refs[inner] = self.sub_ref(inner)
+        else:
+          replacement = "«" + inner + "»"
+      parts[idx] = replacement
+      idx += 2
+    return "".join(parts)
+
+  @staticmethod
+  def find_link_end(parts, start_idx):
+    """Finds the «.we» for the link that starts at `start_idx`, if it's a link the original regex matched"""
+    end_idx = start_idx + 2
+    while end_idx < len(parts) and parts[end_idx] in link_text_codes:
+      end_idx += 2
+    if end_idx < len(parts) and is_web_link_end(parts[end_idx]):
+      # The link text can't be empty
+      if end_idx > start_idx + 2 or parts[start_idx + 1]:
+        return end_idx
+    return None
+
+  def convert_in_stages(self, text, display=True, refs=True):
+    if display:
+      text = replace_display_codes(text)
+    if refs:
+      text = vars_re.sub(lambda match: self.sub_ref(match.group(1)), text)
+    return text
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""The graph of which A2J pages lead to which, from their buttons.
+
+Pages get integer IDs in `page_map` order, and edges are kept in CSR form: the targets of
+page `i` are `targets[offsets[i]:offsets[i + 1]]`, in button order. Every traversal uses
+explicit stacks instead of recursion, so guides with tens of thousands of pages (or one
+very long chain of them) take linear time and don't hit the recursion limit.
+"""
+
+from array import array
+
+from .common import varname
+
+class PageGraph:
+  names: list[str]
+  ids: dict[str, int]
+  offsets: array
+  targets: array
+  start: int | None
+  # Button targets that aren't pages, by the page with the button
+  missing: dict[str, list[str]]
+
+  def __init__(self, page_map, first_page_name=None):
+    self.names = list(page_map)
+    self.ids = {name: idx for idx, name in enumerate(self.names)}
+    self.offsets = array("l", [0])
+    self.targets = array("l")
+    self.missing = {}
+    for name, page in page_map.items():
+      seen = set()
+      for button in page.buttons:
+        next_name = button.get("next")
+        if not next_name or next_name.lower() == "fail" or next_name in seen:
+          continue
+        seen.add(next_name)
+        target = self.ids.get(next_name)
+        if target is None:
+          self.missing.setdefault(name, []).append(next_name)
+        else:
+          self.targets.append(target)
+      self.offsets.append(len(self.targets))
+    self.start = self.ids.get(first_page_name)
+
+  @classmethod
+  def from_interview(cls, interview):
+    return cls(interview.page_map, interview.first_page_name)
+
+  def __len__(self):
+    return len(self.names)
+
+  def children(self, name) -> list[str]:
+    idx = self.ids[name]
+    return [self.names[target] for target in self.targets[self.offsets[idx]:self.offsets[idx + 1]]]
+
+  def depth_first(self, start=None) -> tuple[list[int], list[int]]:
+    """The pre- and postorder IDs of the pages reachable from `start` (the first page by default)"""
+    start = self.start if start is None else start
+    if start is None:
+      return [], []
+    offsets, targets = self.offsets, self.targets
+    visited = bytearray(len(self.names))
+    visited[start] = 1
+    preorder = [start]
+    postorder = []
+    stack = [start]
+    edge_stack = [offsets[start]]
+    while stack:
+      node = stack[-1]
+      edge = edge_stack[-1]
+      if edge < offsets[node + 1]:
+        edge_stack[-1] = edge + 1
+        child = targets[edge]
+        if not visited[child]:
+          visited[child] = 1
+          preorder.append(child)
+          stack.append(child)
+          edge_stack.append(offsets[child])
+      else:
+        stack.pop()
+        edge_stack.pop()
+        postorder.append(node)
+    return preorder, postorder
+
+  def reachable(self) -> list[str]:
+    """Pages that can be reached from the first page, in the order a depth first walk finds them"""
+    return [self.names[idx] for idx in self.depth_first()[0]]
+
+  def unreachable(self) -> list[str]:
+    """Pages that no path from the first page leads to, in `page_map` order"""
+    reached = bytearray(len(self.names))
+    for idx in self.depth_first()[0]:
+      reached[idx] = 1
+    return [name for idx, name in enumerate(self.names) if not reached[idx]]
+
+  def mandatory_order(self) -> list[str]:
+    """The reachable pages in reverse postorder: each page comes before the pages it leads
+    to, except along the back edge of a loop. The same guide always gives the same order.
+    """
+    return [self.names[idx] for idx in reversed(self.depth_first()[1])]
+
+  def strongly_connected_components(self) -> list[list[str]]:
+    """Tarjan's algorithm, without recursion. Components come out in reverse topological
+    order (a component before any that lead to it), and each is in the order it was found.
+    """
+    offsets, targets = self.offsets, self.targets
+    num_pages = len(self.names)
+    unvisited = -1
+    index = array("l", [unvisited]) * num_pages
+    lowlink = array("l", [0]) * num_pages
+    on_stack = bytearray(num_pages)
+    component_stack = []
+    components = []
+    next_index = 0
+    for root in range(num_pages):
+      if index[root] != unvisited:
+        continue
+      index[root] = lowlink[root] = next_index
+      next_index += 1
+      component_stack.append(root)
+      on_stack[root] = 1
+      stack = [root]
+      edge_stack = [offsets[root]]
+      while stack:
+        node = stack[-1]
+        edge = edge_stack[-1]
+        if edge < offsets[node + 1]:
+          edge_stack[-1] = edge + 1
+          child = targets[edge]
+          if index[child] == unvisited:
+            index[child] = lowlink[child] = next_index
+            next_index += 1
+            component_stack.append(child)
+            on_stack[child] = 1
+            stack.append(child)
+            edge_stack.append(offsets[child])
+          elif on_stack[child] and index[child] < lowlink[node]:
+            lowlink[node] = index[child]
+          continue
+        stack.pop()
+        edge_stack.pop()
+        if stack and lowlink[node] < lowlink[stack[-1]]:
+          lowlink[stack[-1]] = lowlink[node]
+        if lowlink[node] == index[node]:
+          start = len(component_stack) - 1
+          while component_stack[start] != node:
+            start -= 1
+          component = component_stack[start:]
+          del component_stack[start:]
+          for member in component:
+            on_stack[member] = 0
+          components.append([self.names[member] for member in component])
+    return components
+
+  def cycles(self) -> list[list[str]]:
+    """The components that loop: more than one page, or a page with a button to itself"""
+    cycles = []
+    for component in self.strongly_connected_components():
+      if len(component) > 1:
+        cycles.append(component)
+      else:
+        idx = self.ids[component[0]]
+        if idx in self.targets[self.offsets[idx]:self.offsets[idx + 1]]:
+          cycles.append(component)
+    return cycles
+
+  def has_cycles(self) -> bool:
+    return bool(self.cycles())
+
+  def mandatory_block(self) -> dict:
+    """A docassemble mandatory code block that asks each reachable page in `mandatory_order`"""
+    return {
+      "id": "interview order",
+      "mandatory": True,
+      "code": "\n".join(varname(name) for name in self.mandatory_order()),
+    }
+
+  def report(self) -> dict:
+    """A summary of the graph's shape, for people fixing a guide"""
+    cycles = self.cycles()
+    return {
+      "pages": len(self.names),
+      "edges": len(self.targets),
+      "first_page": self.names[self.start] if self.start is not None else None,
+      "reachable": len(self.depth_first()[0]),
+      "unreachable": self.unreachable(),
+      "cycles": cycles,
+      "missing_targets": self.missing,
+    }
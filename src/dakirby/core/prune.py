@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""Removing the pages and components that nothing in an interview leads to, before YAML output.
+
+For A2J guides, that's the pages no button path from the first page reaches. For HotDocs
+libraries, it's the dialogs, variables, computations and dialog elements that aren't
+reached from the interview's start: the `CUSTOM_INTERVIEW` computation if there is one,
+or else every dialog. Dialogs lead to what's in their contents and to what their titles
+reference, variables and dialog elements to what their text references, and computations
+to every component their script names.
+"""
+
+import re
+
+from .common import LazyRegex
+from .docassemble import to_yaml
+
+# What resolved «...» references look like, after `HotDocsMarkup.convert`
+mako_ref = LazyRegex(r"\$\{ (\w+)(?:\(\))? \}|^% (?:el)?if (\w+)(?:\(\))?:$", re.M)
+leading_word = LazyRegex(r"\w+")
+
+class YamlCounter:
+  """A file-like object that only counts the blocks and UTF-8 bytes written to it by `to_yaml`"""
+
+  def __init__(self):
+    self.blocks = 0
+    self.bytes = 0
+
+  def write(self, text):
+    # `to_yaml` writes each block in one call
+    self.blocks += 1
+    self.bytes += len(text.encode("utf-8"))
+
+def yaml_size(interview) -> tuple[int, int]:
+  """The number of blocks and UTF-8 bytes in an interview's YAML, without changing it.
+
+  The YAML is made a block at a time and only counted, so it's never all in memory.
+  """
+  # Making HotDocs YAML merges choices, which changes the variables; they're put back after
+  merged = getattr(interview, "dup_choices", None) == {}
+  if merged:
+    options = [(var, var.options) for var in interview.variable_map.values() if hasattr(var, "options")]
+  counter = YamlCounter()
+  try:
+    to_yaml(interview.iter_yaml_objs(), counter)
+  finally:
+    if merged:
+      for var, var_options in options:
+        var.options = var_options
+      interview.dup_choices = {}
+  return counter.blocks, counter.bytes
+
+def prune_a2j(interview) -> dict[str, list[str]]:
+  graph = interview.page_graph()
+  if graph.start is None:
+    # Without a first page there's nothing to walk from; better to keep everything
+    return {"pages": []}
+  removed = graph.unreachable()
+  for name in removed:
+    del interview.page_map[name]
+  return {"pages": removed}
+
+class NameScanner:
+  """Finds which of a set of (possibly multi-word) names appear in a script, in one pass over it"""
+
+  def __init__(self, names):
+    self.by_first_word: dict[str, list[str]] = {}
+    self.other_names = []
+    for name in names:
+      first_word = leading_word.match(name)
+      if first_word:
+        self.by_first_word.setdefault(first_word.group(0), []).append(name)
+      else:
+        self.other_names.append(name)
+
+  def find(self, script):
+    found = set()
+    if not script:
+      return found
+    for word in leading_word.finditer(script):
+      candidates = self.by_first_word.get(word.group(0))
+      if not candidates:
+        continue
+      start = word.start()
+      if start > 0 and (script[start - 1].isalnum() or script[start - 1] == "_"):
+        continue
+      for name in candidates:
+        end = start + len(name)
+        if script.startswith(name, start) and (end == len(script) or not (script[end].isalnum() or script[end] == "_")):
+          found.add(name)
+    found.update(name for name in self.other_names if name in script)
+    return found
+
+def hotdocs_references(interview):
+  """The names each component leads to, by component name"""
+  by_da_name: dict[str, list[str]] = {}
+  for name, var in interview.variable_map.items():
+    by_da_name.setdefault(var.da_name, []).append(name)
+  for name, block in interview.code_blocks.items():
+    by_da_name.setdefault(block.da_func_name, []).append(name)
+
+  def text_refs(text):
+    refs = []
+    if text:
+      for match in mako_ref.finditer(text):
+        refs.extend(by_da_name.get(match.group(1) or match.group(2), ()))
+    return refs
+
+  scanner = NameScanner(interview.dialogs.keys() | interview.variable_map.keys() |
+                        interview.code_blocks.keys() | interview.dialog_elements.keys())
+  references: dict[str, list[str]] = {}
+  for name, dialog in interview.dialogs.items():
+    references.setdefault(name, []).extend([item.name for item in dialog.contents] + text_refs(dialog.title))
+  for name, var in interview.variable_map.items():
+    references.setdefault(name, []).extend(text_refs(var.prompt))
+  for name, elem in interview.dialog_elements.items():
+    references.setdefault(name, []).extend(text_refs(elem.caption))
+  for name, block in interview.code_blocks.items():
+    references.setdefault(name, []).extend(scanner.find(block.script))
+  return references
+
+def prune_hotdocs(interview) -> dict[str, list[str]]:
+  references = hotdocs_references(interview)
+  main_name = interview.preferences.get("CUSTOM_INTERVIEW")
+  if main_name in interview.code_blocks:
+    roots = [main_name]
+  else:
+    roots = list(interview.dialogs)
+  reached = set(roots)
+  to_visit = list(roots)
+  while to_visit:
+    for ref in references.get(to_visit.pop(), ()):
+      if ref not in reached:
+        reached.add(ref)
+        to_visit.append(ref)
+
+  removed = {}
+  for kind, store in (("dialogs", interview.dialogs), ("computations", interview.code_blocks),
+                      ("variables", interview.variable_map), ("dialog_elements", interview.dialog_elements)):
+    removed[kind] = [name for name in store if name not in reached]
+    for name in removed[kind]:
+      del store[name]
+  return removed
+
+def prune(interview, measure=False) -> dict:
+  """Removes the unreachable parts of an A2J or HotDocs interview, in place.
+
+  Returns the names removed, by kind. With `measure`, also has the number of YAML blocks
+  and bytes before and after, which costs making (but not keeping) the YAML two extra
+  times: once before pruning, and once after.
+  """
+  if measure:
+    blocks_before, bytes_before = yaml_size(interview)
+  if hasattr(interview, "page_graph"):
+    removed = prune_a2j(interview)
+  else:
+    if interview.dup_choices:
+      raise ValueError("Prune a HotDocs interview before its choices are merged (before making its YAML)")
+    removed = prune_hotdocs(interview)
+  report = {"removed": removed}
+  if measure:
+    blocks_after, bytes_after = yaml_size(interview)
+    report.update({
+      "blocks_before": blocks_before,
+      "blocks_after": blocks_after,
+      "bytes_before": bytes_before,
+      "bytes_after": bytes_after,
+      "bytes_saved": bytes_before - bytes_after,
+    })
+  return report
+
+def summarize(report) -> str:
+  removed = ", ".join(f"{len(names)} {kind.replace('_', ' ')}" for kind, names in report["removed"].items())
+  summary = f"Pruned {removed}"
+  if "bytes_before" in report:
+    before = report["bytes_before"]
+    percent = 100 * report["bytes_saved"] / before if before else 0
+    summary += (f"; {report['blocks_before'] - report['blocks_after']} fewer blocks, "
+                f"{before / 1024:.1f} KiB -> {report['bytes_after'] / 1024:.1f} KiB ({percent:.0f}% smaller)")
+  return summary
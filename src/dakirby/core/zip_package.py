@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Reading the members of a zipped interview package.
+
+The archive is opened once, and members are named by their normalized path (forward
+slashes, no `.` or `..` parts), so they match the Windows paths HotDocs writes into its
+files once those are normalized the same way. `read_members` decompresses several members
+(or just the start of each) at once on a thread pool; zlib lets go of the GIL while it
+inflates, so packages with many templates don't read them one after another.
+"""
+
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from zipfile import ZipFile, ZipInfo
+
+def normalize_member_name(name: str) -> str:
+  """A zip member's path with forward slashes and without `.`, `..` or a leading slash"""
+  normalized = posixpath.normpath(name.replace("\\", "/")).lstrip("/")
+  return "" if normalized == "." else normalized
+
+class ZipPackage:
+  """An open zip, closed by `close` or on leaving a `with` block"""
+
+  def __init__(self, path, max_workers=None):
+    self.path = path
+    self.max_workers = max_workers
+    self.zip_file = ZipFile(path)
+    self.members: dict[str, ZipInfo] = {}
+    for info in self.zip_file.infolist():
+      if info.is_dir():
+        continue
+      name = normalize_member_name(info.filename)
+      # If two entries normalize to the same name, the first one wins
+      if name and name not in self.members:
+        self.members[name] = info
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
+    return False
+
+  def close(self):
+    self.zip_file.close()
+
+  def names(self, suffix="") -> list[str]:
+    """Normalized member names ending with `suffix` (in any case), in archive order"""
+    suffix = suffix.casefold()
+    return [name for name in self.members if name.casefold().endswith(suffix)]
+
+  def size(self, name) -> int:
+    return self.members[name].file_size
+
+  def read(self, name, limit=-1) -> bytes:
+    """The decompressed contents of a member, given its normalized name, or only the first
+    `limit` bytes of it
+    """
+    with self.zip_file.open(self.members[name]) as f:
+      return f.read(limit)
+
+  def read_members(self, names, limit=-1) -> dict[str, bytes]:
+    """Decompresses several members (or their first `limit` bytes), concurrently when
+    there's more than one
+    """
+    names = list(names)
+    if len(names) < 2:
+      return {name: self.read(name, limit) for name in names}
+    # `ZipFile` locks around each seek and read of the archive, so threads can share it
+    with ThreadPoolExecutor(self.max_workers) as executor:
+      return dict(zip(names, executor.map(self.read, names, [limit] * len(names))))
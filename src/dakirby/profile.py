@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""Per-phase wall time, CPU time, and peak memory of a conversion.
+
+Code marks its phases with `with phase("parse"):` (`phase` and `timed_reader` live in
+`dakirby.core.common`, so the converters don't depend on this module). While a `Profiler`
+is active, each phase's time (not counting the phases nested inside it) and its peak traced memory are
+added up by name; otherwise `phase` hands back a shared do-nothing context, so marking
+phases costs next to nothing.
+
+    with Profiler() as profiler:
+      interview = load_interview(path)
+    print(profiler.report())
+"""
+
+import json
+import sys
+import time
+import tracemalloc
+
+from .core.common import phase, set_profiler, timed_reader  # noqa: F401
+
+class Profiler:
+  """Records phases while active (as a context manager). With `track_memory`, each phase's
+  peak memory comes from `tracemalloc`, which also makes everything run a few times slower.
+  """
+
+  def __init__(self, track_memory=True):
+    self.track_memory = track_memory
+    self.phases: dict[str, dict] = {}
+    self.counts: dict[str, int] = {}
+    self.total = None
+    # Each open phase: [name, wall start, cpu start, wall in children, cpu in children, peak memory]
+    self._stack = []
+    self._started_tracing = False
+    self._previous = None
+
+  def __enter__(self):
+    if self.track_memory and not tracemalloc.is_tracing():
+      tracemalloc.start()
+      self._started_tracing = True
+    self._previous = set_profiler(self)
+    self.enter(None)
+    return self
+
+  def __exit__(self, *exc_info):
+    self.exit()
+    set_profiler(self._previous)
+    if self._started_tracing:
+      tracemalloc.stop()
+      self._started_tracing = False
+    return False
+
+  def _peak_memory(self):
+    if not self.track_memory:
+      return 0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.reset_peak()
+    return peak
+
+  def enter(self, name):
+    if self._stack:
+      parent = self._stack[-1]
+      parent[5] = max(parent[5], self._peak_memory())
+    else:
+      self._peak_memory()
+    self._stack.append([name, time.perf_counter(), time.process_time(), 0.0, 0.0, 0])
+
+  def exit(self):
+    wall_end = time.perf_counter()
+    cpu_end = time.process_time()
+    name, wall_start, cpu_start, child_wall, child_cpu, peak = self._stack.pop()
+    peak = max(peak, self._peak_memory())
+    wall = wall_end - wall_start
+    cpu = cpu_end - cpu_start
+    if name is None:
+      self.total = {"wall": wall, "cpu": cpu, "peak_bytes": peak}
+      return
+    stats = self.phases.get(name)
+    if stats is None:
+      stats = self.phases[name] = {"wall": 0.0, "cpu": 0.0, "peak_bytes": 0, "calls": 0}
+    stats["wall"] += wall - child_wall
+    stats["cpu"] += cpu - child_cpu
+    stats["peak_bytes"] = max(stats["peak_bytes"], peak)
+    stats["calls"] += 1
+    parent = self._stack[-1]
+    parent[3] += wall
+    parent[4] += cpu
+    parent[5] = max(parent[5], peak)
+
+  def count(self, name, amount=1):
+    self.counts[name] = self.counts.get(name, 0) + amount
+
+  def report(self) -> dict:
+    return {
+      "phases": self.phases,
+      "counts": self.counts,
+      "total": self.total,
+      "memory_tracked": self.track_memory,
+    }
+
+def interview_counts(interview) -> dict[str, int]:
+  """How many pages, fields, variables, dialogs, and code blocks an interview has"""
+  page_map = getattr(interview, "page_map", {})
+  dialogs = getattr(interview, "dialogs", {})
+  variable_map = getattr(interview, "variable_map", {})
+  fields = sum(len(getattr(page, "fields", ())) for page in page_map.values())
+  fields += sum(1 for dialog in dialogs.values() for item in dialog.contents if item.name in variable_map)
+  return {
+    "pages": len(page_map),
+    "fields": fields,
+    "variables": len(variable_map),
+    "dialogs": len(dialogs),
+    "code_blocks": len(getattr(interview, "code_blocks", {})),
+  }
+
+def write_report(report, destination="-"):
+  """Writes a report as JSON to the file at `destination`, or to stderr for "-" """
+  if destination == "-":
+    json.dump(report, sys.stderr, indent=2)
+    sys.stderr.write("\n")
+  else:
+    with open(destination, "w") as f:
+      json.dump(report, f, indent=2)
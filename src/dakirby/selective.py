@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""Converting only some of an interview: the A2J pages, or HotDocs dialogs and other
+components, asked for by name.
+
+Loading only indexes the pages or components by name; `select` builds the ones asked for,
+and for HotDocs, everything they reference too (the contents of a dialog, the variables
+and computations in «» references, and the components named in a computation's script).
+Only those have their markup resolved, so regenerating a few screens doesn't pay for
+building the rest of a large library.
+
+    interview = SelectiveHotDocsInterview("package.zip")
+    interview.select(["Client Info Dialog"])
+    to_yaml(interview.iter_yaml_objs(), sys.stdout)
+"""
+
+from lxml import etree
+
+from .core.a2jauthor import A2JInterview, A2JPage
+from .core.a2jauthor_json import A2JJsonInterview, attr_value
+from .core.common import varname
+from .core.hotdocs import (HotDocsInterview, MultipleChoiceVariable, component_stores, component_text, mc_options,
+    multiple_choice_tag, options_tag)
+from .core.hotdocs_markup import referenced_names
+from .core.prune import NameScanner
+from .profile import phase
+
+# Where built HotDocs components are kept
+store_names = tuple(dict.fromkeys(component_stores.values()))
+
+class SelectiveA2JInterview(A2JInterview):
+  """An A2J guide whose pages are only built once they're selected"""
+
+  def __init__(self, input_filename):
+    # PAGE elements by name, in guide order
+    self.page_index: dict[str, etree._Element] = {}
+    # The whole tree is kept, so pages can be built later
+    super().__init__(input_filename, streaming=False)
+
+  def add_page(self, page_elem):
+    name = page_elem.get("NAME")
+    if not self.first_page_name:
+      self.first_page_name = name
+    self.page_index.setdefault(name, page_elem)
+
+  def select(self, names):
+    """Builds the named pages (keeping them in guide order), and returns any names that aren't pages"""
+    missing = [name for name in names if name not in self.page_index]
+    wanted = set(names)
+    built = []
+    with phase("pages"):
+      for name, page_elem in self.page_index.items():
+        if name in wanted and name not in self.page_map:
+          page = self.page_map[name] = A2JPage(page_elem)
+          built.append(page)
+    self.substitute_macros(built)
+    self.page_map = {name: self.page_map[name] for name in self.page_index if name in self.page_map}
+    return missing
+
+  def __getstate__(self):
+    # lxml elements can't be pickled, so a copy can't select any more pages
+    state = self.__dict__.copy()
+    state["page_index"] = {}
+    return state
+
+class SelectiveA2JJsonInterview(A2JJsonInterview):
+  """An A2J guide, read from its Guide.json, whose pages are only built once they're selected"""
+
+  def __init__(self, input_filename):
+    # Pages from the JSON by name, in guide order
+    self.page_index: dict[str, dict] = {}
+    super().__init__(input_filename)
+
+  def add_pages(self, pages):
+    for page in pages:
+      name = attr_value(page.get("name"))
+      if not self.first_page_name:
+        self.first_page_name = name
+      self.page_index.setdefault(name, page)
+
+  def select(self, names):
+    """Builds the named pages (keeping them in guide order), and returns any names that aren't pages"""
+    missing = [name for name in names if name not in self.page_index]
+    wanted = set(names)
+    new_names = [name for name in self.page_index if name in wanted and name not in self.page_map]
+    super().add_pages([self.page_index[name] for name in new_names])
+    self.substitute_macros(self.page_map[name] for name in new_names)
+    self.page_map = {name: self.page_map[name] for name in self.page_index if name in self.page_map}
+    return missing
+
+class SelectiveHotDocsInterview(HotDocsInterview):
+  """A HotDocs interview whose components are only built (and have their references
+  resolved) once they're selected, or referenced by a selected component
+  """
+
+  def __init__(self, input_name):
+    # Component elements by name, in library order; a name can be used more than once
+    self.component_index: dict[str, list[etree._Element]] = {}
+    self.built: set[str] = set()
+    self.script_scanner = None
+    # The whole tree is kept, so components can be built later
+    super().__init__(input_name, streaming=False)
+
+  def parse_component(self, component):
+    if component.tag in self.component_parsers:
+      self.component_index.setdefault(component.get("name"), []).append(component)
+
+  def resolve_markup(self):
+    # Nothing is built while loading; `select` resolves what it builds
+    pass
+
+  def select(self, names):
+    """Builds the named components and everything they lead to, then resolves their text.
+
+    Returns any names that aren't components in the library.
+    """
+    missing = [name for name in names if name not in self.component_index]
+    to_build = [name for name in names if name in self.component_index]
+    while to_build:
+      name = to_build.pop()
+      if name in self.built:
+        continue
+      self.built.add(name)
+      for component in self.component_index[name]:
+        super().parse_component(component)
+      for ref in self.references(name):
+        if ref in self.component_index and ref not in self.built:
+          to_build.append(ref)
+
+    for store_name in store_names:
+      store = getattr(self, store_name)
+      setattr(self, store_name, {name: store[name] for name in self.component_index if name in store})
+    super().resolve_markup()
+    return missing
+
+  def merge_choices(self):
+    """Shares choices between variables like a full conversion would, so a selected
+    variable uses the same choices list as it does there, even when the others with the
+    same options aren't selected
+    """
+    if self.dup_choices:
+      return
+    selected = [var for var in self.variable_map.values()
+                if isinstance(var, MultipleChoiceVariable) and not isinstance(var.options, str)]
+    if not selected:
+      return
+    with phase("merge_choices"):
+      # The first variable with each set of options, and how many have it, over the whole
+      # library; only the options are read from the variables that weren't selected
+      same_choices: dict[tuple, list] = {}
+      for name, components in self.component_index.items():
+        var = self.variable_map.get(name)
+        if isinstance(var, MultipleChoiceVariable):
+          options = var.options
+        else:
+          component = components[-1]
+          if component.tag != multiple_choice_tag or len(component) == 0:
+            continue
+          options = []
+          for elem in component:
+            if elem.tag == options_tag:
+              options.extend(mc_options(elem))
+        key = tuple(sorted(options))
+        first_and_count = same_choices.get(key)
+        if first_and_count is None:
+          same_choices[key] = [name, 1]
+        else:
+          first_and_count[1] += 1
+      self.dup_choices = {}
+      used = {tuple(sorted(var.options)) for var in selected}
+      for sorted_options, (first_name, count) in same_choices.items():
+        if count > 1 and sorted_options in used:
+          self.dup_choices[varname(first_name) + "_choices"] = list(sorted_options)
+      for var in selected:
+        first_name, count = same_choices[tuple(sorted(var.options))]
+        if count > 1:
+          var.options = varname(first_name) + "_choices"
+
+  def references(self, name):
+    """The names that the built components called `name` lead to"""
+    refs = set()
+    for store_name in store_names:
+      component = getattr(self, store_name).get(name)
+      if component is None:
+        continue
+      if store_name == "dialogs":
+        refs.update(item.name for item in component.contents)
+      elif store_name == "code_blocks":
+        if self.script_scanner is None:
+          self.script_scanner = NameScanner(self.component_index)
+        refs.update(self.script_scanner.find(component.script))
+      refs.update(referenced_names(component_text(store_name, component)))
+    return refs
+
+  def __getstate__(self):
+    # lxml elements can't be pickled, so a copy can't select any more components
+    state = self.__dict__.copy()
+    state["component_index"] = {}
+    return state
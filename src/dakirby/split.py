@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""Writing an interview's YAML as several files, with a main file that `include`s them.
+
+Docassemble reads every file of an interview again after an edit to any of them, so a
+big interview in one file is slow to work on. Split, each part of the interview gets its
+own file next to the main one: the metadata (and A2J sections), each A2J step's pages or
+each group of HotDocs dialogs, the shared choices, and the computations.
+
+Blocks are streamed: `iter_yaml_parts` gives each part's blocks together, so once the part
+changes, those blocks are handed to a pool of threads that turns them into YAML and
+appends it to the part's file, while the next part is being made. Only the blocks of the
+parts in the pool are held at once. Each file is written to a temporary file first, and
+one whose YAML is the same as what's already there isn't replaced, so its modification
+time (and anything watching it) is left alone.
+"""
+
+import os
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from .core.docassemble import YamlAnchors, to_yaml
+
+# Part names can't have a "." (or anything else unusual in a file name), so a part file,
+# `<stem>.<part>.yml`, can't have the name of a main file (see `batch.plan_outputs`) or
+# another interview's part file
+unsafe_chars = re.compile(r"[^A-Za-z0-9_-]+")
+
+class SplitFile(NamedTuple):
+  path: str
+  written: bool
+
+def part_file_name(stem, part) -> str:
+  return f"{stem}.{unsafe_chars.sub('_', part)}.yml"
+
+def same_content(path, other_path) -> bool:
+  """If the two files have exactly the same bytes; a different size is different content,
+  without reading either
+  """
+  try:
+    if os.path.getsize(path) != os.path.getsize(other_path):
+      return False
+  except FileNotFoundError:
+    return False
+  with open(path, "rb") as f, open(other_path, "rb") as other:
+    while True:
+      chunk = f.read(1 << 20)
+      if chunk != other.read(1 << 20):
+        return False
+      if not chunk:
+        return True
+
+def write_if_changed(path, text) -> bool:
+  """Writes `text` to `path`, unless the file already has exactly that in it"""
+  data = text.encode("utf-8")
+  try:
+    if os.path.getsize(path) == len(data):
+      with open(path, "rb") as f:
+        if f.read() == data:
+          return False
+  except FileNotFoundError:
+    pass
+  tmp_path = path + ".tmp"
+  with open(tmp_path, "wb") as f:
+    f.write(data)
+  os.replace(tmp_path, path)
+  return True
+
+class PartFile:
+  """One part's file, written a run of blocks at a time into a temporary file, which only
+  replaces the file at `path` at the end if it's different
+  """
+
+  def __init__(self, path):
+    self.path = path
+    self.tmp_path = path + ".tmp"
+    self.file = open(self.tmp_path, "wb")
+    # The last run handed to the pool, which has to be written before the next one
+    self.last_run = None
+
+  def write_run(self, blocks, before, anchors: YamlAnchors | None):
+    """Appends the YAML of `blocks`, after the `before` run is written. Gets its own
+    `YamlAnchors`, since those keep the state of the block being written
+    """
+    run_anchors = YamlAnchors() if anchors is not None else None
+    text = to_yaml(blocks, None, run_anchors)
+    if before is not None:
+      before.result()
+    self.file.write(text.encode("utf-8"))
+    return run_anchors
+
+  def finish(self) -> bool:
+    """Closes the file, and puts it in place if it changed; returns whether it did"""
+    self.file.close()
+    if same_content(self.tmp_path, self.path):
+      os.remove(self.tmp_path)
+      return False
+    os.replace(self.tmp_path, self.path)
+    return True
+
+  def discard(self):
+    self.file.close()
+    try:
+      os.remove(self.tmp_path)
+    except FileNotFoundError:
+      pass
+
+def write_split(interview, main_path, anchors: YamlAnchors | None = None, max_workers=None) -> list[SplitFile]:
+  """Writes the interview as a main file at `main_path`, which includes a file for each
+  part of it, written in the same directory. Returns each file, and whether it was written.
+  """
+  output_dir = os.path.dirname(main_path)
+  stem = os.path.basename(main_path)
+  if stem.endswith(".yml"):
+    stem = stem[:-len(".yml")]
+  max_workers = max_workers or 4
+  files: dict[str, PartFile] = {}
+  # Runs handed to the pool that haven't finished; at most a couple per thread, so the
+  # blocks waiting to be written don't pile up
+  pending = deque()
+  try:
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+
+      def hand_off(part, blocks):
+        name = part_file_name(stem, part)
+        part_file = files.get(name)
+        if part_file is None:
+          part_file = files[name] = PartFile(os.path.join(output_dir, name))
+        # A part that comes up again after another one goes on at the end of its file
+        part_file.last_run = executor.submit(part_file.write_run, blocks, part_file.last_run, anchors)
+        pending.append(part_file.last_run)
+        while len(pending) > 2 * max_workers:
+          done_anchors = pending.popleft().result()
+          if done_anchors is not None:
+            anchors.add_counts(done_anchors)
+
+      current_part = None
+      blocks = []
+      for part, obj in interview.iter_yaml_parts():
+        if part != current_part and blocks:
+          hand_off(current_part, blocks)
+          blocks = []
+        current_part = part
+        blocks.append(obj)
+      if blocks:
+        hand_off(current_part, blocks)
+      while pending:
+        done_anchors = pending.popleft().result()
+        if done_anchors is not None:
+          anchors.add_counts(done_anchors)
+      finished = [executor.submit(part_file.finish) for part_file in files.values()]
+      written = [future.result() for future in finished]
+  except BaseException:
+    for part_file in files.values():
+      part_file.discard()
+    raise
+  split_files = [SplitFile(part_file.path, was_written) for part_file, was_written in zip(files.values(), written)]
+  main_written = write_if_changed(main_path, to_yaml([{"include": list(files)}]))
+  return split_files + [SplitFile(main_path, main_written)]
+
+def split_report(split_files: list[SplitFile]) -> dict:
+  return {
+    "files": [path for path, _ in split_files],
+    "written": sum(written for _, written in split_files),
+  }
+
+def summarize_split(report) -> str:
+  unchanged = len(report["files"]) - report["written"]
+  return f"Split into {len(report['files'])} files; wrote {report['written']}, {unchanged} unchanged"
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""Watching inputs for changes, and reconverting only the pages and components that changed.
+
+Each watched input keeps its last parsed interview in memory. On a change, A2J pages and
+HotDocs components whose XML is byte for byte the same are reused instead of parsed again,
+every reference is resolved again (so text that mentions a renamed variable is updated),
+and only the blocks whose content changed are turned into YAML again.
+"""
+
+import copy
+import hashlib
+import os
+import re
+import sys
+import time
+from typing import NamedTuple
+
+from lxml import etree
+
+from .batch import is_a2j_input
+from .cache import input_files
+from .core.a2jauthor import A2JInterview, A2JPage
+from .core.a2jauthor_json import A2JJsonInterview
+from .core.hotdocs import HotDocsInterview, MultipleChoiceVariable, component_stores, component_text
+from .core.hotdocs_markup import HotDocsMarkup, referenced_names
+from .core.docassemble import to_yaml
+
+def content_digest(data: bytes) -> bytes:
+  return hashlib.blake2b(data, digest_size=16).digest()
+
+def file_stamp(input_path):
+  """The size and modification time of every file a conversion reads, to tell when any change"""
+  stamp = []
+  for path in input_files(input_path):
+    try:
+      stat = os.stat(path)
+    except FileNotFoundError:
+      continue
+    stamp.append((path, stat.st_mtime_ns, stat.st_size))
+  return tuple(stamp)
+
+class RenderedBlock(dict):
+  """A YAML block that remembers its text, so an unchanged block isn't emitted again"""
+  __slots__ = ("yaml",)
+
+  def __init__(self, *args):
+    super().__init__(*args)
+    self.yaml = None
+
+class Rebuild(NamedTuple):
+  text: str
+  rebuilt: int
+  total: int
+
+class BlockRenderer:
+  """Turns blocks into YAML, reusing the text of the last render for blocks that are equal"""
+
+  def __init__(self):
+    self.blocks: dict = {}
+
+  def render(self, objs) -> Rebuild:
+    blocks = {}
+    chunks = []
+    rebuilt = 0
+    for idx, obj in enumerate(objs):
+      key = obj.get("id", idx)
+      block = obj if isinstance(obj, RenderedBlock) else RenderedBlock(obj)
+      if block.yaml is None:
+        previous = self.blocks.get(key)
+        if previous is not None and previous == block:
+          block = previous
+        else:
+          block.yaml = to_yaml([block])
+          rebuilt += 1
+      blocks[key] = block
+      chunks.append(block.yaml)
+    self.blocks = blocks
+    return Rebuild("".join(chunks), rebuilt, len(chunks))
+
+# A2J guides are one big file; each PAGE is found in the raw bytes and reparsed only if it changed
+page_re = re.compile(rb"<(PAGE|page|Page)\b[^>]*?(?:/>|>.*?</\1\s*>)", re.S)
+page_marker = b"<?dakirby-page?>"
+xml_encoding_re = re.compile(rb"""\A(?:\xef\xbb\xbf)?<\?xml[^>]*?encoding=["']([^"']+)["']""")
+utf8_encodings = {b"utf-8", b"utf8", b"us-ascii", b"ascii"}
+
+class WatchedA2JPage(A2JPage):
+  """Keeps its YAML block, since it only depends on the page itself (and the variables
+  table, which its macros were substituted from)
+  """
+  __slots__ = ("block",)
+
+  def to_yaml(self):
+    block = getattr(self, "block", None)
+    if block is None:
+      block = self.block = RenderedBlock(super().to_yaml())
+    return block
+
+class IncrementalA2J:
+  """Converts an A2J guide again, parsing only the pages whose XML changed"""
+
+  def __init__(self, input_path):
+    self.input_path = input_path
+    self.pages: dict[bytes, WatchedA2JPage] = {}
+    # The variables the kept pages had their macros substituted from
+    self.variable_map: dict[str, str] = {}
+    self.renderer = BlockRenderer()
+
+  def convert(self) -> Rebuild:
+    with open(self.input_path, "rb") as f:
+      data = f.read()
+    try:
+      interview = self.parse_changed(data)
+    except (etree.XMLSyntaxError, ValueError):
+      interview = None
+    if interview is None:
+      # Something the page slicing can't handle safely; parse the whole guide
+      self.pages = {}
+      self.variable_map = {}
+      interview = A2JInterview(self.input_path)
+    return self.renderer.render(interview.iter_yaml_objs())
+
+  def parse_changed(self, data) -> A2JInterview | None:
+    encoding = xml_encoding_re.match(data)
+    if encoding and encoding.group(1).lower() not in utf8_encodings:
+      return None
+    slices = []
+    skeleton = page_re.sub(lambda match: slices.append(match.group(0)) or page_marker, data)
+    root = etree.fromstring(skeleton)
+
+    interview = A2JInterview()
+    # VARIABLES can come after PAGES, and pages' macros need them
+    for elem in root:
+      if isinstance(elem.tag, str) and elem.tag.lower() == "variables":
+        interview.parse_variables(elem)
+    # Renaming a variable changes the text of every page that shows it
+    old_pages = self.pages if interview.variable_map == self.variable_map else {}
+    pages = {}
+    new_pages = []
+    placed = 0
+    for elem in root:
+      if not isinstance(elem.tag, str):
+        continue
+      tag = elem.tag.lower()
+      if tag == "info":
+        interview.parse_info(elem)
+      elif tag == "steps":
+        interview.parse_steps(elem)
+      elif tag == "pages":
+        for marker in elem:
+          if not isinstance(marker, etree._ProcessingInstruction) or marker.target != "dakirby-page":
+            continue
+          page_xml = slices[placed]
+          placed += 1
+          page_digest = content_digest(page_xml)
+          page = pages.get(page_digest) or old_pages.get(page_digest)
+          if page is None:
+            page = WatchedA2JPage(etree.fromstring(page_xml))
+            new_pages.append(page)
+          pages[page_digest] = page
+          if not interview.first_page_name:
+            interview.first_page_name = page.name
+          interview.page_map[page.name] = page
+    # Every page has to have come from a <PAGES> right under the root, like a full parse
+    if placed != len(slices) or placed != sum(1 for _ in root.iter(etree.ProcessingInstruction)):
+      return None
+    interview.substitute_macros(new_pages)
+    self.pages = pages
+    self.variable_map = interview.variable_map
+    return interview
+
+class IncrementalHotDocsInterview(HotDocsInterview):
+  """A HotDocs interview that reuses the components of `previous` whose XML didn't change.
+
+  A reused component also keeps its resolved text, unless a name it references now
+  resolves to something else (say, a renamed variable or computation).
+  """
+
+  def __init__(self, input_name, previous=None):
+    self.previous = previous
+    # All by (store, name): the digest of each component's XML, a copy of it as parsed
+    # (before references are resolved), the object in use, and the names its text references
+    self.component_digests = {}
+    self.parsed_components = {}
+    self.live_components = {}
+    self.text_refs = {}
+    self.reused = set()
+    super().__init__(input_name)
+    self.previous = None
+
+  def parse_component(self, component):
+    store_name = component_stores.get(component.tag)
+    if store_name is None:
+      return
+    name = component.get("name")
+    key = (store_name, name)
+    store = getattr(self, store_name)
+    component_digest = content_digest(etree.tostring(component, with_tail=False))
+    previous = self.previous
+    if previous is not None and previous.component_digests.get(key) == component_digest:
+      parsed = previous.parsed_components[key]
+      live = previous.live_components[key]
+      if live is not None:
+        if isinstance(live, MultipleChoiceVariable):
+          # Choices get merged again, from the options as they were parsed
+          live.options = parsed.options
+        store[name] = live
+      self.text_refs[key] = previous.text_refs[key]
+      self.reused.add(key)
+    else:
+      before = store.get(name)
+      super().parse_component(component)
+      live = store.get(name)
+      if live is before:
+        live = parsed = None
+      else:
+        # Resolving references changes the live object, so keep a copy of how it was parsed
+        parsed = copy.copy(live)
+      self.text_refs[key] = referenced_names(component_text(store_name, live))
+      self.reused.discard(key)
+    self.component_digests[key] = component_digest
+    self.parsed_components[key] = parsed
+    self.live_components[key] = live
+
+  def resolve_markup(self):
+    if self.previous is None:
+      super().resolve_markup()
+      return
+    self.main_order_script = self.preferences.get("CUSTOM_INTERVIEW")
+    self.markup = HotDocsMarkup(self.code_blocks, self.variable_map)
+    old_refs = self.previous.markup.refs
+    new_refs = self.markup.refs
+    changed_names = {name for name in old_refs.keys() | new_refs.keys() if old_refs.get(name) != new_refs.get(name)}
+    for key, live in self.live_components.items():
+      if live is None:
+        continue
+      store_name, name = key
+      if key in self.reused:
+        if changed_names.isdisjoint(self.text_refs[key]):
+          continue
+        # Resolve it again from a fresh copy; the old interview's object stays as it was
+        live = copy.copy(self.parsed_components[key])
+        getattr(self, store_name)[name] = self.live_components[key] = live
+      self.resolve_text(live)
+
+class IncrementalHotDocs:
+  """Converts a HotDocs package again, parsing only the components whose XML changed"""
+
+  def __init__(self, input_path):
+    self.input_path = input_path
+    self.interview = None
+    self.renderer = BlockRenderer()
+
+  def convert(self) -> Rebuild:
+    self.interview = IncrementalHotDocsInterview(self.input_path, previous=self.interview)
+    return self.renderer.render(self.interview.iter_yaml_objs())
+
+class IncrementalA2JJson:
+  """Converts a Guide.json again. It's all read again (it's one JSON value), but only the
+  blocks that changed are turned into YAML again
+  """
+
+  def __init__(self, input_path):
+    self.input_path = input_path
+    self.renderer = BlockRenderer()
+
+  def convert(self) -> Rebuild:
+    return self.renderer.render(A2JJsonInterview(self.input_path).iter_yaml_objs())
+
+def incremental_converter(input_path):
+  # The file that's watched is the one given, even if a guide has both
+  if input_path.endswith("Guide.json"):
+    return IncrementalA2JJson(input_path)
+  elif is_a2j_input(input_path):
+    return IncrementalA2J(input_path)
+  elif os.path.isdir(input_path) or input_path.endswith(".zip"):
+    return IncrementalHotDocs(input_path)
+  raise ValueError(f"Don't recognize the input file type: {input_path}")
+
+def write_if_changed(output_path, text, last_text):
+  if text == last_text:
+    return False
+  if output_path is None:
+    sys.stdout.write(text + "\n")
+    sys.stdout.flush()
+  else:
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "w") as f:
+      f.write(text)
+    os.replace(tmp_path, output_path)
+  return True
+
+def watch(plan: list[tuple[str, str | None]], interval=0.5, log=sys.stderr):
+  """Converts each (input, output path) pair, then again whenever the input's files change.
+
+  A `None` output path writes to stdout. Runs until interrupted; a conversion that fails
+  (say, on a half saved file) is reported, and the last good output is kept.
+  """
+  converters = {input_path: incremental_converter(input_path) for input_path, _ in plan}
+  stamps = {}
+  outputs = {}
+  while True:
+    for input_path, output_path in plan:
+      stamp = file_stamp(input_path)
+      if stamp == stamps.get(input_path):
+        continue
+      stamps[input_path] = stamp
+      start = time.perf_counter()
+      try:
+        result = converters[input_path].convert()
+      except Exception as ex:
+        print(f"FAIL {input_path}: {ex}", file=log)
+        continue
+      written = write_if_changed(output_path, result.text, outputs.get(input_path))
+      outputs[input_path] = result.text
+      print(f"{'OK  ' if written else 'SAME'} {input_path}: rebuilt {result.rebuilt} of {result.total} blocks "
+            f"({time.perf_counter() - start:.2f}s)", file=log)
+    time.sleep(interval)
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""A long-running converter that takes jobs as JSON lines on stdin.
+
+Starting Python and importing lxml and the converters takes longer than converting a
+small interview, so `dakirby --worker` does that once. It starts a fixed number of worker
+processes, forked (where that's possible) from a server process that has already imported
+the converters, and runs as many jobs at once as there are workers; the rest wait in a
+queue. Each request is one line of JSON:
+
+    {"id": 1, "op": "convert", "input": "path/to/Guide.xml", "only": ["Intro"], "prune": false, "anchors": false,
+     "timeout": 30}
+    {"id": 2, "op": "stats"}
+
+A conversion's YAML comes back in pieces, as `{"id": 1, "chunk": "..."}` lines (lines of
+different jobs can be interleaved), followed by `{"id": 1, "ok": true, "elapsed": 0.12}`,
+or `{"id": 1, "ok": false, "error": "..."}` if it failed, ran out of time, or went over
+the memory limit (or the request itself was wrong, like a `"timeout"` that isn't a
+number of seconds more than 0); a worker that's stopped or dies is replaced. Jobs with
+`"only"` don't use the `--cache-dir` cache. `stats` reports the queue depth, how many
+jobs are running and finished, and latency percentiles. The worker exits once stdin is
+closed and the jobs it already has are done.
+"""
+
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+try:
+  import resource
+except ImportError:
+  # Not on Windows; memory limits are skipped there
+  resource = None
+
+from .batch import convert_interview
+from .cache import InterviewCache, DEFAULT_MAX_BYTES
+# Elsewhere these are imported only when needed; here they're imported up front, so the
+# forkserver has them loaded for every worker it starts
+from .core import a2jauthor, a2jauthor_json, hotdocs, prune  # noqa: F401
+from . import selective  # noqa: F401
+
+# The most YAML a worker holds before sending it on
+chunk_bytes = 64 * 1024
+# How many of the latest latencies the percentiles are from
+latency_window = 1000
+
+class ChunkWriter:
+  """A file-like object that sends what's written through a pipe, a chunk at a time"""
+
+  def __init__(self, conn):
+    self.conn = conn
+    self.parts = []
+    self.size = 0
+
+  def write(self, text):
+    self.parts.append(text)
+    self.size += len(text)
+    if self.size >= chunk_bytes:
+      self.flush()
+
+  def flush(self):
+    if self.parts:
+      self.conn.send(("chunk", "".join(self.parts)))
+      self.parts = []
+      self.size = 0
+
+def worker_main(conn, memory_limit=None, cache_dir=None, cache_max_bytes=None):
+  """Runs in each worker process: converts each job sent through `conn`, until it's closed"""
+  if memory_limit and resource is not None:
+    resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+  cache = InterviewCache(cache_dir, cache_max_bytes or DEFAULT_MAX_BYTES) if cache_dir else None
+  while True:
+    try:
+      job = conn.recv()
+    except EOFError:
+      return
+    if job is None:
+      return
+    writer = ChunkWriter(conn)
+    try:
+      _, reports = convert_interview(job["input"], writer, cache, job.get("prune", False), job.get("only"),
+                                     job.get("anchors", False))
+      writer.flush()
+      conn.send(("done", reports))
+    except MemoryError:
+      conn.send(("memory_error", "Went over the worker memory limit"))
+    except Exception:
+      conn.send(("error", traceback.format_exc(limit=3)))
+
+def percentile(sorted_values, fraction):
+  """The nearest-rank percentile of already sorted values"""
+  if not sorted_values:
+    return None
+  rank = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+  return sorted_values[rank]
+
+class WorkerPool:
+  """Runs conversion jobs on `num_workers` worker processes, writing responses to `output`.
+  A `timeout` of None lets jobs without their own run as long as they take.
+  """
+
+  def __init__(self, num_workers=None, timeout: float | None = 60.0, memory_limit=None, cache_dir=None, cache_max_bytes=None,
+               output=sys.stdout):
+    self.num_workers = num_workers or os.cpu_count() or 1
+    self.timeout = timeout
+    self.worker_args = (memory_limit, cache_dir, cache_max_bytes)
+    self.output = output
+    self.output_lock = threading.Lock()
+    self.jobs = queue.Queue()
+    self.stats_lock = threading.Lock()
+    self.running = 0
+    self.counts = {"completed": 0, "failed": 0, "timed_out": 0, "restarts": 0}
+    self.latencies = deque(maxlen=latency_window)
+    # Workers are forked from a single-threaded server that has the converters imported;
+    # forking this process directly isn't safe once its threads are running
+    if "forkserver" in multiprocessing.get_all_start_methods():
+      self.context = multiprocessing.get_context("forkserver")
+      self.context.set_forkserver_preload([__name__])
+    else:
+      self.context = multiprocessing.get_context("spawn")
+    self.threads = [threading.Thread(target=self.run_slot, daemon=True) for _ in range(self.num_workers)]
+    for thread in self.threads:
+      thread.start()
+
+  def respond(self, message):
+    line = json.dumps(message) + "\n"
+    with self.output_lock:
+      self.output.write(line)
+      self.output.flush()
+
+  def submit(self, request):
+    self.jobs.put((request, time.perf_counter()))
+
+  def start_worker(self):
+    parent_conn, child_conn = self.context.Pipe()
+    process = self.context.Process(target=worker_main, args=(child_conn, *self.worker_args), daemon=True)
+    process.start()
+    child_conn.close()
+    return process, parent_conn
+
+  def stop_worker(self, process, conn):
+    conn.close()
+    if process.is_alive():
+      process.kill()
+    process.join()
+
+  def run_slot(self):
+    """Feeds jobs to one worker process, one at a time, replacing it when it has to be stopped"""
+    process, conn = self.start_worker()
+    while True:
+      item = self.jobs.get()
+      if item is None:
+        break
+      request, received = item
+      with self.stats_lock:
+        self.running += 1
+      try:
+        response, restart = self.run_job(conn, request, received)
+      except Exception:
+        # Every job gets an answer, even if this is a bug; the worker may be mid-job, so it's replaced
+        response = {"id": request.get("id"), "ok": False, "error": traceback.format_exc(limit=3)}
+        restart = True
+      with self.stats_lock:
+        self.running -= 1
+        self.counts["completed" if response["ok"] else "failed"] += 1
+        self.latencies.append(time.perf_counter() - received)
+      # Only answered once the stats count it, so a `stats` sent after this sees it as done
+      self.respond(response)
+      if restart:
+        self.stop_worker(process, conn)
+        with self.stats_lock:
+          self.counts["restarts"] += 1
+        process, conn = self.start_worker()
+    try:
+      conn.send(None)
+    except OSError:
+      pass
+    self.stop_worker(process, conn)
+
+  def run_job(self, conn, request, received):
+    """Sends a job to a worker and passes on the YAML that comes back. Returns the final
+    response, and whether the worker has to be replaced
+    """
+    job_id = request.get("id")
+    timeout = request.get("timeout")
+    if timeout is None:
+      timeout = self.timeout
+    deadline = time.perf_counter() + timeout if timeout is not None else None
+    try:
+      conn.send({"input": request["input"], "only": request.get("only"), "prune": request.get("prune", False),
+                 "anchors": request.get("anchors", False)})
+      while True:
+        remaining = None if deadline is None else deadline - time.perf_counter()
+        if remaining is not None and (remaining <= 0 or not conn.poll(remaining)):
+          with self.stats_lock:
+            self.counts["timed_out"] += 1
+          return {"id": job_id, "ok": False, "error": f"Timed out after {timeout}s"}, True
+        kind, value = conn.recv()
+        if kind == "chunk":
+          self.respond({"id": job_id, "chunk": value})
+        elif kind == "done":
+          response = {"id": job_id, "ok": True, "elapsed": time.perf_counter() - received}
+          if "prune" in value:
+            response["pruned"] = value["prune"]
+          if "anchors" in value:
+            response["anchors"] = value["anchors"]
+          return response, False
+        else:
+          # A worker that ran out of memory may not have cleaned up after itself
+          return {"id": job_id, "ok": False, "error": value}, kind == "memory_error"
+    except (EOFError, OSError):
+      return {"id": job_id, "ok": False, "error": "The worker process stopped unexpectedly"}, True
+
+  def stats(self) -> dict:
+    with self.stats_lock:
+      latencies = sorted(self.latencies)
+      return {
+        "workers": self.num_workers,
+        "queue_depth": self.jobs.qsize(),
+        "running": self.running,
+        **self.counts,
+        "latency": {
+          "p50": percentile(latencies, 0.50),
+          "p90": percentile(latencies, 0.90),
+          "p99": percentile(latencies, 0.99),
+        },
+      }
+
+  def close(self):
+    """Lets the queued jobs finish, then stops the workers"""
+    for _ in self.threads:
+      self.jobs.put(None)
+    for thread in self.threads:
+      thread.join()
+
+def request_error(request) -> str | None:
+  """What's wrong with a convert request, if anything"""
+  if not isinstance(request.get("input"), str):
+    return "A convert request needs an \"input\" path"
+  only = request.get("only")
+  if only is not None and not (isinstance(only, list) and all(isinstance(name, str) for name in only)):
+    return "\"only\" has to be a list of names"
+  timeout = request.get("timeout")
+  if timeout is not None and (isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or timeout <= 0):
+    return "\"timeout\" has to be a number of seconds, more than 0"
+  for flag in ("prune", "anchors"):
+    if not isinstance(request.get(flag, False), bool):
+      return f"\"{flag}\" has to be true or false"
+  return None
+
+def serve(pool: WorkerPool, requests=sys.stdin):
+  """Answers each JSON line in `requests` until it ends"""
+  for line in requests:
+    if not line.strip():
+      continue
+    try:
+      request = json.loads(line)
+    except ValueError as ex:
+      pool.respond({"id": None, "ok": False, "error": f"Not JSON: {ex}"})
+      continue
+    if not isinstance(request, dict):
+      pool.respond({"id": None, "ok": False, "error": "Each request has to be a JSON object"})
+      continue
+    op = request.get("op", "convert")
+    if op == "stats":
+      pool.respond({"id": request.get("id"), "stats": pool.stats()})
+    elif op == "convert":
+      error = request_error(request)
+      if error:
+        pool.respond({"id": request.get("id"), "ok": False, "error": error})
+      else:
+        pool.submit(request)
+    else:
+      pool.respond({"id": request.get("id"), "ok": False, "error": f"Unknown op: {op}"})
+  pool.close()
@@ -0,0 +1,58 @@
+"""The on-disk cache, when other processes share its directory or a write fails"""
+
+import os
+import time
+
+import pytest
+
+from dakirby.cache import InterviewCache
+
+def test_cache_dir_is_owner_only(tmp_path):
+  InterviewCache(str(tmp_path / "cache"))
+  assert (tmp_path / "cache").stat().st_mode & 0o777 == 0o700
+
+def test_hit_survives_the_entry_being_evicted_by_another_process(tmp_path, monkeypatch):
+  cache = InterviewCache(str(tmp_path))
+  cache.put("key", {"pages": 1})
+
+  def evicted(path, *args):
+    raise FileNotFoundError(path)
+  monkeypatch.setattr(os, "utime", evicted)
+  assert cache.get("key") == {"pages": 1}
+
+def test_entries_skip_files_removed_while_listing(tmp_path, monkeypatch):
+  cache = InterviewCache(str(tmp_path))
+  cache.put("kept", "a")
+  cache.put("gone", "b")
+  real_scandir = os.scandir
+
+  def scandir_then_remove(path):
+    listed = list(real_scandir(path))
+    os.remove(cache.entry_path("gone"))
+    return iter(listed)
+  monkeypatch.setattr(os, "scandir", scandir_then_remove)
+  assert [path for path, _, _ in cache.entries()] == [cache.entry_path("kept")]
+
+def test_failed_put_leaves_no_temporary_file(tmp_path, monkeypatch):
+  cache = InterviewCache(str(tmp_path))
+
+  def fail(*args):
+    raise OSError("disk full")
+  monkeypatch.setattr(os, "replace", fail)
+  with pytest.raises(OSError):
+    cache.put("key", "value")
+  assert os.listdir(tmp_path) == []
+
+def test_stale_temporary_files_are_evicted(tmp_path):
+  cache = InterviewCache(str(tmp_path), max_bytes=1024)
+  stale = tmp_path / "crashed.tmp"
+  stale.write_bytes(b"x" * 2048)
+  old = time.time() - cache.stale_tmp_seconds - 60
+  os.utime(stale, (old, old))
+  # Another process's write, still going
+  fresh = tmp_path / "writing.tmp"
+  fresh.write_bytes(b"x" * 2048)
+
+  assert cache.size() == 2048
+  cache.evict()
+  assert not stale.exists() and fresh.exists()
@@ -0,0 +1,35 @@
+"""Reading a Guide.json, and when it's read.
+
+The JSON here is made from the same guide's XML by `benchmarks/synthetic.py`, so this only
+checks that the two front ends agree on that layout, not that the layout is A2J Author's
+(see docs/a2j_structure.md).
+"""
+
+import os
+
+import pytest
+
+from dakirby.batch import expand_inputs
+from dakirby.core.a2jauthor import A2JInterview
+from dakirby.core.a2jauthor_json import A2JJsonInterview
+from dakirby.core.docassemble import to_yaml
+
+import synthetic
+
+@pytest.mark.parametrize("markup", [True, False])
+def test_json_gives_the_same_yaml_as_xml(tmp_path, markup):
+  xml_path = synthetic.write_a2j(str(tmp_path), 200, with_json=True, markup=markup)
+  json_path = os.path.join(os.path.dirname(xml_path), "Guide.json")
+  assert to_yaml(A2JJsonInterview(json_path).iter_yaml_objs()) == to_yaml(A2JInterview(xml_path).iter_yaml_objs())
+
+def test_directories_only_find_guide_xml(tmp_path):
+  both = synthetic.write_a2j(str(tmp_path / "both"), 5, with_json=True)
+  json_only = os.path.join(os.path.dirname(synthetic.write_a2j(str(tmp_path / "json_only"), 5, with_json=True)),
+                           "Guide.xml")
+  os.remove(json_only)
+  assert expand_inputs([str(tmp_path)]) == [both]
+
+def test_guide_json_is_read_when_named(tmp_path):
+  xml_path = synthetic.write_a2j(str(tmp_path), 5, with_json=True)
+  json_path = os.path.join(os.path.dirname(xml_path), "Guide.json")
+  assert expand_inputs([json_path]) == [json_path]
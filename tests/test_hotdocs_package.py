@@ -0,0 +1,46 @@
+"""Finding the component files of a HotDocs package"""
+
+import os
+import zipfile
+
+import pytest
+
+from dakirby.batch import expand_inputs
+from dakirby.cache import input_files
+from dakirby.core.docassemble import to_yaml
+from dakirby.core.hotdocs import HotDocsInterview
+
+import synthetic
+
+def test_cmp_suffix_is_matched_in_any_case(tmp_path):
+  lower = synthetic.write_hotdocs(str(tmp_path / "lower"), 5)
+  upper = synthetic.write_hotdocs(str(tmp_path / "upper"), 5)
+  os.rename(os.path.join(upper, "template.cmp"), os.path.join(upper, "Template.CMP"))
+  # Left out, like the glob this replaced left out hidden files
+  with open(os.path.join(upper, "._master.cmp"), "wb") as f:
+    f.write(b"\0\0")
+
+  assert input_files(upper) == [os.path.join(upper, "Template.CMP"), os.path.join(upper, "master.cmp")]
+  assert expand_inputs([str(tmp_path)]) == [lower, upper]
+  assert to_yaml(HotDocsInterview(upper).iter_yaml_objs()) == to_yaml(HotDocsInterview(lower).iter_yaml_objs())
+
+@pytest.mark.parametrize("as_zip", [False, True])
+def test_missing_master_cmp_is_an_error(tmp_path, as_zip):
+  package = synthetic.write_hotdocs(str(tmp_path / ("package.zip" if as_zip else "package")), 5, as_zip=as_zip)
+  if as_zip:
+    with zipfile.ZipFile(package) as original:
+      members = {name: original.read(name) for name in original.namelist() if not name.endswith("master.cmp")}
+    with zipfile.ZipFile(package, "w") as rewritten:
+      for name, data in members.items():
+        rewritten.writestr(name, data)
+  else:
+    os.remove(os.path.join(package, "master.cmp"))
+  with pytest.raises(ValueError, match="master.cmp"):
+    HotDocsInterview(package)
+
+def test_package_without_a_component_library_is_an_error(tmp_path):
+  package = tmp_path / "package"
+  package.mkdir()
+  (package / "other.cmp").write_text("<notALibrary/>")
+  with pytest.raises(ValueError, match="No component library"):
+    HotDocsInterview(str(package))
@@ -0,0 +1,23 @@
+"""Which markup is converted in each kind of HotDocs text"""
+
+import os
+
+from dakirby.core.hotdocs import HotDocsInterview
+
+import synthetic
+
+def test_titles_keep_formatting_codes_and_help_keeps_references(tmp_path):
+  package = synthetic.write_hotdocs(str(tmp_path / "package"), 5)
+  master_path = os.path.join(package, "master.cmp")
+  with open(master_path, encoding="utf-8") as f:
+    master = f.read()
+  master = master.replace("<hd:title>Dialog 0 for", "<hd:title>«.b»Dialog 0«.be» for", 1)
+  master = master.replace("Help for «.i»Var 0 0«.ie»", "Help for «.i»Var 0 0«.ie», see «Var 0 3 TE»", 1)
+  with open(master_path, "w", encoding="utf-8") as f:
+    f.write(master)
+
+  interview = HotDocsInterview(package)
+  # References in titles are converted, but not formatting codes
+  assert interview.dialogs["Dialog 0"].title.startswith("«.b»Dialog 0«.be» for ${ ")
+  # Formatting codes in help are converted, but not references
+  assert interview.variable_map["Var 0 0 TE"].help == "Help for *Var 0 0*, see «Var 0 3 TE»"
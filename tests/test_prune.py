@@ -0,0 +1,22 @@
+"""Measuring how much `prune` saves"""
+
+from dakirby.core.docassemble import to_yaml
+from dakirby.core.hotdocs import HotDocsInterview
+from dakirby.core.prune import prune, yaml_size
+
+import synthetic
+
+def test_yaml_size_counts_the_yaml_without_changing_it(tmp_path):
+  package = synthetic.write_hotdocs(str(tmp_path / "package"), 20, mc_ratio=0.5)
+  interview = HotDocsInterview(package)
+  blocks, size = yaml_size(interview)
+  # Measuring merges choices; they have to be unmerged, so that pruning still works
+  assert interview.dup_choices == {}
+  objs = interview.to_yaml_objs()
+  assert (blocks, size) == (len(objs), len(to_yaml(objs).encode("utf-8")))
+
+def test_prune_measures_only_when_asked(tmp_path):
+  package = synthetic.write_hotdocs(str(tmp_path / "package"), 20)
+  assert "bytes_before" not in prune(HotDocsInterview(package))
+  report = prune(HotDocsInterview(package), measure=True)
+  assert report["bytes_before"] >= report["bytes_after"] > 0
@@ -0,0 +1,60 @@
+"""What starting dakirby imports: the CLI loads nothing but itself until it knows what it's
+converting, and a conversion loads only the front end for its input. And how long it takes
+to get to the first line of YAML, against the budget in `benchmarks/bench_startup.py`.
+
+Each check runs in a fresh interpreter, since this one has already imported everything.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import synthetic
+from bench_startup import default_budget_ms, time_to_first_output
+
+src_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+# Modules that only some options need, so a plain conversion shouldn't import them
+option_modules = ["dakirby.watch", "dakirby.worker", "dakirby.selective", "dakirby.split", "dakirby.core.prune"]
+front_ends = {"a2j": "dakirby.core.a2jauthor", "hotdocs": "dakirby.core.hotdocs"}
+# The benchmark's budget is for a quiet machine; this leaves room for a busy test runner
+budget_margin = 2
+
+def with_src_path():
+  return dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [src_dir, os.environ.get("PYTHONPATH")])))
+
+def write_input(tmp_path, input_format):
+  if input_format == "a2j":
+    return synthetic.write_a2j(str(tmp_path / "a2j"), 5)
+  return synthetic.write_hotdocs(str(tmp_path / "library.zip"), 5, as_zip=True)
+
+def modules_after(code) -> set[str]:
+  """Every module imported after running `code` in a new interpreter"""
+  result = subprocess.run([sys.executable, "-c", f"{code}\nimport json, sys\nprint(json.dumps(sorted(sys.modules)))"],
+                          capture_output=True, text=True, env=with_src_path(), check=True)
+  return set(json.loads(result.stdout.splitlines()[-1]))
+
+def test_cli_import_loads_no_converters():
+  loaded = modules_after("import dakirby.cli")
+  assert not {name for name in loaded if name == "lxml" or name.startswith("lxml.")}
+  assert {name for name in loaded if name.startswith("dakirby")} == {"dakirby", "dakirby.cli"}
+
+@pytest.mark.parametrize("input_format", ["a2j", "hotdocs"])
+def test_conversion_loads_only_its_front_end(tmp_path, input_format):
+  input_path = write_input(tmp_path, input_format)
+  loaded = modules_after(f"from dakirby.batch import convert_interview\nconvert_interview({input_path!r})")
+  assert front_ends[input_format] in loaded
+  for other_format, module in front_ends.items():
+    if other_format != input_format:
+      assert module not in loaded
+  assert not loaded.intersection(option_modules)
+
+@pytest.mark.parametrize("input_format", ["a2j", "hotdocs"])
+def test_first_output_is_within_the_startup_budget(tmp_path, monkeypatch, input_format):
+  input_path = write_input(tmp_path, input_format)
+  monkeypatch.setenv("PYTHONPATH", with_src_path()["PYTHONPATH"])
+  best_ms = min(time_to_first_output(input_path)[0] for _ in range(3)) * 1000
+  assert best_ms <= budget_margin * default_budget_ms